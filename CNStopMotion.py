@@ -1,13 +1,48 @@
 import sys
 import os
+import ctypes
+import ctypes.util
+import select
+import struct
 import cv2
 import shutil
 import json
-
-from threading import Lock
+import time
+import hashlib
+import subprocess
+import random
+import argparse
+import multiprocessing
+import heapq
+import bisect
+import math
+import queue
+import logging
+import logging.handlers
+import traceback
+import functools
+import socket
+import csv
+import datetime
+import warnings
+import zipfile
+
+from array import array
+from collections import OrderedDict, deque
+from itertools import accumulate
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from multiprocessing import shared_memory
+from threading import Condition, Event, Lock, RLock, Thread, get_native_id, main_thread
+
+# Zip backups append new versions of changed files under the same name
+warnings.filterwarnings("ignore", message="Duplicate name", module="zipfile")
 
 import faulthandler
-faulthandler.enable(open("faultlog.txt", "w"))
+# Image pipeline workers import this module too; only the app owns the fault log
+if multiprocessing.parent_process() is None:
+    faulthandler.enable(open("faultlog.txt", "w"))
 
 
 import numpy as np
@@ -15,13 +50,17 @@ import numpy as np
 from PySide6.QtWidgets import (
     QApplication, QWidget, QPushButton, QVBoxLayout, QLabel, QListWidget,
     QFileDialog, QHBoxLayout, QSlider, QMessageBox, QListWidgetItem,
-    QComboBox, QCheckBox, QSizePolicy, QDialog, QColorDialog, QSpinBox
+    QComboBox, QCheckBox, QSizePolicy, QDialog, QColorDialog, QSpinBox,
+    QMenu, QProgressDialog
 )
 
 from PySide6.QtGui import QPixmap, QImage, QIcon, QKeySequence, QShortcut, QColor
-from PySide6.QtCore import Qt, QTimer, QThread, Signal, QSize
+from PySide6.QtCore import Qt, QTimer, QThread, Signal, QSize, QPoint
 
-from pygrabber.dshow_graph import FilterGraph
+try:
+    from pygrabber.dshow_graph import FilterGraph
+except ImportError:
+    FilterGraph = None  # pygrabber is Windows only; other platforms probe indices
 
 
 class ThemeEditorDialog(QDialog):
@@ -80,6 +119,479 @@ class ThemeEditorDialog(QDialog):
         color = QColorDialog.getColor()
         if color.isValid():
             self.custom_theme["text_color"] = color.name()
+
+
+class MultiExportDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Export All")
+
+        layout = QVBoxLayout()
+
+        self.mp4_check = QCheckBox("MP4 video (full size)")
+        self.mp4_check.setChecked(True)
+        layout.addWidget(self.mp4_check)
+
+        gif_row = QHBoxLayout()
+        self.gif_check = QCheckBox("GIF animation, width")
+        self.gif_check.setChecked(True)
+        self.gif_width_spin = QSpinBox()
+        self.gif_width_spin.setRange(64, 4096)
+        self.gif_width_spin.setValue(480)
+        gif_row.addWidget(self.gif_check)
+        gif_row.addWidget(self.gif_width_spin)
+        layout.addLayout(gif_row)
+
+        sheet_row = QHBoxLayout()
+        self.sheet_check = QCheckBox("Contact sheet (PNG), thumbnail width")
+        self.sheet_check.setChecked(True)
+        self.sheet_width_spin = QSpinBox()
+        self.sheet_width_spin.setRange(32, 640)
+        self.sheet_width_spin.setValue(160)
+        sheet_row.addWidget(self.sheet_check)
+        sheet_row.addWidget(self.sheet_width_spin)
+        layout.addLayout(sheet_row)
+
+        self.sequence_check = QCheckBox("Image sequence (PNG files)")
+        layout.addWidget(self.sequence_check)
+
+        export_btn = QPushButton("Export")
+        export_btn.clicked.connect(self.accept)
+        layout.addWidget(export_btn)
+
+        self.setLayout(layout)
+
+
+class ChromaKeyDialog(QDialog):
+    def __init__(self, parent=None, settings=None):
+        super().__init__(parent)
+        self.setWindowTitle("Chroma Key")
+        self.settings = dict(CHROMA_KEY_DEFAULTS, **(settings or {}))
+
+        layout = QVBoxLayout()
+
+        self.enabled_check = QCheckBox("Replace the key colour")
+        self.enabled_check.setChecked(bool(settings))
+        layout.addWidget(self.enabled_check)
+
+        color_row = QHBoxLayout()
+        color_row.addWidget(QLabel("Key Color"))
+        self.color_display = QLabel()
+        self.color_display.setFixedSize(60, 20)
+        color_btn = QPushButton("Choose...")
+        color_btn.clicked.connect(self.pick_color)
+        color_row.addWidget(self.color_display)
+        color_row.addWidget(color_btn)
+        layout.addLayout(color_row)
+        self.show_color()
+
+        self.sliders = {}
+        for key, label_text, maximum in (
+            ("tolerance", "Tolerance", 120),
+            ("softness", "Edge Softness", 60),
+            ("spill", "Spill Suppression %", 100),
+        ):
+            row = QHBoxLayout()
+            row.addWidget(QLabel(label_text))
+            slider = QSlider(Qt.Horizontal)
+            slider.setRange(0, maximum)
+            value = self.settings[key]
+            slider.setValue(int(value * 100) if key == "spill" else int(value))
+            row.addWidget(slider)
+            layout.addLayout(row)
+            self.sliders[key] = slider
+
+        background_row = QHBoxLayout()
+        self.background_label = QLabel()
+        background_btn = QPushButton("Background Image...")
+        background_btn.clicked.connect(self.pick_background)
+        clear_btn = QPushButton("Black")
+        clear_btn.clicked.connect(lambda: self.set_background(None))
+        background_row.addWidget(self.background_label)
+        background_row.addWidget(background_btn)
+        background_row.addWidget(clear_btn)
+        layout.addLayout(background_row)
+        self.set_background(self.settings["background"])
+
+        apply_btn = QPushButton("Apply")
+        apply_btn.clicked.connect(self.accept)
+        layout.addWidget(apply_btn)
+
+        self.setLayout(layout)
+
+    def show_color(self):
+        b, g, r = self.settings["key"]
+        self.color_display.setStyleSheet(f"background-color: rgb({r}, {g}, {b})")
+
+    def pick_color(self):
+        b, g, r = self.settings["key"]
+        color = QColorDialog.getColor(QColor(r, g, b), self, "Choose Key Color")
+        if color.isValid():
+            self.settings["key"] = [color.blue(), color.green(), color.red()]
+            self.show_color()
+
+    def pick_background(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Background Image", "", "Images (*.png *.jpg *.jpeg *.bmp)")
+        if path:
+            self.set_background(path)
+
+    def set_background(self, path):
+        self.settings["background"] = path
+        self.background_label.setText(os.path.basename(path) if path else "Black background")
+
+    def get_settings(self):
+        # None when keying is switched off
+        if not self.enabled_check.isChecked():
+            return None
+        settings = dict(self.settings)
+        settings["tolerance"] = self.sliders["tolerance"].value()
+        settings["softness"] = self.sliders["softness"].value()
+        settings["spill"] = self.sliders["spill"].value() / 100
+        return settings
+
+
+# Frame sources all look like cv2.VideoCapture (isOpened/read/release/get/set)
+# so the capture code does not care whether frames come from a camera, a file
+# replayed at a fixed rate or a synthetic generator.
+class FrameSource:
+    def __init__(self, fps=30.0):
+        self.opened = False
+        self.frame_number = -1
+        self.timestamp = None  # monotonic time the current frame was "exposed"
+        self.set_fps(fps)
+
+    def set_fps(self, fps):
+        self.fps = max(float(fps), 0.1)
+        self.interval = 1.0 / self.fps
+        self.next_deadline = time.monotonic()
+
+    def isOpened(self):
+        return self.opened
+
+    def release(self):
+        self.opened = False
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.frame_number
+        return 0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FPS:
+            self.set_fps(value)
+            return True
+        return False
+
+    def size(self):
+        return int(self.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def modes(self):
+        # Frame sizes the source can switch between, smallest first
+        return [self.size()]
+
+    def set_size(self, width, height):
+        return self.size() == (width, height)
+
+    def read_sized(self, size, deadline, stop=None):
+        # Cameras can still deliver a few frames of the old mode after a switch
+        while time.monotonic() < deadline and not (stop and stop.is_set()):
+            ret, frame = self.read()
+            if ret and (frame.shape[1], frame.shape[0]) == tuple(size):
+                return frame
+        return None
+
+    def read_still(self, size, timeout=3.0, stop=None):
+        # One frame at size, then back to the current size. Returns the frame
+        # (None if none came in time or stop was set), the ms from starting the
+        # switch to that frame and the ms from there to the first frame at the
+        # old size again.
+        preview = self.size()
+        start = time.monotonic()
+        frame = self.read_sized(size, start + timeout, stop) if self.set_size(*size) else None
+        switched = time.monotonic()
+        self.set_size(*preview)
+        self.read_sized(preview, switched + timeout, stop)
+        return frame, 1000 * (switched - start), 1000 * (time.monotonic() - switched)
+
+    def wait_for_next_frame(self, jitter=0.0):
+        # Block like a real camera until the next frame period. A reader that
+        # falls behind skips the frames it missed instead of building a backlog.
+        now = time.monotonic()
+        missed = 0
+        if self.frame_number < 0:
+            self.next_deadline = now
+        elif now > self.next_deadline + self.interval:
+            missed = int((now - self.next_deadline) / self.interval)
+            self.frame_number += missed
+            self.next_deadline += missed * self.interval
+
+        delay = self.next_deadline - now + jitter
+        if delay > 0:
+            time.sleep(delay)
+
+        self.frame_number += 1
+        self.timestamp = self.next_deadline
+        self.next_deadline += self.interval
+        return missed
+
+    def read(self):
+        return False, None
+
+
+# (camera index, capture backend) -> frame sizes it accepted, smallest first.
+# Probing restarts the camera once per size, so it happens once per session.
+CAMERA_MODES = {}
+
+
+class CameraFrameSource(FrameSource):
+    PROBE_SIZES = [(640, 480), (1280, 720), (1920, 1080), (2560, 1440), (3840, 2160), (4096, 2160)]
+
+    def __init__(self, index):
+        self.index = index
+        self.cap = cv2.VideoCapture(index)
+        super().__init__(self.cap.get(cv2.CAP_PROP_FPS) or 30.0)
+        self.opened = self.cap.isOpened()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if ret:
+            self.frame_number += 1
+            self.timestamp = time.monotonic()
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+        self.opened = False
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def modes(self):
+        key = (self.index, self.cap.getBackendName())
+        if key not in CAMERA_MODES:
+            start = time.perf_counter()
+            current = self.size()
+            found = {current}
+            for width, height in self.PROBE_SIZES:
+                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+                found.add(self.size())  # drivers settle on their nearest mode
+            self.set_size(*current)
+            CAMERA_MODES[key] = sorted(found, key=lambda size: size[0] * size[1])
+            print(f"Camera {self.index} modes: {', '.join(f'{w}x{h}' for w, h in CAMERA_MODES[key])} "
+                  f"(probed in {1000 * (time.perf_counter() - start):.0f} ms)")
+        return CAMERA_MODES[key]
+
+    def set_size(self, width, height):
+        if self.size() != (width, height):
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        return self.size() == (width, height)
+
+
+class VideoFileFrameSource(FrameSource):
+    # Replays a video file, or a folder of images in name order, at a set fps
+    IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+    def __init__(self, path, fps=None, loop=True):
+        self.path = path
+        self.loop = loop
+        self.cap = None
+        self.images = []
+        self.image_index = 0
+
+        if os.path.isdir(path):
+            self.images = [
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith(self.IMAGE_EXTENSIONS)
+            ]
+            super().__init__(fps or 12.0)
+            self.opened = bool(self.images)
+        else:
+            self.cap = cv2.VideoCapture(path)
+            super().__init__(fps or self.cap.get(cv2.CAP_PROP_FPS) or 30.0)
+            self.opened = self.cap.isOpened()
+
+    def read_next(self):
+        if self.cap is not None:
+            ret, frame = self.cap.read()
+            if not ret and self.loop:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self.cap.read()
+            return ret, frame
+
+        if self.image_index >= len(self.images):
+            if not self.loop:
+                return False, None
+            self.image_index = 0
+        frame = cv2.imread(self.images[self.image_index])
+        self.image_index += 1
+        return frame is not None, frame
+
+    def read(self):
+        if not self.opened:
+            return False, None
+        missed = self.wait_for_next_frame()
+
+        # Keep replay in real time by skipping the frames the reader missed
+        if self.cap is not None:
+            for _ in range(missed):
+                self.cap.grab()
+        elif self.images:
+            self.image_index = (self.image_index + missed) % len(self.images)
+        return self.read_next()
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+        self.opened = False
+
+    def get(self, prop):
+        if self.cap is not None and prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT):
+            return self.cap.get(prop)
+        return super().get(prop)
+
+
+class SyntheticFrameSource(FrameSource):
+    # Moving test pattern with a frame counter. Jitter delays delivery by up to
+    # jitter_ms, and a dropped frame is a frame period that passes without a
+    # frame being delivered, like a camera under USB bandwidth pressure. A
+    # still size adds a second, larger mode, and switching modes takes
+    # switch_ms, like a camera restarting its stream.
+    def __init__(self, width=1280, height=720, fps=30.0, jitter_ms=0.0, drop_rate=0.0, seed=0,
+                 still=None, switch_ms=0.0):
+        super().__init__(fps)
+        self.jitter = jitter_ms / 1000.0
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.dropped = 0
+        self.sizes = sorted({(width, height), tuple(still or (width, height))}, key=lambda size: size[0] * size[1])
+        self.switch = switch_ms / 1000.0
+        self.bases = {}
+        self.use_size(width, height)
+        self.opened = True
+
+    def use_size(self, width, height):
+        if (width, height) not in self.bases:
+            # Twice as wide as the output so each frame is a cheap slice
+            x = np.linspace(0, 4 * np.pi, 2 * width, dtype=np.float32)
+            y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+            base = np.empty((height, 2 * width, 3), np.uint8)
+            base[..., 0] = (127 + 127 * np.sin(x))[None, :] * (1 - y)
+            base[..., 1] = (127 + 127 * np.cos(x))[None, :] * y
+            base[..., 2] = 255 * y
+            self.bases[width, height] = base
+        self.base = self.bases[width, height]
+        self.width = width
+        self.height = height
+
+    def modes(self):
+        return list(self.sizes)
+
+    def set_size(self, width, height):
+        if (width, height) not in self.sizes:
+            return self.size() == (width, height)
+        if (width, height) != self.size():
+            time.sleep(self.switch)
+            self.use_size(width, height)
+            self.next_deadline = time.monotonic()  # the stream starts over
+        return True
+
+    def read(self):
+        if not self.opened:
+            return False, None
+
+        if self.drop_rate and self.random.random() < self.drop_rate:
+            self.frame_number += 1
+            self.next_deadline += self.interval
+            self.dropped += 1
+
+        jitter = self.random.uniform(0, self.jitter) if self.jitter else 0.0
+        self.wait_for_next_frame(jitter)
+
+        shift = (self.frame_number * 8) % self.width
+        frame = self.base[:, shift:shift + self.width].copy()
+        cv2.putText(frame, f"{self.frame_number:06d}", (20, self.height - 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 3)
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        return super().get(prop)
+
+
+def open_frame_source(spec):
+    # spec is a camera index, or one of
+    #   camera:N
+    #   file:PATH[@FPS]                      (video file or image folder)
+    #   synthetic[:WxH@FPS,jitter=MS,drop=RATE,seed=N,still=WxH,switch=MS]
+    if isinstance(spec, int):
+        return CameraFrameSource(spec)
+
+    kind, _, arg = str(spec).partition(":")
+    if kind == "camera":
+        return CameraFrameSource(int(arg or 0))
+
+    if kind == "file":
+        fps = None
+        path, at, rate = arg.rpartition("@")
+        if at and rate.replace(".", "", 1).isdigit():
+            fps = float(rate)
+        else:
+            path = arg
+        return VideoFileFrameSource(path, fps)
+
+    if kind == "synthetic":
+        options = {}
+        for part in filter(None, arg.split(",")):
+            if "=" in part:
+                key, value = part.split("=", 1)
+                if key.strip() == "still":
+                    options["still"] = tuple(int(v) for v in value.lower().split("x"))
+                else:
+                    options[key.strip()] = float(value)
+            else:
+                size, _, fps = part.partition("@")
+                if size:
+                    width, height = size.lower().split("x")
+                    options["width"], options["height"] = int(width), int(height)
+                if fps:
+                    options["fps"] = float(fps)
+        return SyntheticFrameSource(
+            width=options.get("width", 1280),
+            height=options.get("height", 720),
+            fps=options.get("fps", 30.0),
+            jitter_ms=options.get("jitter", 0.0),
+            drop_rate=options.get("drop", 0.0),
+            seed=int(options.get("seed", 0)),
+            still=options.get("still"),
+            switch_ms=options.get("switch", 0.0),
+        )
+
+    raise ValueError(f"Unknown frame source: {spec}")
+
+
+def frame_source_label(spec):
+    kind, _, arg = str(spec).partition(":")
+    if kind == "file":
+        name = os.path.basename(arg.rstrip("/\\")) or arg
+        return f"Replay: {name}"
+    if kind == "synthetic":
+        return f"Synthetic Test Pattern {arg}".strip()
+    return str(spec)
+
+
 # 1) Camera search dialog popup
 class CameraSearchDialog(QWidget):
     def __init__(self, parent=None):
@@ -97,9 +609,13 @@ class CameraSearchDialog(QWidget):
 class CameraSearchThread(QThread):
     cameras_found = Signal(list)  # Will emit list of (index, name) tuples
 
+    MAX_PROBED_CAMERAS = 5
+
     def run(self):
-        graph = FilterGraph()
-        device_names = graph.get_input_devices()
+        if FilterGraph is not None:
+            device_names = FilterGraph().get_input_devices()
+        else:
+            device_names = [f"Camera {i}" for i in range(self.MAX_PROBED_CAMERAS)]
         found_cameras = []
 
         for i, name in enumerate(device_names):
@@ -112,7 +628,7 @@ class CameraSearchThread(QThread):
 
 class CameraOpenThread(QThread):
     # In CameraOpenThread
-    camera_opened = Signal(bool, int, object)  # success, index, cap
+    camera_opened = Signal(bool, object, object)  # success, index or source spec, cap
   # success flag, camera index
 
     def __init__(self, index):
@@ -121,12 +637,18 @@ class CameraOpenThread(QThread):
         self.cap = None
 
     def run(self):
-        cap = cv2.VideoCapture(self.index)
+        try:
+            cap = open_frame_source(self.index)
+        except Exception as e:
+            print(f"Failed to open frame source {self.index}: {e}")
+            cap = FrameSource()
         success = cap.isOpened()
 
         if not success:
             cap.release()
             cap = None
+        else:
+            cap.modes()  # probe the modes now, before the camera is shared
 
         self.cap = cap
         self.camera_opened.emit(success, self.index, cap if success else None)
@@ -136,6 +658,1270 @@ class CameraOpenThread(QThread):
             self.cap.release()
             self.cap = None
 
+class CameraReconnectThread(QThread):
+    # Reopens the same source after it stopped delivering frames, retrying with
+    # exponential backoff. A hotplug event wakes it early, so a replugged camera
+    # comes back as soon as its device node reappears instead of after a rescan.
+    reconnected = Signal(bool, object, object, int)  # success, index or source spec, cap, attempts
+
+    def __init__(self, index, first_delay=0.05, max_delay=2.0, give_up_after=8.0):
+        super().__init__()
+        self.index = index
+        self.first_delay = first_delay
+        self.max_delay = max_delay
+        self.give_up_after = give_up_after
+        self.wake_event = Event()
+        self.cancelled = False
+
+    def wake(self):
+        self.wake_event.set()
+
+    def cancel(self):
+        self.cancelled = True
+        self.wake_event.set()
+
+    def run(self):
+        delay = self.first_delay
+        deadline = time.monotonic() + self.give_up_after
+        attempts = 0
+        while not self.cancelled:
+            attempts += 1
+            try:
+                cap = open_frame_source(self.index)
+            except Exception as e:
+                print(f"Reconnect attempt {attempts} for {self.index} failed: {e}")
+                cap = None
+
+            # An open device that cannot deliver a frame has not recovered yet
+            if cap is not None and cap.isOpened() and cap.read()[0]:
+                cap.modes()  # known from the first open unless the backend changed
+                self.reconnected.emit(True, self.index, cap, attempts)
+                return
+            if cap is not None:
+                cap.release()
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.wake_event.wait(min(delay, remaining))
+            self.wake_event.clear()
+            delay = min(delay * 2, self.max_delay)
+
+        if not self.cancelled:
+            self.reconnected.emit(False, self.index, None, attempts)
+
+
+class DeviceWatcher(QThread):
+    # Reports video devices appearing and disappearing. On Linux this watches
+    # /dev with inotify; elsewhere, or if inotify is unavailable, it polls the
+    # device list once a second.
+    devices_changed = Signal(list, list)  # added, removed
+
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_ATTRIB = 0x004
+    POLL_INTERVAL = 1.0
+
+    def __init__(self, path="/dev", prefix="video"):
+        super().__init__()
+        self.path = path
+        self.prefix = prefix
+        self.running = True
+
+    def stop(self):
+        self.running = False
+        self.wait()
+
+    def list_devices(self):
+        if os.path.isdir(self.path):
+            return {name for name in os.listdir(self.path) if name.startswith(self.prefix)}
+        if FilterGraph is not None:
+            try:
+                return set(FilterGraph().get_input_devices())
+            except Exception as e:
+                print(f"Device listing failed: {e}")
+        return set()
+
+    def open_inotify(self):
+        if not sys.platform.startswith("linux") or not os.path.isdir(self.path):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                return None
+            mask = self.IN_CREATE | self.IN_DELETE | self.IN_ATTRIB
+            if libc.inotify_add_watch(fd, os.fsencode(self.path), mask) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except Exception as e:
+            print(f"inotify unavailable, polling for devices: {e}")
+            return None
+
+    def run(self):
+        known = self.list_devices()
+        fd = self.open_inotify()
+        try:
+            while self.running:
+                if fd is None:
+                    time.sleep(self.POLL_INTERVAL)
+                else:
+                    readable, _, _ = select.select([fd], [], [], 0.5)
+                    if not readable:
+                        continue
+                    names = self.read_events(fd)
+                    if not any(name.startswith(self.prefix) for name in names):
+                        continue
+
+                # Diff the listing rather than trusting single events, so a
+                # permission change after creation is not reported twice
+                current = self.list_devices()
+                added, removed = sorted(current - known), sorted(known - current)
+                known = current
+                if added or removed:
+                    self.devices_changed.emit(added, removed)
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def read_events(self, fd):
+        names = []
+        try:
+            data = os.read(fd, 4096)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset + 16 <= len(data):
+            _, _, _, length = struct.unpack_from("iIII", data, offset)
+            name = data[offset + 16:offset + 16 + length].split(b"\0", 1)[0]
+            names.append(os.fsdecode(name))
+            offset += 16 + length
+        return names
+
+
+class CaptureWorker(QThread):
+    # Reads the open frame source continuously so a slow read never blocks the
+    # GUI. Only the newest frame is kept: the preview takes it whenever it is
+    # ready and frames it was too slow to show are simply replaced.
+    read_failed = Signal(object)  # the source that stopped delivering frames
+
+    def __init__(self, cap_lock, get_cap):
+        super().__init__()
+        self.cap_lock = cap_lock
+        self.get_cap = get_cap
+        self.lock = Condition()  # notified on every new frame
+        self.frame = None
+        self.frame_time = None  # monotonic time the frame was read
+        self.previous = (None, None)  # the frame before it, and its read time
+        self.sequence = 0
+        self.failed_cap = None
+        self.analyzer = None  # FrameAnalyzer, when the focus/exposure overlay is on
+        self.preroll = PreRollBuffer()
+        self.running = True
+
+    def latest(self):
+        with self.lock:
+            return self.frame, self.sequence
+
+    def frame_nearest(self, when, timeout):
+        # The frame read closest to monotonic time when (the last one before
+        # it or the first one after it) with its read time, or (None, None)
+        # if the camera delivers nothing in time
+        with self.lock:
+            if not self.lock.wait_for(lambda: self.frame_time is not None and self.frame_time >= when, timeout):
+                return None, None
+            previous, previous_time = self.previous
+            if previous_time is not None and when - previous_time < self.frame_time - when:
+                return previous, previous_time
+            return self.frame, self.frame_time
+
+    def run(self):
+        source = None
+        while self.running:
+            ret, frame = False, None
+            with self.cap_lock:
+                cap = self.get_cap()
+                ready = cap is not None and cap is not self.failed_cap and cap.isOpened()
+                if ready:
+                    ret, frame = cap.read()
+
+            if not ready:
+                time.sleep(0.01)
+                continue
+            if not ret or frame is None:
+                # Report once per source; the GUI decides how to recover
+                self.failed_cap = cap
+                self.read_failed.emit(cap)
+                continue
+            if cap is not source:
+                # Never pick a frame from the previous camera
+                self.preroll.clear()
+                source = cap
+
+            with self.lock:
+                self.previous = (self.frame, self.frame_time)
+                self.frame = frame
+                self.frame_time = time.monotonic()
+                self.sequence += 1
+                self.lock.notify_all()
+
+            self.preroll.add(frame, self.sequence)
+            analyzer = self.analyzer
+            if analyzer is not None:
+                analyzer.submit(frame, self.sequence)
+
+    def stop(self):
+        self.running = False
+        self.wait()
+
+
+class PreRollBuffer:
+    # The last few camera frames, each scored as it arrives, so a capture can
+    # take the sharpest, stillest one instead of whatever was newest (often a
+    # hand still leaving the shot). Frames are kept by reference, never copied.
+    FRAMES = 6  # about 0.2 s at 30 fps
+    SCORE_WIDTH = 320
+
+    def __init__(self, frames=FRAMES):
+        self.lock = Lock()
+        self.entries = deque(maxlen=frames)  # (sequence, frame, sharpness, motion)
+        self.previous = None  # small grayscale copy of the last frame
+        self.score_ms = None
+
+    def add(self, frame, sequence):
+        # CPU time of this thread, so time spent waiting for the CPU is not counted
+        start = time.thread_time()
+        height, width = frame.shape[:2]
+        # Nearest-neighbour sampling keeps edges as sharp as they are in the
+        # full frame, and is the cheapest way down from 1080p
+        size = (self.SCORE_WIDTH, max(1, height * self.SCORE_WIDTH // width))
+        gray = cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_NEAREST), cv2.COLOR_BGR2GRAY)
+        sharpness = float(cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_16S))[1][0, 0] ** 2)
+        motion = 0.0
+        if self.previous is not None and self.previous.shape == gray.shape:
+            motion = cv2.mean(cv2.absdiff(gray, self.previous))[0]
+        self.previous = gray
+
+        with self.lock:
+            self.entries.append((sequence, frame, sharpness, motion))
+        elapsed_ms = 1000 * (time.thread_time() - start)
+        self.score_ms = elapsed_ms if self.score_ms is None else 0.95 * self.score_ms + 0.05 * elapsed_ms
+
+    def best(self):
+        # (frame, sequence, sharpness, motion) of the best recent frame, or None.
+        # Motion is the mean change from the frame before in gray levels; a
+        # frame with a hand moving through it scores far lower than a still one.
+        with self.lock:
+            entries = list(self.entries)
+        if not entries:
+            return None
+        sequence, frame, sharpness, motion = max(entries, key=lambda entry: entry[2] / (1.0 + entry[3]))
+        return frame, sequence, sharpness, motion
+
+    def nbytes(self):
+        with self.lock:
+            return sum(entry[1].nbytes for entry in self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        self.previous = None
+
+
+class FrameAnalysis:
+    # Focus and exposure of one camera frame, measured on a small copy
+    def __init__(self, sequence, peaking, highlights, shadows, histogram, sharpness):
+        self.sequence = sequence
+        self.peaking = peaking  # mask of in-focus edges
+        self.highlights = highlights  # mask of clipped highlights
+        self.highlights_clipped = np.count_nonzero(highlights) / highlights.size
+        self.shadows_clipped = np.count_nonzero(shadows) / shadows.size
+        self.histogram = histogram  # luma, HISTOGRAM_BINS bins summing to 1
+        self.sharpness = sharpness  # variance of the Laplacian
+
+
+class FrameAnalyzer:
+    # Runs in the capture worker right after a frame is read, on a copy at
+    # most WIDTH pixels across. Analysis has a strict time budget: when it
+    # runs over, fewer frames are analyzed (every 2nd, 4th, ...) so the camera
+    # is never read late; when it is well under, every frame is again.
+    WIDTH = 480
+    HISTOGRAM_BINS = 64
+    PEAKING_THRESHOLD = 48  # Laplacian response that counts as a sharp edge
+    MAX_STRIDE = 16
+
+    def __init__(self, budget_ms=4.0):
+        self.budget_ms = budget_ms
+        self.stride = 1  # analyze every stride-th frame
+        self.average_ms = None
+        self.analyzed = 0
+        self.skipped = 0
+        self.result = None
+
+    def submit(self, frame, sequence):
+        if sequence % self.stride:
+            self.skipped += 1
+            return
+
+        start = time.perf_counter()
+        self.result = self.analyze(frame, sequence)
+        elapsed_ms = 1000 * (time.perf_counter() - start)
+        self.analyzed += 1
+
+        self.average_ms = elapsed_ms if self.average_ms is None else 0.8 * self.average_ms + 0.2 * elapsed_ms
+        if self.average_ms > self.budget_ms and self.stride < self.MAX_STRIDE:
+            self.stride *= 2
+            self.average_ms = None
+        elif self.average_ms < self.budget_ms * 0.4 and self.stride > 1 and self.analyzed % 30 == 0:
+            self.stride //= 2
+
+    def analyze(self, frame, sequence):
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.WIDTH / width)
+        if scale < 1.0:
+            # Bilinear sampling keeps fine detail crisp (area averaging would
+            # soften it) and costs a fraction of the time
+            frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_LINEAR)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        edges = cv2.Laplacian(gray, cv2.CV_16S, ksize=3)
+        sharpness = float(cv2.meanStdDev(edges)[1][0, 0] ** 2)
+        peaking = cv2.convertScaleAbs(edges) > self.PEAKING_THRESHOLD
+
+        histogram = cv2.calcHist([gray], [0], None, [self.HISTOGRAM_BINS], [0, 256]).ravel()
+        histogram /= max(histogram.sum(), 1.0)
+        # A channel at its limit counts, so a blown-out red is caught too
+        blue, green, red = cv2.split(frame)
+        highlights = cv2.max(cv2.max(blue, green), red) >= 250
+        shadows = gray <= 5
+        return FrameAnalysis(sequence, peaking, highlights, shadows, histogram, sharpness)
+
+    def stats(self):
+        average = self.average_ms or 0.0
+        rate = "every frame" if self.stride == 1 else f"every {self.stride} frames"
+        return (f"Focus/exposure analysis: {rate}, {average:.1f} ms each (budget {self.budget_ms:.0f} ms), "
+                f"{self.analyzed} analyzed, {self.skipped} skipped")
+
+
+def draw_frame_analysis(rgb, analysis):
+    # Drawn straight onto the preview-sized image about to be shown: in-focus
+    # edges red, clipped highlights magenta, and a histogram in the corner
+    height, width = rgb.shape[:2]
+    peaking = cv2.resize(analysis.peaking.view(np.uint8), (width, height), interpolation=cv2.INTER_NEAREST)
+    highlights = cv2.resize(analysis.highlights.view(np.uint8), (width, height), interpolation=cv2.INTER_NEAREST)
+    rgb[peaking.view(bool)] = (255, 40, 40)
+    rgb[highlights.view(bool)] = (255, 0, 255)
+
+    panel_w, panel_h = min(160, width), min(60, height)
+    x0, y0 = 8, height - panel_h - 8
+    if x0 + panel_w > width or y0 < 0:
+        return rgb
+    panel = rgb[y0:y0 + panel_h, x0:x0 + panel_w]
+    panel //= 3  # darken behind the graph
+    peak = analysis.histogram.max() or 1.0
+    xs = np.linspace(0, panel_w - 1, len(analysis.histogram)).astype(np.int32)
+    ys = (panel_h - 1 - analysis.histogram / peak * (panel_h - 14)).astype(np.int32)
+    cv2.polylines(panel, [np.stack([xs, ys], axis=1)], False, (255, 255, 255), 1)
+
+    warning = analysis.highlights_clipped > 0.01 or analysis.shadows_clipped > 0.05
+    label = f"clip {analysis.highlights_clipped:.0%}/{analysis.shadows_clipped:.0%} sharp {analysis.sharpness:.0f}"
+    cv2.putText(panel, label, (3, 10), cv2.FONT_HERSHEY_PLAIN, 0.7,
+                (255, 80, 80) if warning else (220, 220, 220), 1, cv2.LINE_AA)
+    return rgb
+
+
+class StillCaptureThread(QThread):
+    # One full-resolution still from a camera previewing at a lower, faster
+    # resolution: the camera switches to its largest mode, the first frame at
+    # that size is kept and the camera switches back. The capture worker waits
+    # on the camera lock meanwhile, so the preview only pauses. The still is
+    # written after the preview is running again. cancel() makes it give up at
+    # the next camera read, so the GUI never waits out a whole still.
+    still_captured = Signal(str, str)  # path, summary with the switch times
+    still_failed = Signal(str)  # reason
+
+    def __init__(self, cap_lock, cap, path, timeout=3.0):
+        super().__init__()
+        self.cap_lock = cap_lock
+        self.cap = cap
+        self.path = path
+        self.timeout = timeout
+        self.stop = Event()
+
+    def cancel(self):
+        self.stop.set()
+
+    def cancelled(self):
+        return self.stop.is_set()
+
+    def run(self):
+        with self.cap_lock:
+            if self.cap is None or not self.cap.isOpened():
+                self.still_failed.emit("no camera")
+                return
+            preview = self.cap.size()
+            # Modes were probed when the camera opened, so this is a lookup
+            width, height = max(self.cap.modes(), key=lambda size: size[0] * size[1])
+            if width * height <= preview[0] * preview[1]:
+                self.still_failed.emit(f"the camera has no mode larger than {preview[0]}x{preview[1]}")
+                return
+            frame, switch_ms, back_ms = self.cap.read_still((width, height), self.timeout, self.stop)
+
+        if self.stop.is_set():
+            self.still_failed.emit("cancelled")
+            return
+        if frame is None:
+            self.still_failed.emit(f"no frame at {width}x{height}")
+            return
+        begin = time.perf_counter()
+        if not cv2.imwrite(self.path, frame):
+            self.still_failed.emit("could not write the frame")
+            return
+        self.still_captured.emit(
+            self.path,
+            f"Full-resolution still {width}x{height}: switched in {switch_ms:.0f} ms, back to the "
+            f"{preview[0]}x{preview[1]} preview in {back_ms:.0f} ms, "
+            f"written in {1000 * (time.perf_counter() - begin):.0f} ms",
+        )
+
+
+class IntervalCaptureThread(QThread):
+    # Time-lapse capture. Shot k is due at start + k * interval on the
+    # monotonic clock, so sleep overshoot and the time spent encoding and
+    # writing a frame never add up into drift. Each shot is the camera frame
+    # read closest to its deadline, so it is off by at most half a camera
+    # frame. Every shot is logged with its scheduled and actual time.
+    frame_captured = Signal(str, float)  # path, ms off its deadline (negative if early)
+    shot_missed = Signal(int, str)  # shot number, reason
+    LOG_FIELDS = ["shot", "scheduled", "captured", "offset_ms", "write_ms", "frame"]
+
+    def __init__(self, capture_worker, interval, next_path, log_path=None):
+        super().__init__()
+        self.capture_worker = capture_worker
+        self.interval = interval
+        self.next_path = next_path  # called from this thread to name each frame
+        self.log_path = log_path
+        self.stopping = Event()
+        self.offsets_ms = []
+        self.write_ms = []
+        self.missed = 0
+
+    def stop(self):
+        self.stopping.set()
+        self.wait()
+
+    def run(self):
+        log_file = None
+        if self.log_path:
+            new_log = not os.path.exists(self.log_path)
+            log_file = open(self.log_path, "a", newline="")
+            log = csv.DictWriter(log_file, self.LOG_FIELDS)
+            if new_log:
+                log.writeheader()
+
+        start = time.monotonic()
+        wall_start = time.time()
+
+        def stamp(moment):
+            return datetime.datetime.fromtimestamp(wall_start + moment - start).isoformat(timespec="milliseconds")
+
+        shot = 0
+        try:
+            while True:
+                due = start + shot * self.interval
+                while not self.stopping.is_set() and time.monotonic() < due:
+                    self.stopping.wait(due - time.monotonic())
+                if self.stopping.is_set():
+                    break
+
+                row = {"shot": shot, "scheduled": stamp(due)}
+                frame, frame_time = self.capture_worker.frame_nearest(due, timeout=min(self.interval, 2.0))
+                if frame is None:
+                    self.missed += 1
+                    row["frame"] = "missed: no camera frame"
+                    self.shot_missed.emit(shot, "no camera frame")
+                else:
+                    path = self.next_path()
+                    begin = time.perf_counter()
+                    ok = cv2.imwrite(path, frame)
+                    write_ms = 1000 * (time.perf_counter() - begin)
+                    offset_ms = 1000 * (frame_time - due)
+                    row.update(captured=stamp(frame_time), offset_ms=f"{offset_ms:.1f}", write_ms=f"{write_ms:.1f}")
+                    if ok:
+                        self.offsets_ms.append(offset_ms)
+                        self.write_ms.append(write_ms)
+                        row["frame"] = os.path.basename(path)
+                        self.frame_captured.emit(path, offset_ms)
+                    else:
+                        self.missed += 1
+                        row["frame"] = "missed: could not write"
+                        self.shot_missed.emit(shot, "could not write the frame")
+                if log_file:
+                    log.writerow(row)
+                    log_file.flush()
+
+                # A shot that overran the interval skips the deadlines already gone
+                shot = max(shot + 1, math.ceil((time.monotonic() - start) / self.interval))
+        finally:
+            if log_file:
+                log_file.close()
+
+    def summary(self):
+        if not self.offsets_ms:
+            return f"Time-lapse: no frames captured, {self.missed} shots missed"
+        errors = sorted(abs(offset) for offset in self.offsets_ms)
+        return (
+            f"Time-lapse: {len(errors)} frames every {self.interval:g} s, {self.missed} shots missed; "
+            f"off schedule by {sum(errors) / len(errors):.1f} ms on average, {errors[-1]:.1f} ms at worst; "
+            f"writing took up to {max(self.write_ms):.0f} ms"
+        )
+
+
+class PreviewGovernor:
+    # Keeps the live preview at its tick rate by trading preview quality for
+    # time. Each level lowers the preview resolution or the onion skin cost;
+    # sustained overruns step down a level and a long run well under budget
+    # steps back up. Captures always use the full-resolution frame.
+    LEVELS = [
+        # name, preview scale, onion layer cap
+        ("Full", 1.0, None),
+        ("Reduced", 0.5, None),
+        ("Low", 0.5, 1),
+        ("Minimal", 0.25, 1),
+    ]
+    DEGRADE_AFTER = 10
+    RECOVER_AFTER = 60
+
+    def __init__(self, interval_ms=30):
+        # Half the tick is for preview work, the rest for the event loop
+        self.budget_ms = interval_ms * 0.5
+        self.level = 0
+        self.average_ms = None
+        self.over = 0
+        self.under = 0
+        self.shown = 0
+        self.skipped = 0
+
+    @property
+    def name(self):
+        return self.LEVELS[self.level][0]
+
+    @property
+    def scale(self):
+        return self.LEVELS[self.level][1]
+
+    def layer_cap(self, layers):
+        cap = self.LEVELS[self.level][2]
+        return layers if cap is None else min(layers, cap)
+
+    def record(self, elapsed_ms, skipped):
+        # Returns True when the quality level changed
+        self.shown += 1
+        self.skipped += skipped
+        if self.average_ms is None:
+            self.average_ms = elapsed_ms
+        else:
+            self.average_ms = 0.8 * self.average_ms + 0.2 * elapsed_ms
+
+        if self.average_ms > self.budget_ms:
+            self.over += 1
+            self.under = 0
+            if self.over >= self.DEGRADE_AFTER and self.level < len(self.LEVELS) - 1:
+                self.level += 1
+                self.over = 0
+                self.average_ms = None  # measure the new level from scratch
+                return True
+        elif self.average_ms < self.budget_ms * 0.4:
+            self.under += 1
+            self.over = 0
+            if self.under >= self.RECOVER_AFTER and self.level > 0:
+                self.level -= 1
+                self.under = 0
+                self.average_ms = None
+                return True
+        else:
+            self.over = 0
+            self.under = 0
+        return False
+
+    def stats(self):
+        average = self.average_ms or 0.0
+        return (
+            f"Preview: {self.name} quality, {average:.1f} ms per frame (budget {self.budget_ms:.0f} ms)\n"
+            f"{self.shown} frames shown, {self.skipped} stale frames skipped"
+        )
+
+
+class FrameDecodeThread(QThread):
+    # Decodes timeline frames for previews/scrubbing off the GUI thread. Only
+    # the newest request is kept: asking for another frame cancels whatever
+    # was still waiting, so dragging never builds up a queue of stale decodes.
+    frame_decoded = Signal(object, object, float)  # key, QImage (None if unreadable), decode ms
+
+    def __init__(self):
+        super().__init__()
+        self.condition = Condition()
+        self.request = None
+        self.stopping = False
+
+    def request_frame(self, key, path, size):
+        with self.condition:
+            self.request = (key, path, size)
+            self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.request is None and not self.stopping:
+                    self.condition.wait()
+                if self.stopping:
+                    return
+                key, path, size = self.request
+                self.request = None
+
+            start = time.perf_counter()
+            frame = cv2.imread(path)
+            if frame is None:
+                self.frame_decoded.emit(key, None, 0.0)
+                continue
+
+            h, w = frame.shape[:2]
+            scale = min(size[0] / w, size[1] / h, 1.0)
+            if scale < 1.0:
+                frame = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            h, w = frame.shape[:2]
+            image = QImage(frame.data, w, h, 3 * w, QImage.Format_RGB888).copy()
+            self.frame_decoded.emit(key, image, 1000 * (time.perf_counter() - start))
+
+
+class FrameImportThread(QThread):
+    # Imports a video file or a folder of images into the project. Video is
+    # decoded here (a capture can only be read in order); resizing and PNG
+    # encoding, the expensive part, is spread over the image pipeline workers.
+    progress = Signal(int, int)  # done, total
+    import_finished = Signal(list, bool)  # imported paths in order, cancelled
+
+    def __init__(self, pipeline, source_path, next_path, size=None, fps=None):
+        super().__init__()
+        self.pipeline = pipeline
+        self.source_path = source_path
+        # Called from this thread to name each frame. It is the app's own
+        # namer, so frames captured meanwhile (a time-lapse) never collide.
+        self.next_path = next_path
+        self.size = size
+        self.fps = fps
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        window = 2 * max(self.pipeline.workers, 1)
+        pending = deque()
+        imported = []
+        done = 0
+
+        def finish_oldest():
+            nonlocal done
+            buffer, path, future = pending.popleft()
+            try:
+                ok = future.result()
+            except Exception as e:
+                print(f"Import of {path} failed: {e}")
+                ok = False
+            if buffer is not None:
+                self.pipeline.release(buffer)
+            if ok:
+                imported.append(path)
+            done += 1
+            if done % 10 == 0:
+                self.progress.emit(done, total)
+
+        if os.path.isdir(self.source_path):
+            images = [
+                os.path.join(self.source_path, name) for name in sorted(os.listdir(self.source_path))
+                if name.lower().endswith(VideoFileFrameSource.IMAGE_EXTENSIONS)
+            ]
+            total = len(images)
+            for image_path in images:
+                if self.cancelled:
+                    break
+                if len(pending) >= window:
+                    finish_oldest()
+                path = self.next_path()
+                pending.append((None, path, self.pipeline.submit(pipeline_job_import_file, image_path, path, self.size)))
+        else:
+            cap = cv2.VideoCapture(self.source_path)
+            source_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            # Keep the clip's timing by sampling it at the project frame rate
+            step = max(source_fps / self.fps, 1.0) if self.fps else 1.0
+            total = max(int(frame_count / step), 1)
+
+            index = 0
+            next_keep = 0.0
+            while not self.cancelled:
+                if index < int(next_keep):
+                    if not cap.grab():
+                        break
+                    index += 1
+                    continue
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                index += 1
+                next_keep += step
+
+                if len(pending) >= window:
+                    finish_oldest()
+                buffer = self.pipeline.acquire(frame.shape)
+                buffer.array[:] = frame
+                path = self.next_path()
+                pending.append((buffer, path, self.pipeline.submit(pipeline_job_import_frame, buffer.desc, path, self.size)))
+            cap.release()
+
+        while pending:
+            finish_oldest()
+        self.progress.emit(done, max(total, done))
+        self.import_finished.emit(imported, self.cancelled)
+
+
+class StallWatchdog(QThread):
+    # Notices when the GUI event loop stops turning. A heartbeat timer on the
+    # GUI thread stamps the time; when it goes quiet for longer than the
+    # threshold this thread logs the GUI thread's stack straight away (so a
+    # freeze that ends with the app being killed is still on record), and
+    # once the loop is running again it logs how long the stall lasted.
+    HEARTBEAT_MS = 20
+
+    def __init__(self, threshold_ms=100, log_path="stalllog.txt"):
+        super().__init__()
+        self.threshold = threshold_ms / 1000.0
+        self.main_id = main_thread().ident
+        self.source_file = os.path.abspath(__file__)
+        self.last_beat = time.monotonic()
+        self.running = True
+        self.offenders = {}  # where -> [stalls, total ms, worst ms]
+
+        self.logger = logging.getLogger("stalls")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        try:
+            handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=1_000_000, backupCount=3)
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.logger.addHandler(handler)
+        except OSError as e:
+            print(f"Stall log unavailable: {e}")
+
+        self.heartbeat = QTimer()
+        self.heartbeat.timeout.connect(self.beat)
+        self.heartbeat.start(self.HEARTBEAT_MS)
+
+    def beat(self):
+        self.last_beat = time.monotonic()
+
+    def run(self):
+        stall = None  # (last beat before the stall, where)
+        while self.running:
+            time.sleep(self.threshold / 4)
+            last_beat = self.last_beat
+
+            if stall is not None and last_beat != stall[0]:
+                self.record(1000 * (last_beat - stall[0]), stall[1])
+                stall = None
+            elif stall is None and time.monotonic() - last_beat > self.threshold:
+                frame = sys._current_frames().get(self.main_id)
+                if frame is not None:
+                    stall = (last_beat, self.describe(frame))
+                    self.logger.info(
+                        f"GUI stalled in {stall[1]}, ongoing after {1000 * (time.monotonic() - last_beat):.0f} ms\n"
+                        + "".join(traceback.format_stack(frame))
+                    )
+
+    def describe(self, frame):
+        # Blame the innermost frame in this file, not the library it called into
+        innermost = frame
+        while frame is not None:
+            if os.path.abspath(frame.f_code.co_filename) == self.source_file:
+                return f"{frame.f_code.co_name} (line {frame.f_lineno})"
+            frame = frame.f_back
+        return f"{innermost.f_code.co_name} ({os.path.basename(innermost.f_code.co_filename)})"
+
+    def record(self, duration_ms, where):
+        entry = self.offenders.setdefault(where, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += duration_ms
+        entry[2] = max(entry[2], duration_ms)
+        self.logger.info(f"GUI stall in {where} ended after {duration_ms:.0f} ms")
+
+    def summary(self, limit=10):
+        if not self.offenders:
+            return "No GUI stalls this session"
+        worst = sorted(self.offenders.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        lines = [f"Worst GUI stalls this session (over {1000 * self.threshold:.0f} ms):"]
+        for where, (count, total, longest) in worst:
+            lines.append(f"  {where}: {count} stalls, {total:.0f} ms total, {longest:.0f} ms worst")
+        return "\n".join(lines)
+
+    def stop(self):
+        self.heartbeat.stop()
+        self.running = False
+        self.wait()
+        summary = self.summary()
+        self.logger.info(summary)
+        for handler in self.logger.handlers[:]:
+            handler.close()
+            self.logger.removeHandler(handler)
+        return summary
+
+
+class FrameRecord:
+    # One frame file of the timeline. Records outlive their place in the
+    # timeline while undo history may bring them back, so ids stay valid.
+    __slots__ = ("path", "hold")
+
+    def __init__(self, path):
+        self.path = path
+        self.hold = 1  # frame times the frame is shown for
+
+
+class FrameTable:
+    # The timeline: frame ids in order in a compact array, records by id and
+    # a path -> id index, so looking up a frame or its row is O(1) however
+    # long the project is. Appending keeps the row index up to date; other
+    # edits rebuild it when it is next needed. Iterating and indexing give
+    # frame paths in timeline order, like the list this replaces.
+    def __init__(self):
+        self.records = []  # id -> FrameRecord
+        self.ids = {}  # path -> id
+        self.order = array("q")  # ids in timeline order
+        self.row_index = {}  # id -> row, None when out of date
+        self.version = 0  # bumped on every change
+        self.edits = 0  # bumped on changes other than appending
+
+    def frame_id(self, path):
+        frame_id = self.ids.get(path)
+        if frame_id is None:
+            frame_id = self.ids[path] = len(self.records)
+            self.records.append(FrameRecord(path))
+        return frame_id
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, row):
+        return self.records[self.order[row]].path
+
+    def __iter__(self):
+        records = self.records
+        return (records[frame_id].path for frame_id in self.order)
+
+    def __contains__(self, path):
+        return self.row(path) is not None
+
+    def row(self, path):
+        frame_id = self.ids.get(path)
+        if frame_id is None:
+            return None
+        if self.row_index is None:
+            self.row_index = {frame_id: row for row, frame_id in enumerate(self.order)}
+        return self.row_index.get(frame_id)
+
+    def paths(self):
+        # A copy for code that must not see later edits, such as export threads
+        return list(self)
+
+    def hold(self, path):
+        frame_id = self.ids.get(path)
+        return 1 if frame_id is None else self.records[frame_id].hold
+
+    def holds(self):
+        # frame path -> frame times, for frames shown longer than one
+        records = self.records
+        return {records[frame_id].path: records[frame_id].hold
+                for frame_id in self.order if records[frame_id].hold > 1}
+
+    def hold_counts(self):
+        records = self.records
+        return (records[frame_id].hold for frame_id in self.order)
+
+    def snapshot(self):
+        # The timeline as undo keeps it: 8 bytes per frame plus the holds
+        records = self.records
+        return (array("q", self.order),
+                {frame_id: records[frame_id].hold for frame_id in self.order if records[frame_id].hold > 1})
+
+    def restore(self, snapshot):
+        order, holds = snapshot
+        self.order = array("q", order)
+        for frame_id in self.order:
+            self.records[frame_id].hold = holds.get(frame_id, 1)
+        self.changed()
+
+    def set_frames(self, paths, holds=None):
+        # holds (frame path -> frame times) replaces every hold; None keeps them
+        self.order = array("q", map(self.frame_id, paths))
+        if holds is not None:
+            for frame_id in self.order:
+                record = self.records[frame_id]
+                record.hold = holds.get(record.path, 1)
+        self.changed()
+
+    def extend(self, paths):
+        if self.row_index is not None:
+            for row, path in enumerate(paths, len(self.order)):
+                self.row_index[self.frame_id(path)] = row
+        self.order.extend(map(self.frame_id, paths))
+        self.version += 1
+
+    def set_holds(self, holds):
+        for path, count in holds.items():
+            frame_id = self.ids.get(path)
+            if frame_id is not None:
+                self.records[frame_id].hold = count
+        self.changed()
+
+    def clear(self):
+        # The counters carry on, so views built for the old frames are rebuilt
+        self.records = []
+        self.ids = {}
+        self.order = array("q")
+        self.changed()
+
+    def changed(self):
+        self.row_index = None
+        self.version += 1
+        self.edits += 1
+
+
+class ProjectScanThread(QThread):
+    # Lists a project's frames off the GUI thread. Frames are not decoded
+    # here; unreadable ones are found when their thumbnails load.
+    project_scanned = Signal(str, list, int)  # folder, frame paths in timeline order, next frame number
+
+    def __init__(self, folder, order):
+        super().__init__()
+        self.folder = folder
+        self.order = order
+
+    def run(self):
+        # Create or clear undo cache folder
+        undo_cache_dir = os.path.join(self.folder, ".undo_cache")
+        if os.path.exists(undo_cache_dir):
+            try:
+                shutil.rmtree(undo_cache_dir)
+            except Exception as e:
+                print(f"Failed to clear undo cache: {e}")
+        try:
+            os.makedirs(undo_cache_dir)
+        except Exception as e:
+            print(f"Failed to create undo cache directory: {e}")
+
+        frames = [
+            os.path.join(self.folder, name) for name in sorted(os.listdir(self.folder))
+            if name.endswith(".png") and name.startswith("frame_")
+        ]
+
+        # Frames keep the order they were saved in, not just name order
+        if self.order:
+            position = {name: i for i, name in enumerate(self.order)}
+            frames.sort(key=lambda p: position.get(os.path.basename(p), len(self.order)))
+        next_number = 1 + max(
+            (int(name[6:-4]) for name in map(os.path.basename, frames) if name[6:-4].isdigit()),
+            default=-1,
+        )
+        self.project_scanned.emit(self.folder, frames, next_number)
+
+
+class ProjectBackupThread(QThread):
+    # Copies a project to a backup folder or .zip archive in the background.
+    # Only files that are new or changed since the last backup are copied,
+    # judged by size and modification time read straight from the backup, so
+    # no separate manifest can go stale. Copying is rate limited and runs at
+    # low priority so capture and preview never notice it. Hidden folders
+    # (the undo and export caches) are left out.
+    progress = Signal(int, int)  # bytes written, bytes to write
+    backup_finished = Signal(str, bool)  # summary, succeeded
+    CHUNK = 1024 * 1024
+
+    def __init__(self, project_path, target, rate_mb_s=10):
+        super().__init__()
+        self.project_path = project_path
+        self.target = target
+        self.rate = rate_mb_s * 1024 * 1024  # bytes per second
+        self.cancelled = False
+        self.written = 0
+        self.to_write = 0
+        self.started = None
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        if sys.platform.startswith("linux"):
+            try:
+                os.setpriority(os.PRIO_PROCESS, get_native_id(), 10)  # this thread only on Linux
+            except OSError:
+                pass
+
+        self.started = time.monotonic()
+        try:
+            files = self.project_files()
+            if self.target.lower().endswith(".zip"):
+                copied, skipped = self.backup_zip(files)
+            else:
+                copied, skipped = self.backup_folder(files)
+        except Exception as e:
+            self.backup_finished.emit(f"Backup to {self.target} failed: {e}", False)
+            return
+        if self.cancelled:
+            self.backup_finished.emit("Backup stopped; the next backup carries on where it left off", False)
+            return
+
+        # self.written also counts unchanged files copied again when a zip
+        # archive is compacted, so the time saved is never overstated
+        elapsed = time.monotonic() - self.started
+        skipped_bytes = sum(size for _, _, size, _ in skipped)
+        total_bytes = sum(size for _, _, size, _ in files)
+        full_seconds = total_bytes / self.rate
+        self.backup_finished.emit(
+            f"Backup to {self.target}: {len(copied)} files copied, {len(skipped)} unchanged files "
+            f"({skipped_bytes / 1e6:.1f} MB) skipped, {self.written / 1e6:.1f} MB written in {elapsed:.1f} s; "
+            f"a full copy at {self.rate / 1024 / 1024:g} MB/s would take {full_seconds:.1f} s "
+            f"({max(full_seconds - elapsed, 0):.1f} s saved)",
+            True,
+        )
+
+    def project_files(self):
+        # (name in the backup, path, size, mtime) for everything worth keeping
+        files = []
+        for root, dirs, names in os.walk(self.project_path):
+            dirs[:] = sorted(name for name in dirs if not name.startswith("."))
+            for name in sorted(names):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # deleted while we looked
+                relative = os.path.relpath(path, self.project_path).replace(os.sep, "/")
+                files.append((relative, path, stat.st_size, stat.st_mtime))
+        return files
+
+    def copy_stream(self, src_path, dst):
+        with open(src_path, "rb") as src:
+            while not self.cancelled:
+                chunk = src.read(self.CHUNK)
+                if not chunk:
+                    break
+                dst.write(chunk)
+                self.written += len(chunk)
+                self.progress.emit(self.written, self.to_write)
+                # Stay at or under the rate over the whole run
+                ahead = self.written / self.rate - (time.monotonic() - self.started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+    def backup_folder(self, files):
+        changed, skipped = [], []
+        for entry in files:
+            relative, _, size, mtime = entry
+            try:
+                stat = os.stat(os.path.join(self.target, relative))
+                # FAT-formatted USB sticks keep times in 2 second steps
+                same = stat.st_size == size and abs(stat.st_mtime - mtime) < 2
+            except OSError:
+                same = False
+            (skipped if same else changed).append(entry)
+
+        self.to_write = sum(size for _, _, size, _ in changed)
+        copied = []
+        for entry in changed:
+            if self.cancelled:
+                break
+            relative, path, _, _ = entry
+            destination = os.path.join(self.target, relative)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            partial = destination + ".part"
+            with open(partial, "wb") as dst:
+                self.copy_stream(path, dst)
+            if self.cancelled:
+                os.remove(partial)
+                break
+            shutil.copystat(path, partial)
+            os.replace(partial, destination)
+            copied.append(entry)
+        return copied, skipped
+
+    def backup_zip(self, files):
+        # Later entries with the same name replace earlier ones, as when unzipping
+        existing = {}
+        stale_bytes = 0
+        if os.path.exists(self.target):
+            with zipfile.ZipFile(self.target) as archive:
+                for info in archive.infolist():
+                    if info.filename in existing:
+                        stale_bytes += existing[info.filename].file_size
+                    existing[info.filename] = info
+
+        def unchanged(relative, path, size):
+            info = existing.get(relative)
+            if info is None or info.file_size != size:
+                return False
+            stamp = zipfile.ZipInfo.from_file(path, relative).date_time
+            return info.date_time == stamp[:5] + (stamp[5] // 2 * 2,)  # zip keeps 2 second steps
+
+        changed, skipped = [], []
+        for entry in files:
+            (skipped if unchanged(entry[0], entry[1], entry[2]) else changed).append(entry)
+        if not changed:
+            return [], skipped
+
+        # New and changed files are appended; a changed file (the project
+        # settings, usually) is a new entry under the same name. Only when the
+        # old versions add up to a quarter of the archive is it rewritten,
+        # reusing the stored copies of the unchanged files.
+        stale_bytes += sum(existing[relative].file_size for relative, _, _, _ in changed if relative in existing)
+        live_bytes = sum(size for _, _, size, _ in files)
+        rewrite = stale_bytes > live_bytes / 4
+        self.to_write = sum(size for _, _, size, _ in changed)
+        if rewrite:
+            self.to_write += sum(existing[relative].file_size for relative, _, _, _ in skipped)
+        destination = self.target + ".part" if rewrite else self.target
+
+        copied = []
+        with zipfile.ZipFile(destination, "w" if rewrite else "a", zipfile.ZIP_STORED) as archive:
+            if rewrite:
+                with zipfile.ZipFile(self.target) as previous:
+                    for relative, _, _, _ in skipped:
+                        if self.cancelled:
+                            break
+                        with previous.open(existing[relative]) as src, archive.open(existing[relative], "w") as dst:
+                            while chunk := src.read(self.CHUNK):
+                                dst.write(chunk)
+                                self.written += len(chunk)
+                                self.progress.emit(self.written, self.to_write)
+            for entry in changed:
+                if self.cancelled:
+                    break
+                relative, path, _, _ = entry
+                with archive.open(zipfile.ZipInfo.from_file(path, relative), "w") as dst:
+                    self.copy_stream(path, dst)
+                copied.append(entry)
+
+        if rewrite:
+            if self.cancelled:
+                os.remove(destination)
+                return [], skipped
+            os.replace(destination, self.target)
+        return copied, skipped
+
+
+class ThumbnailThread(QThread):
+    # Decodes timeline thumbnails in the background so the timeline can be
+    # shown and used before every frame has been read. Each request replaces
+    # whatever was still queued, and visible frames can be moved to the front.
+    thumbnail_ready = Signal(object, object)  # key, QImage (None if unreadable)
+    BATCH = 16
+
+    def __init__(self, pipeline, height=80):
+        super().__init__()
+        self.pipeline = pipeline
+        self.height = height
+        self.condition = Condition()
+        self.pending = deque()
+        self.running = True
+
+    def request(self, jobs, keep_pending=False):
+        # jobs: [(frame path, thumbnail key)] in the order they should load;
+        # with keep_pending they queue after those still waiting
+        with self.condition:
+            if keep_pending:
+                self.pending.extend(jobs)
+            else:
+                self.pending = deque(jobs)
+            self.condition.notify()
+
+    def prioritize(self, keys):
+        keys = set(keys)
+        with self.condition:
+            first = [job for job in self.pending if job[1] in keys]
+            if first:
+                self.pending = deque(first + [job for job in self.pending if job[1] not in keys])
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                batch = [self.pending.popleft() for _ in range(min(self.BATCH, len(self.pending)))]
+
+            frames = self.pipeline.map_frames([path for path, _ in batch], height=self.height, code=cv2.COLOR_BGR2RGB)
+            for (path, key), frame in zip(batch, frames):
+                if frame is None:
+                    self.thumbnail_ready.emit(key, None)
+                    continue
+                h, w = frame.shape[:2]
+                image = QImage(frame.data, w, h, 3 * w, QImage.Format_RGB888).copy()
+                self.thumbnail_ready.emit(key, image)
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.wait()
+
+
+class PipelineBatchThread(QThread):
+    # Runs one pipeline job per item across the timeline, with a bounded
+    # number in flight, for timeline-wide analysis and for baking effects.
+    progress = Signal(int, int)  # done, total
+    batch_finished = Signal(list, bool)  # results in item order (None on failure), cancelled
+
+    def __init__(self, pipeline, fn, items):
+        super().__init__()
+        self.pipeline = pipeline
+        self.fn = fn
+        self.items = list(items)  # argument tuples
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        window = 2 * max(self.pipeline.workers, 1)
+        pending = deque()
+        results = []
+        items = iter(self.items)
+        while not self.cancelled:
+            while len(pending) < window:
+                args = next(items, None)
+                if args is None:
+                    break
+                pending.append(self.pipeline.submit(self.fn, *args))
+            if not pending:
+                break
+            try:
+                results.append(pending.popleft().result())
+            except Exception as e:
+                print(f"Pipeline job failed: {e}")
+                results.append(None)
+            if len(results) % 10 == 0:
+                self.progress.emit(len(results), len(self.items))
+        for future in pending:
+            future.cancel()
+        self.batch_finished.emit(results, self.cancelled)
+
+
 class ProjectLoadingDialog(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent, Qt.Window | Qt.WindowTitleHint | Qt.CustomizeWindowHint)
@@ -150,26 +1936,1556 @@ class ProjectLoadingDialog(QWidget):
         self.setLayout(layout)
 
 
+class CacheManager:
+    # One memory budget shared by every frame/thumbnail cache in the app.
+    # Eviction is cost-aware LRU (GreedyDual-Size): an entry's priority is the
+    # manager's clock plus cost/size when it was last used, so big entries that
+    # are cheap to rebuild go first and recently used ones are kept longest.
+    # Pinned usage (the live frame, onion layers) counts against the budget
+    # too, which shrinks the evictable caches instead of growing past it.
+    def __init__(self, budget_bytes):
+        self.budget = budget_bytes
+        self.caches = {}
+        self.pinned = {}
+        self.clock = 0.0
+        self.heap = []
+        self.counter = 0
+        self.lock = RLock()
+
+    def register(self, name, on_evict=None):
+        cache = BudgetedCache(self, name, on_evict)
+        self.caches[name] = cache
+        return cache
+
+    def pin(self, name, nbytes):
+        with self.lock:
+            self.pinned[name] = nbytes
+            self.enforce()
+
+    def usage(self):
+        with self.lock:
+            return self.usage_unlocked()
+
+    def set_budget(self, budget_bytes):
+        with self.lock:
+            self.budget = budget_bytes
+            self.enforce()
+
+    def touch(self, cache, key, entry):
+        entry[2] = self.clock + entry[3] / max(entry[1], 1)
+        self.counter += 1
+        heapq.heappush(self.heap, (entry[2], self.counter, cache.name, key))
+
+    def enforce(self):
+        while self.heap and self.usage_unlocked() > self.budget:
+            priority, _, name, key = heapq.heappop(self.heap)
+            cache = self.caches[name]
+            entry = cache.entries.get(key)
+            if entry is None or entry[2] != priority:
+                continue  # stale heap record for an entry that was touched or removed
+            self.clock = priority
+            cache.evict(key)
+
+        # Drop stale heap records once they dominate the heap
+        live = sum(len(c.entries) for c in self.caches.values())
+        if len(self.heap) > 4 * live + 64:
+            self.heap = []
+            for cache in self.caches.values():
+                for key, entry in cache.entries.items():
+                    self.counter += 1
+                    self.heap.append((entry[2], self.counter, cache.name, key))
+            heapq.heapify(self.heap)
+
+    def usage_unlocked(self):
+        return sum(c.bytes for c in self.caches.values()) + sum(self.pinned.values())
+
+    def stats(self):
+        with self.lock:
+            lines = [f"Memory: {self.usage_unlocked() / 2**20:.0f} of {self.budget / 2**20:.0f} MB"]
+            for cache in self.caches.values():
+                lookups = cache.hits + cache.misses
+                rate = 100.0 * cache.hits / lookups if lookups else 0.0
+                lines.append(
+                    f"{cache.name}: {len(cache.entries)} entries, {cache.bytes / 2**20:.1f} MB, "
+                    f"{rate:.0f}% hits ({cache.hits}/{lookups}), {cache.evictions} evicted"
+                )
+            for name, nbytes in self.pinned.items():
+                lines.append(f"{name}: {nbytes / 2**20:.1f} MB (pinned)")
+            return "\n".join(lines)
+
+
+class BudgetedCache:
+    # Entries are [value, size, priority, cost]; cost is roughly how many
+    # milliseconds it takes to rebuild the entry after eviction.
+    def __init__(self, manager, name, on_evict=None):
+        self.manager = manager
+        self.name = name
+        self.on_evict = on_evict
+        self.entries = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self.manager.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.manager.touch(self, key, entry)
+            return entry[0]
+
+    def put(self, key, value, size, cost=1.0):
+        with self.manager.lock:
+            self.pop(key)
+            entry = [value, size, 0.0, cost]
+            self.entries[key] = entry
+            self.bytes += size
+            self.manager.touch(self, key, entry)
+            self.manager.enforce()
+
+    def pop(self, key, default=None):
+        with self.manager.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return default
+            self.bytes -= entry[1]
+            return entry[0]
+
+    def evict(self, key):
+        value = self.pop(key)
+        self.evictions += 1
+        if self.on_evict:
+            try:
+                self.on_evict(key, value)
+            except Exception as e:
+                print(f"Failed to evict {key} from {self.name}: {e}")
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def clear(self):
+        with self.manager.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+
+# Image pipeline: heavy per-frame numpy/OpenCV work runs in worker processes so
+# it does not compete with the GUI for the GIL. Frames travel through shared
+# memory; only small (name, shape, dtype) descriptors are pickled.
+# Attachments are kept in least-recently-used order and evicted one at a time.
+_attached_buffers = OrderedDict()
+MAX_ATTACHED_BUFFERS = 16
+
+
+def _detach_shared(name):
+    shm = _attached_buffers.pop(name, None)
+    if shm is None:
+        return True
+    try:
+        shm.close()
+    except BufferError:
+        # A job still holds a view of it; try again on a later eviction
+        _attached_buffers[name] = shm
+        _attached_buffers.move_to_end(name, last=False)
+        return False
+    return True
+
+
+def _forget_shared(names):
+    # The app sends the names of segments it has unlinked so the mapping here
+    # does not keep their memory alive
+    for name in names:
+        _detach_shared(name)
+
+
+def _attach_shared(desc):
+    name, shape, dtype = desc
+    shm = _attached_buffers.get(name)
+    if shm is None:
+        for old in list(_attached_buffers)[:max(0, len(_attached_buffers) - MAX_ATTACHED_BUFFERS + 1)]:
+            _detach_shared(old)
+        # Workers share the app's resource tracker, so attaching here does not
+        # hand ownership of the segment to the worker; the app unlinks it.
+        shm = shared_memory.SharedMemory(name=name)
+        _attached_buffers[name] = shm
+    else:
+        _attached_buffers.move_to_end(name)
+    return np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+
+
+# Per-frame corrections applied at full resolution right after a frame is
+# decoded, before any resize. A step is (name, *params) so it pickles to the
+# pipeline workers; EFFECTS maps the name to the function that applies it.
+def effect_shift(frame, dx, dy):
+    # Move the picture by (dx, dy) pixels; the uncovered edge repeats the border
+    height, width = frame.shape[:2]
+    matrix = np.float32([[1, 0, dx], [0, 1, dy]])
+    return cv2.warpAffine(frame, matrix, (width, height), borderMode=cv2.BORDER_REPLICATE)
+
+
+def effect_gain(frame, gain):
+    lut = np.clip(np.arange(256, dtype=np.float32) * gain + 0.5, 0, 255).astype(np.uint8)
+    return cv2.LUT(frame, lut)
+
+
+# Chroma key. The key is matched on the chroma (Cr, Cb) plane, so shadows on
+# the screen key out as well as the lit parts. The distance to the key colour
+# is precomputed for all 65536 chroma pairs, the mask is looked up on a copy
+# of at most CHROMA_MASK_WIDTH pixels across and then scaled up, so only the
+# spill clamp and the final blend touch every full-resolution pixel.
+CHROMA_KEY_DEFAULTS = {
+    "key": [64, 177, 0],  # BGR, a typical green screen
+    "tolerance": 48,  # chroma distance that is fully keyed out
+    "softness": 24,  # distance over which the edge fades back in
+    "spill": 0.5,  # how much of the key colour's cast is removed from the subject
+    "background": None,  # image path, or None for black
+}
+CHROMA_MASK_WIDTH = 480
+
+
+@functools.lru_cache(maxsize=8)
+def chroma_key_lut(key, tolerance, softness):
+    # Alpha (0 = background, 255 = subject) indexed by [Cr, Cb]
+    key_ycc = cv2.cvtColor(np.uint8([[key]]), cv2.COLOR_BGR2YCrCb)[0, 0].astype(np.float32)
+    values = np.arange(256, dtype=np.float32)
+    distance = np.hypot(values[:, None] - key_ycc[1], values[None, :] - key_ycc[2])
+    alpha = (distance - tolerance) / max(softness, 1)
+    return (np.clip(alpha, 0.0, 1.0) * 255 + 0.5).astype(np.uint8)
+
+
+@functools.lru_cache(maxsize=4)
+def chroma_background(path, stamp, width, height):
+    # stamp (size, mtime) is only part of the cache key, so replacing the
+    # image at the same path is picked up
+    image = cv2.imread(path) if path else None
+    if image is None:
+        return np.zeros((height, width, 3), np.uint8)
+    return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def chroma_key_mask(frame, lut):
+    height, width = frame.shape[:2]
+    scale = min(1.0, CHROMA_MASK_WIDTH / width)
+    small = frame
+    if scale < 1.0:
+        # Bilinear sampling is enough for a mask that gets feathered anyway,
+        # and much cheaper than averaging every full-resolution pixel
+        small = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_LINEAR)
+    ycc = cv2.cvtColor(small, cv2.COLOR_BGR2YCrCb)
+    index = ycc[:, :, 1].astype(np.uint16) << 8
+    index |= ycc[:, :, 2]
+    mask = lut.ravel().take(index)
+    if scale < 1.0:
+        mask = cv2.resize(mask, (width, height), interpolation=cv2.INTER_LINEAR)
+    return mask
+
+
+def suppress_spill(frame, key, amount):
+    # Pull the key colour's dominant channel down towards the brighter of the
+    # other two, which removes the green (or blue) cast on the subject's edges
+    channel = int(np.argmax(key))
+    planes = list(cv2.split(frame))
+    others = [plane for i, plane in enumerate(planes) if i != channel]
+    excess = cv2.subtract(planes[channel], cv2.max(others[0], others[1]))  # saturates at 0
+    planes[channel] = cv2.subtract(planes[channel], cv2.convertScaleAbs(excess, alpha=amount))
+    return cv2.merge(planes)
+
+
+def effect_chroma_key(frame, key, tolerance, softness, spill, background, stamp=None):
+    height, width = frame.shape[:2]
+    mask = chroma_key_mask(frame, chroma_key_lut(tuple(key), tolerance, softness))
+    if mask.min() == 255:
+        return frame  # no key colour in view
+    if spill > 0:
+        frame = suppress_spill(frame, key, spill)
+    # 8-bit blend: frame * alpha + background * (1 - alpha)
+    alpha = cv2.merge((mask, mask, mask))
+    keyed = cv2.multiply(frame, alpha, scale=1.0 / 255)
+    if background is None:
+        return keyed
+    backdrop = cv2.multiply(chroma_background(background, stamp, width, height), cv2.bitwise_not(alpha), scale=1.0 / 255)
+    return cv2.add(keyed, backdrop)
+
+
+def chroma_key_step(settings):
+    # The background's size and mtime travel with the step, so cached export
+    # segments keyed on it are rebuilt when the image file changes
+    background = settings["background"]
+    try:
+        st = os.stat(background) if background else None
+        stamp = None if st is None else (st.st_size, st.st_mtime_ns)
+    except OSError:
+        stamp = None
+    return (
+        "chroma_key", list(settings["key"]), settings["tolerance"], settings["softness"],
+        settings["spill"], background, stamp,
+    )
+
+
+EFFECTS = {
+    "shift": effect_shift,
+    "gain": effect_gain,
+    "chroma_key": effect_chroma_key,
+}
+
+
+def apply_effects(frame, steps):
+    for name, *params in steps or ():
+        frame = EFFECTS[name](frame, *params)
+    return frame
+
+
+def deflicker_gains(means, window=9, max_gain=2.0):
+    # means: mean brightness of every frame in timeline order. A sliding
+    # median of the log brightness over the window is the brightness each
+    # frame should have, and the gain moves it there. Slow lighting changes
+    # pass through untouched.
+    log = np.log(np.maximum(np.asarray(means, np.float64), 1.0))
+    half = window // 2
+    padded = np.pad(log, half, mode="edge")
+    target = np.median(np.lib.stride_tricks.sliding_window_view(padded, 2 * half + 1), axis=1)
+    return np.clip(np.exp(target - log), 1.0 / max_gain, max_gain)
+
+
+def pipeline_job_warmup():
+    return os.getpid()
+
+
+def pipeline_job_call(released, fn, args, kwargs):
+    # Drop this worker's mappings of freed segments before running the job
+    _forget_shared(released)
+    return fn(*args, **kwargs)
+
+
+def pipeline_job_load(path, dst_desc, size=None, height=None, code=None, effects=None):
+    # Decode a frame from disk, apply any effect steps, optionally resize it to
+    # size=(w, h) or to a fixed height, convert colour and write it to the
+    # top-left of dst.
+    frame = cv2.imread(path)
+    if frame is None:
+        return None
+    if effects:
+        frame = apply_effects(frame, effects)
+    if size is not None and (frame.shape[1], frame.shape[0]) != tuple(size):
+        frame = cv2.resize(frame, tuple(size), interpolation=cv2.INTER_AREA)
+    elif height is not None:
+        width = max(1, round(frame.shape[1] * height / frame.shape[0]))
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    if code is not None:
+        frame = cv2.cvtColor(frame, code)
+
+    dst = _attach_shared(dst_desc)
+    h = min(frame.shape[0], dst.shape[0])
+    w = min(frame.shape[1], dst.shape[1])
+    dst[:h, :w] = frame[:h, :w]
+    return h, w
+
+
+def pipeline_job_resize(src_desc, dst_desc, interpolation=cv2.INTER_AREA):
+    src = _attach_shared(src_desc)
+    dst = _attach_shared(dst_desc)
+    cv2.resize(src, (dst.shape[1], dst.shape[0]), dst=dst, interpolation=interpolation)
+    return dst.shape[:2]
+
+
+def blend_onion(live, layers, weights):
+    # Same additive blend the preview has always used: each earlier frame is
+    # added on top of the live frame at its own opacity, then clipped. It runs
+    # on preview-sized frames every tick, so it stays inline; a round trip to
+    # a worker would cost more than the blend.
+    composite = live.astype(np.float32)
+    for layer, weight in zip(layers, weights):
+        cv2.scaleAdd(layer.astype(np.float32), weight, composite, dst=composite)
+    np.clip(composite, 0, 255, out=composite)
+    return cv2.cvtColor(composite.astype(np.uint8), cv2.COLOR_BGR2RGB)
+
+
+def pipeline_write_frame(frame, dst_path, size=None):
+    if size is not None and (frame.shape[1], frame.shape[0]) != tuple(size):
+        frame = cv2.resize(frame, tuple(size), interpolation=cv2.INTER_AREA)
+    return bool(cv2.imwrite(dst_path, frame))
+
+
+def pipeline_job_luma(path, size=(96, 54)):
+    # Mean brightness of a tiny grayscale copy, for timeline-wide statistics
+    frame = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if frame is None:
+        return None
+    return float(cv2.resize(frame, size, interpolation=cv2.INTER_AREA).mean())
+
+
+# Camera bumps are measured by phase correlation of small grayscale copies,
+# which finds the translation of the whole picture in about a millisecond and
+# is not fooled by a puppet moving in front of a still set
+REGISTRATION_WIDTH = 320
+REGISTRATION_MIN_RESPONSE = 0.05  # weaker peaks are not trusted
+
+
+def registration_image(path):
+    # A small float grayscale copy and the factor back to full-size pixels
+    frame = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if frame is None:
+        return None, 1.0
+    scale = frame.shape[1] / REGISTRATION_WIDTH
+    size = (REGISTRATION_WIDTH, max(1, round(frame.shape[0] / scale)))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA).astype(np.float32), scale
+
+
+@functools.lru_cache(maxsize=2)
+def registration_reference(path, mtime_ns):
+    # Each worker decodes the reference once per run, not once per frame
+    image, scale = registration_image(path)
+    window = None if image is None else cv2.createHanningWindow(image.shape[::-1], cv2.CV_32F)
+    return image, scale, window
+
+
+def pipeline_job_register(path, reference_path, reference_mtime_ns):
+    # Offset (dx, dy) of a frame from the reference in full-size pixels, or
+    # None when it cannot be measured
+    reference, scale, window = registration_reference(reference_path, reference_mtime_ns)
+    image, _ = registration_image(path)
+    if reference is None or image is None or image.shape != reference.shape:
+        return None
+    (dx, dy), response = cv2.phaseCorrelate(reference, image, window)
+    if response < REGISTRATION_MIN_RESPONSE:
+        return None
+    return dx * scale, dy * scale
+
+
+def pipeline_job_bake(src_path, dst_path, effects):
+    # Write a new version of a frame with its effect steps applied
+    frame = cv2.imread(src_path)
+    if frame is None:
+        return False
+    return bool(cv2.imwrite(dst_path, apply_effects(frame, effects)))
+
+
+def pipeline_job_import_file(src_path, dst_path, size=None):
+    frame = cv2.imread(src_path)
+    if frame is None:
+        return False
+    return pipeline_write_frame(frame, dst_path, size)
+
+
+def pipeline_job_import_frame(src_desc, dst_path, size=None):
+    return pipeline_write_frame(_attach_shared(src_desc), dst_path, size)
+
+
+class SharedFrameBuffer:
+    def __init__(self, shape, dtype=np.uint8):
+        dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(shape)) * dtype.itemsize)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.array = np.ndarray(shape, dtype, buffer=self.shm.buf)
+        self.desc = (self.shm.name, tuple(shape), dtype.str)
+        self.key = (tuple(shape), dtype.str)
+
+    def close(self):
+        self.array = None
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except Exception as e:
+            print(f"Failed to free shared frame buffer: {e}")
+
+
+class ImagePipeline:
+    # workers=0 runs every job inline, which keeps the same code path working
+    # where worker processes are not available and gives benchmarks a baseline.
+    def __init__(self, workers=None):
+        if workers is None:
+            workers = max(1, (os.cpu_count() or 2) - 1)
+        self.workers = workers
+        self.executor = None
+        self.free_buffers = {}
+        # Names of recently freed segments, sent along with every job since any
+        # worker may still have one mapped
+        self.released = deque(maxlen=4 * max(workers, 1))
+        self.lock = Lock()
+
+    def start(self):
+        if self.executor is not None or self.workers == 0:
+            return
+        try:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            # Spawn the workers now so the first real job does not pay for it
+            for _ in range(self.workers):
+                self.executor.submit(pipeline_job_warmup)
+        except Exception as e:
+            print(f"Image pipeline falling back to inline processing: {e}")
+            self.executor = None
+            self.workers = 0
+
+    def submit(self, fn, *args, **kwargs):
+        if self.executor is None:
+            self.start()
+        if self.executor is None:
+            future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        with self.lock:
+            released = tuple(self.released)
+        if not released:
+            return self.executor.submit(fn, *args, **kwargs)
+        return self.executor.submit(pipeline_job_call, released, fn, args, kwargs)
+
+    def acquire(self, shape, dtype=np.uint8):
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self.lock:
+            free = self.free_buffers.get(key)
+            if free:
+                return free.pop()
+        return SharedFrameBuffer(shape, dtype)
+
+    def release(self, buffer):
+        with self.lock:
+            free = self.free_buffers.setdefault(buffer.key, [])
+            if len(free) < 2 * max(self.workers, 1) + 2:
+                free.append(buffer)
+                return
+        self.discard(buffer)
+
+    def discard(self, buffer):
+        # Free a buffer for good; inline jobs attach in this process
+        name = buffer.shm.name
+        _detach_shared(name)
+        buffer.close()
+        with self.lock:
+            self.released.append(name)
+
+    def map_frames(self, paths, size=None, height=None, code=None, box=None, effects=None):
+        # Decode frames in the workers and yield them in timeline order, or
+        # None for an unreadable frame. Only a bounded window of frames is in
+        # flight, so memory stays flat however long the timeline is.
+        # effects maps a path to the effect steps applied to that frame.
+        effects = effects or {}
+        if box is None:
+            if size is not None:
+                box = (size[1], size[0], 3)
+            elif height is not None:
+                box = (height, height * 4, 3)  # wide enough for any sane aspect
+            else:
+                raise ValueError("map_frames needs a size, height or box")
+
+        window = 2 * max(self.workers, 1)
+        pending = deque()
+        paths = iter(paths)
+        while True:
+            while len(pending) < window:
+                path = next(paths, None)
+                if path is None:
+                    break
+                buffer = self.acquire(box)
+                pending.append((
+                    buffer,
+                    self.submit(pipeline_job_load, path, buffer.desc, size, height, code, effects.get(path)),
+                ))
+            if not pending:
+                return
+
+            buffer, future = pending.popleft()
+            try:
+                shape = future.result()
+            except Exception as e:
+                print(f"Image pipeline job failed: {e}")
+                shape = None
+            frame = None if shape is None else buffer.array[:shape[0], :shape[1]].copy()
+            self.release(buffer)
+            yield frame
+
+    def load_into(self, path, buffer, size):
+        return self.submit(pipeline_job_load, path, buffer.desc, size)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        with self.lock:
+            for free in self.free_buffers.values():
+                for buffer in free:
+                    _detach_shared(buffer.shm.name)
+                    buffer.close()
+            self.free_buffers.clear()
+
+
+def find_ffmpeg():
+    # imageio-ffmpeg ships its own binary; fall back to whatever is on PATH
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return shutil.which("ffmpeg")
+
+
+class ExportCache:
+    # Encoded MP4 segments live in <project>/.export_cache, keyed by the hashes
+    # of their frames plus the encode settings, so a re-export only re-encodes
+    # the segments whose frames changed and stream-copies the rest.
+    SEGMENT_TARGET = 24   # average frames per segment
+    SEGMENT_MIN = 8
+    SEGMENT_MAX = 96
+
+    def __init__(self, project_path, max_bytes=1024 * 1024 * 1024):
+        self.project_path = project_path
+        self.cache_dir = os.path.join(project_path, ".export_cache")
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        self.max_bytes = max_bytes
+        self.frame_hashes = {}  # path -> (size, mtime_ns, digest)
+        self.index = {}
+        self.load_index()
+
+    def load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r") as f:
+                self.index = json.load(f)
+        except Exception as e:
+            print(f"Failed to load export cache index: {e}")
+            self.index = {}
+
+    def save_index(self):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self.index_path, "w") as f:
+                json.dump(self.index, f, indent=2)
+        except Exception as e:
+            print(f"Failed to save export cache index: {e}")
+
+    def frame_hash(self, path):
+        # Hashing the file bytes is far cheaper than decoding the PNG, and the
+        # stat check means unchanged frames are not even re-read.
+        try:
+            st = os.stat(path)
+        except OSError:
+            return "missing"
+        cached = self.frame_hashes.get(path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+        self.frame_hashes[path] = (st.st_size, st.st_mtime_ns, digest)
+        return digest
+
+    def plan_segments(self, frame_paths, settings, holds=None, effects=None):
+        # Boundaries are chosen from the frame content rather than the frame
+        # position, so inserting or deleting a frame only disturbs the segment
+        # it lands in instead of shifting every segment after it.
+        hashes = [self.frame_hash(p) for p in frame_paths]
+        holds = holds or {}
+        effects = effects or {}
+        settings_key = json.dumps(settings, sort_keys=True)
+
+        segments = []
+        start = 0
+        for i, h in enumerate(hashes):
+            length = i - start + 1
+            at_boundary = int(h[:8], 16) % self.SEGMENT_TARGET == 0 if h != "missing" else False
+            if (at_boundary and length >= self.SEGMENT_MIN) or length >= self.SEGMENT_MAX:
+                segments.append((start, i + 1))
+                start = i + 1
+        if start < len(hashes):
+            segments.append((start, len(hashes)))
+
+        planned = []
+        for begin, end in segments:
+            # A held or corrected frame encodes differently, so that is part of the key
+            parts = []
+            for p, h in zip(frame_paths[begin:end], hashes[begin:end]):
+                if holds.get(p, 1) != 1:
+                    h = f"{h}x{holds[p]}"
+                if effects.get(p):
+                    h = f"{h}:{json.dumps(effects[p])}"
+                parts.append(h)
+            key = hashlib.sha1((settings_key + "|" + ",".join(parts)).encode()).hexdigest()
+            planned.append((frame_paths[begin:end], key))
+        return planned
+
+    def lookup(self, key):
+        entry = self.index.get(key)
+        if not entry:
+            return None
+        path = os.path.join(self.cache_dir, entry["file"])
+        if not os.path.exists(path):
+            del self.index[key]
+            return None
+        entry["used"] = time.time()
+        return path
+
+    def segment_path(self, key):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return os.path.join(self.cache_dir, f"seg_{key}.mp4")
+
+    def store(self, key, path):
+        self.index[key] = {
+            "file": os.path.basename(path),
+            "size": os.path.getsize(path),
+            "used": time.time(),
+        }
+        return path
+
+    def evict(self):
+        total = sum(entry["size"] for entry in self.index.values())
+        for key, entry in sorted(self.index.items(), key=lambda kv: kv[1]["used"]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except OSError as e:
+                print(f"Failed to evict export segment {entry['file']}: {e}")
+            total -= entry["size"]
+            del self.index[key]
+        self.save_index()
+
+    def concat(self, ffmpeg, segment_paths, save_path):
+        list_path = os.path.join(self.cache_dir, "concat.txt")
+        with open(list_path, "w") as f:
+            for path in segment_paths:
+                escaped = path.replace("\\", "/").replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+        subprocess.run(
+            [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+             "-i", list_path, "-c", "copy", save_path],
+            check=True, capture_output=True,
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+        )
+
+
+def write_mp4_frames(video_writer, pipeline, frame_paths, width, height, holds=None, effects=None,
+                     bad_frames=None, progress=None):
+    # Frames are decoded, corrected and resized to a consistent size in the
+    # pipeline workers; a held frame is decoded once and handed to the encoder
+    # once per frame time. Unreadable frames are skipped and added to bad_frames.
+    holds = holds or {}
+    written = 0
+    frames = pipeline.map_frames(frame_paths, size=(width, height), effects=effects)
+    for frame_path, frame in zip(frame_paths, frames):
+        if progress:
+            progress()
+        if frame is None:
+            if bad_frames is not None:
+                bad_frames.append(frame_path)
+            continue
+
+        for _ in range(holds.get(frame_path, 1)):
+            video_writer.write(frame)
+        written += 1
+    return written
+
+
+def frame_durations_ms(frame_paths, holds, fps):
+    # How long each timeline entry is shown, in milliseconds
+    return [holds.get(path, 1) * 1000.0 / fps for path in frame_paths]
+
+
+def gif_palette(frames, colors=255, sample=32, width=160):
+    # One palette for a run of frames, from a downscaled sample of them. It
+    # leaves index 255 free for transparency.
+    from PIL import Image
+
+    step = max(1, len(frames) // sample)
+    tiles = []
+    for frame in frames[::step]:
+        height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+        tiles.append(cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA))
+    mosaic = Image.fromarray(np.ascontiguousarray(np.vstack(tiles)))
+    quantized = mosaic.quantize(colors, method=Image.Quantize.FASTOCTREE)
+    palette = np.zeros((256, 3), np.uint8)
+    used = np.frombuffer(bytes(quantized.getpalette()[:3 * colors]), np.uint8).reshape(-1, 3)
+    palette[:len(used)] = used
+    return palette
+
+
+def gif_color_lut(palette, colors=255):
+    # Nearest palette index for every 15-bit colour, so mapping a frame to the
+    # palette is a single table lookup per pixel
+    levels = np.arange(32, dtype=np.int32) * 8 + 4
+    grid = np.stack(np.meshgrid(levels, levels, levels, indexing="ij"), axis=-1).reshape(-1, 3)
+    candidates = palette[:colors].astype(np.int32)
+    lut = np.empty(len(grid), np.uint8)
+    for start in range(0, len(grid), 4096):
+        chunk = grid[start:start + 4096]
+        distance = ((chunk[:, None, :] - candidates[None, :, :]) ** 2).sum(axis=2)
+        lut[start:start + 4096] = distance.argmin(axis=1)
+    return lut
+
+
+class GifWriter:
+    # Writes an animated GIF one frame at a time. Every frame is mapped to a
+    # palette computed once (for the whole animation or per window of
+    # frames); only the box that changed since the previous frame is stored,
+    # with unchanged pixels inside it transparent, and frames that change
+    # nothing just lengthen the previous frame. LZW coding is Pillow's.
+    TRANSPARENT = 255
+
+    def __init__(self, path, width, height, palette, loop=0):
+        self.file = open(path, "wb")
+        self.width = width
+        self.height = height
+        self.global_palette = palette
+        self.palette = palette
+        self.lut = gif_color_lut(palette)
+        self.canvas = None
+        self.pending = None  # (descriptor bytes, image data) waiting for its delay
+        self.pending_ms = 0.0
+        self.elapsed_ms = 0.0
+        self.elapsed_cs = 0
+
+        self.file.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0xF7, 0, 0) + palette.tobytes())
+        if loop == 0:
+            # NETSCAPE extension: repeat forever. Without it the GIF plays once.
+            self.file.write(b"\x21\xFF\x0BNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+    def set_palette(self, palette):
+        self.palette = palette
+        self.lut = gif_color_lut(palette)
+
+    def write(self, rgb, duration_ms):
+        from PIL import Image
+
+        rgb = rgb.astype(np.uint16)
+        indices = self.lut[((rgb[..., 0] >> 3) << 10) | ((rgb[..., 1] >> 3) << 5) | (rgb[..., 2] >> 3)]
+        shown = self.palette[indices]
+
+        if self.canvas is None:
+            x0, y0, x1, y1 = 0, 0, self.width, self.height
+            data = indices
+        else:
+            changed = np.any(shown != self.canvas, axis=2)
+            rows = np.flatnonzero(changed.any(axis=1))
+            if len(rows) == 0:
+                self.pending_ms += duration_ms
+                return
+            columns = np.flatnonzero(changed.any(axis=0))
+            y0, y1, x0, x1 = rows[0], rows[-1] + 1, columns[0], columns[-1] + 1
+            data = indices[y0:y1, x0:x1].copy()
+            data[~changed[y0:y1, x0:x1]] = self.TRANSPARENT
+        self.canvas = shown
+
+        local = self.palette is not self.global_palette
+        descriptor = b"\x2C" + struct.pack("<HHHHB", x0, y0, x1 - x0, y1 - y0, 0x87 if local else 0)
+        if local:
+            descriptor += self.palette.tobytes()
+        self.flush()
+        self.pending = (descriptor, b"\x08" + Image.fromarray(np.ascontiguousarray(data)).tobytes("gif", "L") + b"\x00")
+        self.pending_ms = duration_ms
+
+    def flush(self):
+        if self.pending is None:
+            return
+        # Delays are whole centiseconds; carry the rounding so the total stays exact
+        self.elapsed_ms += self.pending_ms
+        delay = max(2, round(self.elapsed_ms / 10) - self.elapsed_cs)
+        self.elapsed_cs += delay
+        descriptor, data = self.pending
+        # Graphic control: leave the frame in place (disposal 1), index 255 transparent
+        self.file.write(b"\x21\xF9\x04\x05" + struct.pack("<HB", delay, self.TRANSPARENT) + b"\x00")
+        self.file.write(descriptor + data)
+        self.pending = None
+
+    def close(self):
+        self.flush()
+        self.file.write(b"\x3B")
+        self.file.close()
+
+
+def write_optimized_gif(path, frames, durations_ms, loop=0, palette_window=0):
+    # frames are RGB arrays of one size. palette_window=0 uses one palette for
+    # the whole animation, otherwise a new palette every palette_window frames.
+    height, width = frames[0].shape[:2]
+    window = palette_window or len(frames)
+    writer = GifWriter(path, width, height, gif_palette(frames[:window]), loop)
+    try:
+        for i, (frame, duration) in enumerate(zip(frames, durations_ms)):
+            if i and i % window == 0:
+                writer.set_palette(gif_palette(frames[i:i + window]))
+            writer.write(frame, duration)
+    finally:
+        writer.close()
+
+
+class ExportProgress:
+    # Counts timeline entries as an export gets through them and reports every
+    # few, so a long export does not flood the GUI with progress signals
+    def __init__(self, total, report, every=10):
+        self.total = total
+        self.report = report
+        self.every = every
+        self.done = 0
+
+    def __call__(self, count=1):
+        before = self.done
+        self.done += count
+        if self.done // self.every != before // self.every or self.done >= self.total:
+            self.report(self.done, self.total)
+
+
+def export_mp4_file(pipeline, save_path, frame_paths, fps, width, height, holds, effects, progress,
+                    cache=None, ffmpeg=None):
+    # With ffmpeg and the project's export cache only the segments whose frames
+    # changed are encoded again. Returns the frames that could not be read.
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # or try 'avc1' or 'H264' if issues persist
+    bad_frames = []
+    if cache is None or ffmpeg is None:
+        video_writer = cv2.VideoWriter(save_path, fourcc, fps, (width, height))
+        if not video_writer.isOpened():
+            raise RuntimeError("Failed to open video writer!")
+        try:
+            write_mp4_frames(video_writer, pipeline, frame_paths, width, height, holds, effects, bad_frames, progress)
+        finally:
+            video_writer.release()
+        return bad_frames
+
+    settings = {"fourcc": "mp4v", "fps": fps, "size": [width, height]}
+    segments = cache.plan_segments(frame_paths, settings, holds, effects)
+
+    segment_files = []
+    reused = 0
+    for segment_paths, key in segments:
+        segment_file = cache.lookup(key)
+        if segment_file:
+            reused += 1
+            segment_files.append(segment_file)
+            progress(len(segment_paths))
+            continue
+
+        segment_file = cache.segment_path(key)
+        video_writer = cv2.VideoWriter(segment_file, fourcc, fps, (width, height))
+        if not video_writer.isOpened():
+            raise RuntimeError("Failed to open video writer!")
+        written = write_mp4_frames(
+            video_writer, pipeline, segment_paths, width, height, holds, effects, bad_frames, progress
+        )
+        video_writer.release()
+
+        if written == 0:
+            # Every frame in this segment was unreadable; nothing to stitch
+            if os.path.exists(segment_file):
+                os.remove(segment_file)
+            continue
+        segment_files.append(cache.store(key, segment_file))
+
+    if not segment_files:
+        raise RuntimeError("No valid frames to export.")
+
+    cache.concat(ffmpeg, segment_files, save_path)
+    cache.evict()
+    print(f"MP4 export: reused {reused} of {len(segments)} cached segments")
+    return bad_frames
+
+
+def export_gif_file(pipeline, save_path, frame_paths, durations, width, height, loop, effects, progress):
+    # Two passes keep memory flat however long the animation is: the palette
+    # comes from a small sample of frames, then every frame is decoded,
+    # encoded and dropped in turn. Returns the frames that could not be read.
+    step = max(1, len(frame_paths) // 32)
+    sample_size = (160, max(1, round(height * 160 / width)))
+    samples = [
+        frame for frame in pipeline.map_frames(
+            frame_paths[::step], size=sample_size, code=cv2.COLOR_BGR2RGB, effects=effects
+        )
+        if frame is not None
+    ]
+    if not samples:
+        raise RuntimeError("No valid frames to export.")
+
+    bad_frames = []
+    written = 0
+    start = time.perf_counter()
+    writer = GifWriter(save_path, width, height, gif_palette(samples), loop)
+    try:
+        frames = pipeline.map_frames(frame_paths, size=(width, height), code=cv2.COLOR_BGR2RGB, effects=effects)
+        for frame_path, duration, img in zip(frame_paths, durations, frames):
+            progress()
+            if img is None:
+                bad_frames.append(frame_path)
+                print(f"Warning: Could not load frame {frame_path}")
+                continue
+            writer.write(img, duration)
+            written += 1
+    finally:
+        writer.close()
+
+    if written == 0:
+        os.remove(save_path)
+        raise RuntimeError("No valid frames to export.")
+    print(f"GIF export: {written} frames, {os.path.getsize(save_path) / 1024:.0f} KB "
+          f"in {time.perf_counter() - start:.2f}s")
+    return bad_frames
+
+
+# Export sinks each run on their own thread and receive every decoded frame
+# through a small queue, so one decode pass feeds all outputs and the total
+# time is close to that of the slowest encoder. Frames are shared between
+# sinks and must not be modified in place.
+class ExportSink:
+    QUEUE_SIZE = 8
+
+    def __init__(self, label):
+        self.label = label
+        self.queue = queue.Queue(self.QUEUE_SIZE)
+        self.error = None
+        self.thread = None
+        self.written = 0
+
+    def start(self, count, width, height):
+        self.thread = Thread(target=self.run, args=(count, width, height), name=f"{self.label} export", daemon=True)
+        self.thread.start()
+
+    def put(self, frame, hold=1):
+        # A failed sink stops taking frames instead of stalling the others
+        while self.error is None:
+            try:
+                self.queue.put((frame, hold), timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def finish(self):
+        self.put(None)
+        self.thread.join()
+
+    def run(self, count, width, height):
+        try:
+            self.open(count, width, height)
+            while True:
+                frame, hold = self.queue.get()
+                if frame is None:
+                    break
+                self.write(frame, hold)
+                self.written += 1
+            self.close()
+        except Exception as e:
+            self.error = e
+            print(f"{self.label} export failed: {e}")
+
+    def resized(self, frame, width):
+        if width is None or frame.shape[1] == width:
+            return frame
+        height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+        return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+    def open(self, count, width, height):
+        pass
+
+    def write(self, frame, hold):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class Mp4Sink(ExportSink):
+    def __init__(self, path, fps):
+        super().__init__("MP4")
+        self.path = path
+        self.fps = fps
+        self.video_writer = None
+
+    def open(self, count, width, height):
+        self.video_writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*'mp4v'), self.fps, (width, height))
+        if not self.video_writer.isOpened():
+            raise RuntimeError("Failed to open video writer!")
+
+    def write(self, frame, hold):
+        for _ in range(hold):
+            self.video_writer.write(frame)
+
+    def close(self):
+        self.video_writer.release()
+
+
+class GifSink(ExportSink):
+    def __init__(self, path, fps, loop, width=None):
+        super().__init__("GIF")
+        self.path = path
+        self.fps = fps
+        self.loop = loop
+        self.width = width
+        self.spool = None
+        self.shape = None
+        self.durations = []
+
+    def write(self, frame, hold):
+        # The palette needs every frame before encoding starts, so reduced
+        # frames are spooled to a temporary file instead of kept in memory
+        import tempfile
+
+        rgb = cv2.cvtColor(self.resized(frame, self.width), cv2.COLOR_BGR2RGB)
+        if self.spool is None:
+            self.spool = tempfile.TemporaryFile()
+            self.shape = rgb.shape
+        self.spool.write(np.ascontiguousarray(rgb).tobytes())
+        self.durations.append(hold * 1000.0 / self.fps)
+
+    def close(self):
+        if self.spool is None:
+            raise RuntimeError("No valid frames to export.")
+        try:
+            self.spool.flush()
+            frames = np.memmap(self.spool, np.uint8, "r", shape=(len(self.durations),) + self.shape)
+            write_optimized_gif(self.path, frames, self.durations, self.loop)
+            del frames
+        finally:
+            self.spool.close()
+            self.spool = None
+
+
+class ContactSheetSink(ExportSink):
+    MAX_WIDTH = 4096
+
+    def __init__(self, path, thumb_width=160):
+        super().__init__("Contact sheet")
+        self.path = path
+        self.thumb_width = thumb_width
+        self.sheet = None
+
+    def open(self, count, width, height):
+        self.columns = max(1, math.ceil(math.sqrt(count)))
+        self.thumb_width = max(16, min(self.thumb_width, self.MAX_WIDTH // self.columns))
+        self.thumb_height = max(1, round(height * self.thumb_width / width))
+        rows = max(1, math.ceil(count / self.columns))
+        self.sheet = np.zeros((rows * self.thumb_height, self.columns * self.thumb_width, 3), np.uint8)
+
+    def write(self, frame, hold):
+        row, column = divmod(self.written, self.columns)
+        y, x = row * self.thumb_height, column * self.thumb_width
+        self.sheet[y:y + self.thumb_height, x:x + self.thumb_width] = cv2.resize(
+            frame, (self.thumb_width, self.thumb_height), interpolation=cv2.INTER_AREA
+        )
+
+    def close(self):
+        if not cv2.imwrite(self.path, self.sheet):
+            raise RuntimeError(f"Could not write {self.path}")
+        self.sheet = None
+
+
+class ImageSequenceSink(ExportSink):
+    def __init__(self, folder, width=None):
+        super().__init__("Image sequence")
+        self.folder = folder
+        self.width = width
+        self.index = 0
+
+    def open(self, count, width, height):
+        os.makedirs(self.folder, exist_ok=True)
+
+    def write(self, frame, hold):
+        # One file per frame time; a held frame is encoded once and copied
+        path = os.path.join(self.folder, f"frame_{self.index:04d}.png")
+        if not cv2.imwrite(path, self.resized(frame, self.width)):
+            raise RuntimeError(f"Could not write {path}")
+        self.index += 1
+        for _ in range(hold - 1):
+            shutil.copyfile(path, os.path.join(self.folder, f"frame_{self.index:04d}.png"))
+            self.index += 1
+
+
+class MultiExportThread(QThread):
+    progress = Signal(int, int)  # done, total
+    export_finished = Signal(list, list)  # bad frame paths, [(sink label, error)]
+
+    def __init__(self, pipeline, frame_paths, width, height, sinks, holds=None, effects=None):
+        super().__init__()
+        self.pipeline = pipeline
+        self.holds = dict(holds or {})
+        self.effects = dict(effects or {})
+        self.frame_paths = list(frame_paths)
+        self.width = width
+        self.height = height
+        self.sinks = sinks
+
+    def run(self):
+        start = time.perf_counter()
+        for sink in self.sinks:
+            sink.start(len(self.frame_paths), self.width, self.height)
+
+        bad_frames = []
+        frames = self.pipeline.map_frames(self.frame_paths, size=(self.width, self.height), effects=self.effects)
+        for index, (frame_path, frame) in enumerate(zip(self.frame_paths, frames)):
+            if frame is None:
+                bad_frames.append(frame_path)
+                print(f"Warning: Could not load frame {frame_path}")
+                continue
+            for sink in self.sinks:
+                sink.put(frame, self.holds.get(frame_path, 1))
+            if index % 10 == 0:
+                self.progress.emit(index, len(self.frame_paths))
+
+        for sink in self.sinks:
+            sink.finish()
+        print(f"Exported {len(self.sinks)} outputs in {time.perf_counter() - start:.2f}s")
+        self.progress.emit(len(self.frame_paths), len(self.frame_paths))
+        self.export_finished.emit(bad_frames, [(sink.label, str(sink.error)) for sink in self.sinks if sink.error])
+
+    def outputs(self):
+        return [getattr(sink, "path", getattr(sink, "folder", "")) for sink in self.sinks if not sink.error]
+
+
+class ExportThread(QThread):
+    # Runs a single-output export (MP4 or GIF) off the GUI thread. It reports
+    # like MultiExportThread, so the GUI finishes both kinds the same way.
+    progress = Signal(int, int)  # done, total
+    export_finished = Signal(list, list)  # bad frame paths, [(label, error)]
+
+    def __init__(self, label, path, total, job, *args, **kwargs):
+        super().__init__()
+        self.label = label
+        self.path = path
+        self.total = total
+        self.job = job
+        self.args = args
+        self.kwargs = kwargs
+        self.error = None
+
+    def run(self):
+        bad_frames = []
+        try:
+            bad_frames = self.job(*self.args, progress=ExportProgress(self.total, self.progress.emit), **self.kwargs)
+        except Exception as e:
+            self.error = e
+            print(f"{self.label} export failed: {e}")
+        self.progress.emit(self.total, self.total)
+        self.export_finished.emit(bad_frames, [(self.label, str(self.error))] if self.error else [])
+
+    def outputs(self):
+        return [] if self.error else [self.path]
+
+
+class PreviewStreamHandler(BaseHTTPRequestHandler):
+    # One thread per connection. A stream client is sent the newest frame
+    # whenever it is ready for one; frames published while it was still
+    # writing the last one are skipped for that client only.
+    timeout = 10  # a client that stops reading is dropped instead of kept forever
+    BOUNDARY = "cnframe"
+    PAGE = (
+        "<!doctype html><title>CN Stop Motion</title>"
+        "<body style='margin:0;background:#000'>"
+        "<img src='/stream' style='width:100vw;height:100vh;object-fit:contain'></body>"
+    )
+
+    def do_GET(self):
+        stream = self.server.stream
+        path, _, query = self.path.partition("?")
+        if path == "/":
+            self.send_body(self.PAGE.encode(), "text/html; charset=utf-8")
+        elif path == "/stats":
+            self.send_body(json.dumps(stream.stats(), indent=2).encode(), "application/json")
+        elif path == "/frame.jpg":
+            jpeg, _ = stream.next_jpeg(0, timeout=2.0)
+            if jpeg is None:
+                self.send_error(503, "No preview yet")
+            else:
+                self.send_body(jpeg, "image/jpeg")
+        elif path == "/stream":
+            # ?name=projector labels the client in /stats
+            name = (parse_qs(query).get("name") or [""])[0]
+            self.send_stream(stream, name)
+        else:
+            self.send_error(404)
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_stream(self, stream, name):
+        # A small send buffer makes a slow client fall behind here, where it
+        # skips frames, rather than in kernel buffers that hold seconds of video
+        self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 64 * 1024)
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={self.BOUNDARY}")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+
+        address = f"{self.client_address[0]}:{self.client_address[1]}"
+        client = stream.add_client(f"{name} ({address})" if name else address)
+        try:
+            sequence = 0
+            while stream.running:
+                jpeg, latest = stream.next_jpeg(sequence, timeout=1.0)
+                if jpeg is None:
+                    continue
+                self.wfile.write(
+                    f"--{self.BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(jpeg)}\r\n\r\n".encode() + jpeg + b"\r\n"
+                )
+                client.sent(latest - sequence - 1 if sequence else 0)
+                sequence = latest
+        except (OSError, ValueError):
+            pass  # the client went away
+        finally:
+            stream.remove_client(client)
+
+    def log_message(self, format, *args):
+        pass  # one line per request would flood the console
+
+
+class PreviewStreamClient:
+    def __init__(self, name):
+        self.name = name
+        self.connected = time.monotonic()
+        self.frames = 0
+        self.dropped = 0
+        self.recent = deque(maxlen=30)  # send times for the current rate
+
+    def sent(self, dropped):
+        self.frames += 1
+        self.dropped += dropped
+        self.recent.append(time.monotonic())
+
+    def fps(self):
+        if len(self.recent) < 2:
+            return 0.0
+        span = self.recent[-1] - self.recent[0]
+        return (len(self.recent) - 1) / span if span > 0 else 0.0
+
+
+class PreviewStreamServer:
+    # Streams whatever the preview shows (live, onion skin, scrubbing or
+    # playback) as MJPEG over HTTP. The GUI only hands over the frame it just
+    # drew; one encoder thread turns the newest one into a JPEG, and every
+    # client is sent that same JPEG. Nothing is encoded while nobody watches.
+    def __init__(self, port=8765, host="", quality=80):
+        self.port = port
+        self.host = host
+        self.quality = quality
+        self.condition = Condition()
+        self.pending = None  # newest published frame, not encoded yet
+        self.jpeg = None
+        self.sequence = 0
+        self.published = 0
+        self.encoded = 0
+        self.encode_ms = 0.0
+        self.waiting = 0  # requests waiting for a frame
+        self.clients = []
+        self.running = False
+        self.httpd = None
+        self.threads = []
+
+    def start(self):
+        # Raises OSError when the port is taken
+        self.httpd = ThreadingHTTPServer((self.host, self.port), PreviewStreamHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.stream = self
+        self.port = self.httpd.server_address[1]
+        self.running = True
+        self.threads = [
+            Thread(target=self.httpd.serve_forever, name="PreviewStreamHTTP", daemon=True),
+            Thread(target=self.encode_loop, name="PreviewStreamEncoder", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+        for thread in self.threads:
+            thread.join(timeout=2)
+        self.threads = []
+
+    def urls(self):
+        # Addresses other devices on the network can open
+        addresses = []
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+                probe.connect(("10.255.255.255", 1))  # no packet is sent
+                addresses.append(probe.getsockname()[0])
+        except OSError:
+            pass
+        addresses.append("127.0.0.1")
+        return [f"http://{address}:{self.port}/" for address in addresses]
+
+    @property
+    def watched(self):
+        return bool(self.clients) or self.waiting > 0
+
+    def publish(self, frame):
+        # frame is an RGB array or a QImage; called on the GUI thread, so it
+        # only swaps a reference and never waits on encoding or clients
+        if not self.watched:
+            return
+        with self.condition:
+            self.pending = frame
+            self.published += 1
+            self.condition.notify_all()
+
+    def encode_loop(self):
+        while True:
+            with self.condition:
+                while self.running and self.pending is None:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                frame, self.pending = self.pending, None
+
+            start = time.perf_counter()
+            if isinstance(frame, QImage):
+                frame = qimage_to_rgb(frame)
+            ok, data = cv2.imencode(
+                ".jpg", cv2.cvtColor(frame, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+            )
+            if not ok:
+                continue
+            elapsed_ms = 1000 * (time.perf_counter() - start)
+
+            with self.condition:
+                self.jpeg = data.tobytes()
+                self.sequence += 1
+                self.encoded += 1
+                self.encode_ms = elapsed_ms if self.encoded == 1 else 0.9 * self.encode_ms + 0.1 * elapsed_ms
+                self.condition.notify_all()
+
+    def next_jpeg(self, after, timeout):
+        # Newest JPEG newer than sequence number after, or (None, after)
+        with self.condition:
+            self.waiting += 1
+            try:
+                self.condition.wait_for(lambda: not self.running or self.sequence > after, timeout)
+                if not self.running or self.sequence <= after:
+                    return None, after
+                return self.jpeg, self.sequence
+            finally:
+                self.waiting -= 1
+
+    def add_client(self, name):
+        client = PreviewStreamClient(name)
+        with self.condition:
+            self.clients.append(client)
+        print(f"Preview stream: {name} connected")
+        return client
+
+    def remove_client(self, client):
+        with self.condition:
+            self.clients.remove(client)
+        print(f"Preview stream: {client.name} left after {client.frames} frames ({client.dropped} skipped)")
+
+    def stats(self):
+        with self.condition:
+            clients = list(self.clients)
+            stats = {
+                "published": self.published,
+                "encoded": self.encoded,
+                "encode_ms": round(self.encode_ms, 2),
+                "jpeg_bytes": len(self.jpeg or b""),
+            }
+        stats["clients"] = [
+            {
+                "client": client.name,
+                "seconds": round(time.monotonic() - client.connected, 1),
+                "frames": client.frames,
+                "skipped": client.dropped,
+                "fps": round(client.fps(), 1),
+            }
+            for client in clients
+        ]
+        return stats
+
+    def summary(self):
+        stats = self.stats()
+        lines = [f"Preview stream on port {self.port}: {len(stats['clients'])} clients, "
+                 f"{stats['encoded']} frames encoded ({stats['encode_ms']:.1f} ms each)"]
+        for client in stats["clients"]:
+            lines.append(f"  {client['client']}: {client['fps']:.1f} fps, {client['skipped']} skipped")
+        return "\n".join(lines)
+
+
+def qimage_to_rgb(image):
+    image = image.convertToFormat(QImage.Format_RGB888)
+    width, height, stride = image.width(), image.height(), image.bytesPerLine()
+    data = np.frombuffer(image.constBits(), np.uint8, count=stride * height).reshape(height, stride)
+    return data[:, :width * 3].reshape(height, width, 3).copy()
+
+
 class StopMotionApp(QWidget):
-    def __init__(self):
+    REPLAY_FILE_ENTRY = "replay-file"
+    REPLAY_FOLDER_ENTRY = "replay-folder"
+
+    def __init__(self, source=None, memory_budget_mb=512, stall_threshold_ms=100, stream_port=8765,
+                 backup_rate_mb_s=10):
         super().__init__()
         self.setWindowTitle("CN Stop Motion App by Sensei Jesse")
 
         self.project_path = ""
-        self.captured_frames = []
+        self.captured_frames = FrameTable()  # frame paths in timeline order, and their holds
         self.undo_stack = []
         self.redo_stack = []
-        self.undo_cache = {} 
+        self.next_frame_number = 0
+        self.frame_number_lock = Lock()
+        self.trash_counter = 0
+        # Corrections applied when frames are exported, never to the files themselves
+        # deflicker: frame path -> brightness gain; chroma_key: settings, also
+        # shown live; stabilize: frame path -> [dx, dy] offset from the reference
+        # frame, kept while switched off so switching back on is instant
+        self.frame_effects = {
+            "deflicker": {}, "chroma_key": None,
+            "stabilize": {"enabled": False, "reference": None, "offsets": {}},
+        }
+        self.frame_brightness = {}  # frame path -> mean brightness, for deflicker
+        self.deflicker_timeline = []  # the timeline the deflicker gains were computed for
+        # Every frame/thumbnail cache shares one memory budget
+        self.cache_manager = CacheManager(memory_budget_mb * 1024 * 1024)
+        self.thumbnail_cache = self.cache_manager.register("Thumbnails")
+        self.preview_cache = self.cache_manager.register("Previews")
+
+        # Event-loop freezes are logged with the GUI thread's stack
+        self.stall_watchdog = None
+        if stall_threshold_ms > 0:
+            self.stall_watchdog = StallWatchdog(stall_threshold_ms)
+            self.stall_watchdog.start()
+
+        # Mirrors the preview to projectors and tablets when switched on
+        self.stream_port = stream_port
+        self.stream_server = None
+
+        self.backup_rate_mb_s = backup_rate_mb_s
+        self.backup_target = None  # last backup folder or .zip of this project
+        self.backup_thread = None
+
         self.camera_search_thread = None
         self.is_playback_mode = False   
         self.current_camera_index = 0
         self.cap = None
         self.camera_open_thread = None
+        self.available_cameras = {}
+
+        # Non-camera frame sources offered alongside the detected cameras
+        self.requested_source = source
+        self.extra_sources = {"synthetic": frame_source_label("synthetic")}
+        if source is not None:
+            self.extra_sources[source] = frame_source_label(source)
         
         self.current_camera_name = None
         self.loop_playback = True
         self.gif_loop_value = 0 if self.loop_playback else 1
         self.unsaved_changes = False
+        self.export_cache = None
+
+        self.image_pipeline = ImagePipeline()
+        self.image_pipeline.start()
+        self.onion_layers = {}  # (path, mtime, width, height) -> (SharedFrameBuffer, future)
 
         self.camera_selector = QComboBox()
         self.capture_btn = QPushButton("Capture Frame")
@@ -197,9 +3513,58 @@ class StopMotionApp(QWidget):
         self.timeline.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
         self.timeline.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.timeline.setWrapping(False)
+        self.timeline.setSelectionMode(QListWidget.ExtendedSelection)
+        self.timeline.currentRowChanged.connect(self.scrub_to)
+
+        # Scrubbing decodes in the background and shows the nearest decoded frame meanwhile
+        self.scrub_slider = QSlider(Qt.Horizontal)
+        self.scrub_slider.setRange(0, 0)
+        self.scrub_slider.setToolTip("Drag to scrub through the timeline")
+        self.scrub_slider.valueChanged.connect(self.scrub_to)
+        self.scrub_key = None
+        self.decode_thread = FrameDecodeThread()
+        self.decode_thread.frame_decoded.connect(self.on_frame_decoded)
+        self.decode_thread.start()
+
+        # Timeline thumbnails load in the background, visible frames first
+        self.timeline_items = {}
+        self.timeline_edits = None  # FrameTable.edits the timeline rows were built for
+        self.thumbnails_pending = set()
+        self.unreadable_frames = set()
+        self.placeholder_thumb = None
+        self.project_scan_thread = None
+        self.thumbnail_thread = ThumbnailThread(self.image_pipeline)
+        self.thumbnail_thread.thumbnail_ready.connect(self.on_thumbnail_ready)
+        self.thumbnail_thread.start()
+        self.timeline.horizontalScrollBar().valueChanged.connect(self.prioritize_visible_thumbnails)
+
+        # Frames are read on their own thread; the preview timer only shows the newest
+        self.capture_worker = CaptureWorker(self.cap_lock, lambda: self.cap)
+        self.capture_worker.read_failed.connect(self.on_capture_read_failed)
+        self.capture_worker.start()
+        self.preview_sequence = 0
+        self.preview_governor = PreviewGovernor(30)
+
+        # A lost camera is retried in place first; hotplug events speed that up
+        self.reconnect_thread = None
+        self.reconnect_started = None
+        self.device_watcher = DeviceWatcher()
+        self.device_watcher.devices_changed.connect(self.on_devices_changed)
+        self.device_watcher.start()
 
 
         self.capture_btn.clicked.connect(self.capture_frame)
+        self.sharpest_checkbox = QCheckBox("Pick Sharpest")
+        self.sharpest_checkbox.setChecked(True)
+        self.sharpest_checkbox.setToolTip(
+            f"Capture the sharpest, stillest of the last {PreRollBuffer.FRAMES} camera frames "
+            "instead of the newest one"
+        )
+        self.fullres_checkbox = QCheckBox("Full-Res Stills")
+        self.fullres_checkbox.setToolTip(
+            "Capture at the camera's highest resolution while the preview keeps its faster, lower one"
+        )
+        self.still_thread = None
         self.capture_btn.setToolTip("Take a snapshot from the live feed")
 
         self.delete_btn = QPushButton("Delete Frame")
@@ -246,6 +3611,69 @@ class StopMotionApp(QWidget):
         self.export_gif_btn = QPushButton("Export GIF")
         self.export_gif_btn.clicked.connect(self.export_gif)
 
+        self.export_all_btn = QPushButton("Export All")
+        self.export_all_btn.setToolTip("Export several formats in one pass")
+        self.export_all_btn.clicked.connect(self.export_all)
+
+        self.effects_btn = QPushButton("Effects")
+        self.effects_btn.setToolTip("Corrections applied to the whole timeline")
+        effects_menu = QMenu(self.effects_btn)
+        self.deflicker_action = effects_menu.addAction("Deflicker at Export")
+        self.deflicker_action.setCheckable(True)
+        self.deflicker_action.setToolTip("Even out flickering brightness when exporting; frames are not changed")
+        self.deflicker_action.triggered.connect(self.toggle_deflicker)
+        effects_menu.addAction("Deflicker Frames (new versions)", self.deflicker_frames)
+        effects_menu.addSeparator()
+        self.stabilize_action = effects_menu.addAction("Stabilize at Export")
+        self.stabilize_action.setCheckable(True)
+        self.stabilize_action.setToolTip("Undo camera bumps when exporting, lined up with the selected frame")
+        self.stabilize_action.triggered.connect(self.toggle_stabilize)
+        effects_menu.addAction("Stabilize Frames (new versions)", self.stabilize_frames)
+        effects_menu.addSeparator()
+        effects_menu.addAction("Chroma Key...", self.edit_chroma_key)
+        self.effects_btn.setMenu(effects_menu)
+
+        self.backup_btn = QPushButton("Backup")
+        self.backup_btn.setToolTip("Copy new and changed frames to a backup folder or zip file")
+        backup_menu = QMenu(self.backup_btn)
+        backup_menu.addAction("Back Up to Folder...", lambda: self.backup_project(zip_file=False))
+        backup_menu.addAction("Back Up to Zip File...", lambda: self.backup_project(zip_file=True))
+        self.backup_again_action = backup_menu.addAction("Back Up Again", self.backup_project)
+        self.backup_again_action.setEnabled(False)
+        self.stop_backup_action = backup_menu.addAction("Stop Backup", self.stop_backup)
+        self.stop_backup_action.setEnabled(False)
+        self.backup_btn.setMenu(backup_menu)
+
+        self.share_btn = QPushButton("Share Preview")
+        self.share_btn.setCheckable(True)
+        self.share_btn.setToolTip("Show the preview in a web browser on other screens")
+        self.share_btn.toggled.connect(self.toggle_stream)
+        self.batch_thread = None
+        self.batch_progress = None
+        self.batch_callback = None
+        self.export_thread = None
+        self.export_progress = None
+
+        self.import_btn = QPushButton("Import")
+        self.import_btn.setToolTip("Add frames from a video file or a folder of images")
+        import_menu = QMenu(self.import_btn)
+        import_menu.addAction("Video File...", lambda: self.import_frames(folder=False))
+        import_menu.addAction("Image Folder...", lambda: self.import_frames(folder=True))
+        self.import_btn.setMenu(import_menu)
+        self.import_thread = None
+        self.import_progress = None
+
+        self.timelapse_btn = QPushButton("Time-lapse")
+        self.timelapse_btn.setCheckable(True)
+        self.timelapse_btn.setToolTip("Capture a frame automatically at a fixed interval")
+        self.timelapse_btn.toggled.connect(self.toggle_timelapse)
+        self.timelapse_spin = QSpinBox()
+        self.timelapse_spin.setRange(1, 86400)
+        self.timelapse_spin.setValue(10)
+        self.timelapse_spin.setSuffix(" s")
+        self.timelapse_spin.setToolTip("Seconds between time-lapse frames")
+        self.timelapse_thread = None
+
         self.opacity_slider = QSlider(Qt.Horizontal)
         self.opacity_slider.setRange(0, 100)
         self.opacity_slider.setValue(50)
@@ -277,6 +3705,8 @@ class StopMotionApp(QWidget):
 
         controls = QHBoxLayout()
         controls.addWidget(self.capture_btn)
+        controls.addWidget(self.sharpest_checkbox)
+        controls.addWidget(self.fullres_checkbox)
         controls.addWidget(self.delete_btn)
         controls.addWidget(self.duplicate_btn)
         controls.addWidget(self.undo_btn)
@@ -284,6 +3714,10 @@ class StopMotionApp(QWidget):
         controls.addWidget(self.new_project_btn)
         controls.addWidget(self.save_btn)
         controls.addWidget(self.open_btn)
+        controls.addWidget(self.backup_btn)
+        controls.addWidget(self.import_btn)
+        controls.addWidget(self.timelapse_btn)
+        controls.addWidget(self.timelapse_spin)
         controls.addWidget(self.play_pause_btn)
         controls.addWidget(self.loop_checkbox)
         fps_layout = QHBoxLayout()
@@ -295,6 +3729,9 @@ class StopMotionApp(QWidget):
 
         controls.addWidget(self.export_btn)
         controls.addWidget(self.export_gif_btn)
+        controls.addWidget(self.export_all_btn)
+        controls.addWidget(self.effects_btn)
+        controls.addWidget(self.share_btn)
         controls.addWidget(self.back_to_live_btn)
       
 
@@ -302,6 +3739,28 @@ class StopMotionApp(QWidget):
 
         layout.addWidget(QLabel("Timeline:"))
         layout.addWidget(self.timeline)
+        layout.addWidget(self.scrub_slider)
+
+        # Range operations on the selected frames; Shift/Ctrl-click to select several
+        range_layout = QHBoxLayout()
+        range_layout.addWidget(QLabel("Selected Frames:"))
+        self.move_left_btn = QPushButton("Move Left")
+        self.move_left_btn.clicked.connect(lambda: self.move_frames(-1))
+        self.move_right_btn = QPushButton("Move Right")
+        self.move_right_btn.clicked.connect(lambda: self.move_frames(1))
+        self.reverse_btn = QPushButton("Reverse")
+        self.reverse_btn.clicked.connect(self.reverse_frames)
+        self.reverse_btn.setToolTip("Play the selected frames in reverse order")
+        self.hold_spin = QSpinBox()
+        self.hold_spin.setRange(1, 24)
+        self.hold_spin.setValue(2)
+        self.hold_btn = QPushButton("Hold")
+        self.hold_btn.clicked.connect(self.hold_frames)
+        self.hold_btn.setToolTip("Show each selected frame for this many frame times (1 removes the hold)")
+        for widget in (self.move_left_btn, self.move_right_btn, self.reverse_btn, self.hold_spin, self.hold_btn):
+            range_layout.addWidget(widget)
+        range_layout.addStretch()
+        layout.addLayout(range_layout)
 
 
         onion_layout = QHBoxLayout()
@@ -312,6 +3771,12 @@ class StopMotionApp(QWidget):
         self.onion_checkbox = QCheckBox("Onion Skin")
         self.onion_checkbox.setChecked(True)
         onion_layout.addWidget(self.onion_checkbox)
+        self.analysis_checkbox = QCheckBox("Focus/Exposure")
+        self.analysis_checkbox.setToolTip(
+            "Show in-focus edges in red, blown-out highlights in magenta and a brightness histogram"
+        )
+        self.analysis_checkbox.toggled.connect(self.toggle_frame_analysis)
+        onion_layout.addWidget(self.analysis_checkbox)
         layout.addLayout(onion_layout)
 
                 # Theme selector UI
@@ -325,6 +3790,19 @@ class StopMotionApp(QWidget):
         self.edit_theme_btn = QPushButton("Edit Custom Theme")
         camera_layout.addWidget(self.edit_theme_btn)
         self.edit_theme_btn.clicked.connect(self.open_theme_editor)
+        self.memory_label = QLabel()
+        camera_layout.addWidget(self.memory_label)
+        self.preview_mode_label = QLabel()
+        camera_layout.addWidget(self.preview_mode_label)
+        self.loading_label = QLabel()
+        self.loading_label.hide()
+        camera_layout.addWidget(self.loading_label)
+        self.update_preview_mode_label()
+        self.memory_timer = QTimer()
+        self.memory_timer.timeout.connect(self.update_memory_label)
+        self.memory_timer.timeout.connect(self.update_stream_tooltip)
+        self.memory_timer.timeout.connect(self.update_preview_mode_label)
+        self.memory_timer.start(2000)
         self.setLayout(layout)
         self.camera_selector.currentIndexChanged.connect(self.change_camera)
         self.timer = QTimer()
@@ -335,10 +3813,17 @@ class StopMotionApp(QWidget):
         self.autosave_timer.timeout.connect(self.save_project)
         self.autosave_timer.start(300_000)  # Every 5 minutes
 
+        # Playback follows a monotonic clock: each tick shows the frame that is
+        # due now and sleeps until the next one is, so a slow frame costs the
+        # frames after it (counted as dropped) instead of slowing playback down
         self.playback_timer = QTimer()
+        self.playback_timer.setSingleShot(True)
+        self.playback_timer.setTimerType(Qt.PreciseTimer)
         self.playback_timer.timeout.connect(self.playback_next_frame)
 
-        self.playback_index = 0
+        self.playback_index = None  # frame on screen
+        self.playback_shown = 0
+        self.playback_dropped = 0
         QTimer.singleShot(500, self.start_camera_search)  # Wait 100ms to allow UI to show first
 
        
@@ -376,16 +3861,22 @@ class StopMotionApp(QWidget):
             self.camera_search_dialog = None
 
         self.available_cameras = {index: name for index, name in cameras}
+        self.available_cameras.update(self.extra_sources)
         self.camera_selector.blockSignals(True)
         self.camera_selector.clear()
 
-        for index, name in cameras:
+        for index, name in self.available_cameras.items():
             self.camera_selector.addItem(name, index)
+        self.camera_selector.addItem("Replay Video File...", self.REPLAY_FILE_ENTRY)
+        self.camera_selector.addItem("Replay Image Folder...", self.REPLAY_FOLDER_ENTRY)
+
+        if not cameras and self.requested_source is None:
+            self.camera_selector.insertItem(0, "No Camera Found")
+            self.camera_selector.setCurrentIndex(0)
 
         self.camera_selector.blockSignals(False)
 
-        if not cameras:
-            self.camera_selector.addItem("No Camera Found")
+        if not cameras and self.requested_source is None:
             self.capture_btn.setEnabled(False)
             QMessageBox.warning(self, "No Cameras", "No cameras were found! Did you hide them too well?")
             self.current_camera_index = None
@@ -400,6 +3891,11 @@ class StopMotionApp(QWidget):
                         matching_index = idx
                         break
 
+            # A source given on the command line wins on first start
+            if matching_index is None and self.requested_source is not None:
+                matching_index = self.requested_source
+                self.current_camera_name = self.available_cameras[matching_index]
+
             # If no match found, pick first camera in the list
             if matching_index is None:
                 matching_index = cameras[0][0]
@@ -416,16 +3912,17 @@ class StopMotionApp(QWidget):
 
 
     def open_camera(self, index):
-        with self.cap_lock:
-            camera_name = self.available_cameras.get(index, None)
-            if (
-                self.cap
-                and self.cap.isOpened()
-                and self.current_camera_index == index
-                and self.current_camera_name == camera_name
-            ):
-                print("Camera already open and matches requested index and name.")
-                return
+        # Only the GUI thread assigns self.cap, so reading it here needs no
+        # lock; taking it would wait out a full-resolution still
+        camera_name = self.available_cameras.get(index, None)
+        if (
+            self.cap
+            and self.cap.isOpened()
+            and self.current_camera_index == index
+            and self.current_camera_name == camera_name
+        ):
+            print("Camera already open and matches requested index and name.")
+            return
 
         # Avoid starting a thread while one is still running
         if self.camera_open_thread and self.camera_open_thread.isRunning():
@@ -471,6 +3968,7 @@ class StopMotionApp(QWidget):
             self.camera_loading_dialog = None
 
         if success and cap:
+            self.cancel_still()  # let go of the old camera before it is released
             with self.cap_lock:
                 if self.cap:
                     self.cap.release()
@@ -494,18 +3992,63 @@ class StopMotionApp(QWidget):
             self.capture_btn.setEnabled(False)
 
     def preview_selected_frame(self, item):
+        row = self.captured_frames.row(item.data(Qt.UserRole))
+        if row is not None:
+            self.scrub_to(row)
+
+    def scrub_to(self, row):
+        if not 0 <= row < len(self.captured_frames):
+            return
+
         self.timer.stop()
-        frame_path = item.data(Qt.UserRole)
-        frame = cv2.imread(frame_path)
+        for widget in (self.timeline, self.scrub_slider):
+            widget.blockSignals(True)
+        self.timeline.setCurrentRow(row)
+        self.scrub_slider.setValue(row)
+        for widget in (self.timeline, self.scrub_slider):
+            widget.blockSignals(False)
+
+        frame_path = self.captured_frames[row]
+        key = self.thumbnail_key(frame_path)
+        self.scrub_key = key
+        if key is None:
+            print(f"Frame path does not exist: {frame_path}")
+            return
 
+        image = self.preview_cache.get(key)
+        if image is not None:
+            self.show_preview_image(image)
+            return
 
-        if isinstance(frame, np.ndarray):
-            height, width, channel = frame.shape
-            bytes_per_line = 3 * width
-            q_img = QImage(frame.data, width, height, bytes_per_line, QImage.Format_RGB888).rgbSwapped()
-            self.video_label.setPixmap(QPixmap.fromImage(q_img))
-        else:
-            print("Warning: Expected image data but got something else")
+        # Show the closest frame we already have while the real one decodes
+        nearest = self.nearest_preview(row)
+        if nearest is not None:
+            self.show_preview_image(nearest)
+        self.decode_thread.request_frame(key, frame_path, (self.video_label.width(), self.video_label.height()))
+
+    def nearest_preview(self, row, radius=30):
+        for distance in range(1, radius + 1):
+            for candidate in (row - distance, row + distance):
+                if 0 <= candidate < len(self.captured_frames):
+                    key = self.thumbnail_key(self.captured_frames[candidate])
+                    if key in self.preview_cache:
+                        return self.preview_cache.get(key)
+        return None
+
+    def on_frame_decoded(self, key, image, decode_ms):
+        if image is None:
+            print(f"Warning: Could not decode frame {key[0]}")
+            return
+
+        self.preview_cache.put(key, image, image.sizeInBytes(), cost=decode_ms)
+        if key == self.scrub_key and not self.timer.isActive() and not self.is_playback_mode:
+            self.show_preview_image(image)
+
+    def show_preview_image(self, image):
+        if self.stream_server:
+            self.stream_server.publish(image)
+        pix = QPixmap.fromImage(image).scaled(self.video_label.width(), self.video_label.height(), Qt.KeepAspectRatio)
+        self.video_label.setPixmap(pix)
 
     def safe_resume_camera(self):
         if self.camera_open_thread and self.camera_open_thread.isRunning():
@@ -520,48 +4063,177 @@ class StopMotionApp(QWidget):
         if self.is_playback_mode:
             return
 
-        try:
-            with self.cap_lock:
-                if not self.cap or not self.cap.isOpened():
-                    print("cap missing or not opened")
-                    return
-
-                ret, frame = self.cap.read()
-                if not ret or frame is None:
-                    print("Frame read failed. Releasing and retrying...")
-
-                    try:
-                        self.cap.release()
-                    except Exception as e:
-                        print(f"Error while releasing cap: {e}")
+        frame, sequence = self.capture_worker.latest()
+        if frame is None or sequence == self.preview_sequence:
+            return  # nothing new since the last tick
 
-                    self.cap = None
+        # Frames that arrived while we were busy are skipped, never queued
+        skipped = sequence - self.preview_sequence - 1 if self.preview_sequence else 0
+        self.preview_sequence = sequence
 
-                    # Wait and attempt to resume
-                    QTimer.singleShot(1000, self.safe_resume_camera)
-                    return
-
-                self.latest_frame = frame.copy()
+        # read() hands back a fresh array every time, so no copy is needed
+        self.latest_frame = frame
+        self.cache_manager.pin("Live frame", frame.nbytes)
+        self.cache_manager.pin("Pre-roll frames", self.capture_worker.preroll.nbytes())
 
+        start = time.perf_counter()
+        try:
             # Post-processing (onion skin or frame display)
             if self.onion_checkbox.isChecked() and self.captured_frames:
                 self.update_onion_skin()
             else:
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                h, w, ch = frame.shape
-                bytes_per_line = ch * w
-                qt_image = QImage(frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-                pix = QPixmap.fromImage(qt_image).scaled(
-                    self.video_label.width(), self.video_label.height(), Qt.KeepAspectRatio
-                )
-                self.video_label.setPixmap(pix)
+                width, height = self.preview_size(frame)
+                if (width, height) != (frame.shape[1], frame.shape[0]):
+                    frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+                frame = apply_effects(frame, self.live_effects())
+                self.show_preview_rgb(self.draw_analysis(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
                 if self.video_label.text():
                     self.video_label.setText("")
-
         except Exception as e:
             print(f"Exception in update_frame: {e}")
+
+        if self.preview_governor.record(1000 * (time.perf_counter() - start), skipped):
+            print(f"Preview quality changed to {self.preview_governor.name}")
+            self.update_preview_mode_label()
+
+    def preview_size(self, frame):
+        # Never render more pixels than the label shows, and fewer when the
+        # governor has lowered the preview quality
+        height, width = frame.shape[:2]
+        fit = min(self.video_label.width() / width, self.video_label.height() / height, 1.0)
+        scale = fit * self.preview_governor.scale
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    def show_preview_rgb(self, rgb):
+        if self.stream_server:
+            self.stream_server.publish(rgb)
+        height, width = rgb.shape[:2]
+        qt_image = QImage(rgb.data, width, height, 3 * width, QImage.Format_RGB888)
+        pix = QPixmap.fromImage(qt_image).scaled(
+            self.video_label.width(), self.video_label.height(), Qt.KeepAspectRatio
+        )
+        self.video_label.setPixmap(pix)
+
+    def toggle_stream(self, checked):
+        if not checked:
+            if self.stream_server:
+                print(self.stream_server.summary())
+                self.stream_server.stop()
+                self.stream_server = None
+            return
+
+        server = PreviewStreamServer(self.stream_port)
+        try:
+            server.start()
+        except OSError as e:
+            QMessageBox.warning(self, "Share Preview", f"Could not start sharing on port {self.stream_port}:\n{e}")
+            self.share_btn.setChecked(False)
+            return
+        self.stream_server = server
+        urls = server.urls()
+        print(f"Preview stream started: {', '.join(urls)}")
+        QMessageBox.information(
+            self, "Share Preview",
+            "Open this address in a browser on the projector computer or tablet "
+            f"(same network):\n\n{urls[0]}",
+        )
+
+    def update_stream_tooltip(self):
+        if self.stream_server:
+            self.share_btn.setToolTip(self.stream_server.summary())
+
+    def update_preview_mode_label(self):
+        self.preview_mode_label.setText(f"Preview: {self.preview_governor.name}")
+        stats = self.preview_governor.stats()
+        analyzer = self.capture_worker.analyzer
+        if analyzer:
+            stats += "\n" + analyzer.stats()
+        self.preview_mode_label.setToolTip(stats)
+
+    def toggle_frame_analysis(self, checked):
+        analyzer = self.capture_worker.analyzer
+        if analyzer:
+            print(analyzer.stats())
+        self.capture_worker.analyzer = FrameAnalyzer() if checked else None
+
+    def draw_analysis(self, rgb):
+        analyzer = self.capture_worker.analyzer
+        result = analyzer.result if analyzer else None
+        if result is not None:
+            draw_frame_analysis(rgb, result)
+        return rgb
+
+    def on_capture_read_failed(self, cap):
+        with self.cap_lock:
+            if cap is not self.cap:
+                return  # already replaced
+            print("Frame read failed. Releasing and reconnecting...")
+            try:
+                self.cap.release()
+            except Exception as e:
+                print(f"Error while releasing cap: {e}")
             self.cap = None
-            
+
+        self.start_reconnect()
+
+    def start_reconnect(self):
+        if self.reconnect_thread and self.reconnect_thread.isRunning():
+            return
+        if self.current_camera_index is None:
+            QTimer.singleShot(1000, self.safe_resume_camera)
+            return
+
+        self.reconnect_started = time.monotonic()
+        self.video_label.setText("Camera disconnected... Cyber Ninjas are reconnecting")
+        self.video_label.setAlignment(Qt.AlignCenter)
+        self.reconnect_thread = CameraReconnectThread(self.current_camera_index)
+        self.reconnect_thread.reconnected.connect(self.on_reconnected)
+        self.reconnect_thread.start()
+
+    def on_reconnected(self, success, index, cap, attempts):
+        self.reconnect_thread.wait()
+        self.reconnect_thread.deleteLater()
+        self.reconnect_thread = None
+        elapsed_ms = 1000 * (time.monotonic() - self.reconnect_started)
+
+        with self.cap_lock:
+            # The user may have picked another source while we were retrying
+            if success and (self.cap is not None or index != self.current_camera_index):
+                cap.release()
+                return
+            if success:
+                self.cap = cap
+
+        if success:
+            print(f"Camera {index} recovered in {elapsed_ms:.0f} ms after {attempts} attempts")
+            self.capture_btn.setEnabled(True)
+            if not self.timer.isActive() and not self.is_playback_mode:
+                self.timer.start(30)
+            return
+
+        print(f"Camera {index} did not come back after {attempts} attempts ({elapsed_ms:.0f} ms), rescanning")
+        self.safe_resume_camera()
+
+    def on_devices_changed(self, added, removed):
+        print(f"Video devices changed: added {added}, removed {removed}")
+        if not added:
+            return
+        if self.reconnect_thread:
+            self.reconnect_thread.wake()
+            return
+
+        has_cap = self.cap is not None
+        busy = (
+            (self.camera_open_thread and self.camera_open_thread.isRunning())
+            or (self.camera_search_thread and self.camera_search_thread.isRunning())
+        )
+        if has_cap or busy:
+            return
+        if self.current_camera_index is None:
+            # Nothing was connected before, so look at what just arrived
+            self.start_camera_search()
+        else:
+            self.start_reconnect()
 
     def resume_live_feed(self):
         print("resume_live_feed called")
@@ -590,7 +4262,7 @@ class StopMotionApp(QWidget):
 
 
     def capture_frame(self):
-        if self.latest_frame is None:
+        if getattr(self, "latest_frame", None) is None:
             QMessageBox.warning(self, "Capture Failed", "No frame available to capture.")
             return
 
@@ -598,97 +4270,409 @@ class StopMotionApp(QWidget):
             QMessageBox.warning(self, "No Project", "Please create a new project before capturing frames.")
             return
 
-        frame = self.latest_frame
-        self.unsaved_changes = True
+        if self.project_scan_thread is not None:
+            QMessageBox.information(self, "Opening Project", "The project is still opening, try again in a moment.")
+            return
 
-        frame_name = f"frame_{len(self.captured_frames):04d}.png"
-        frame_path = os.path.join(self.project_path, frame_name)
+        if self.fullres_checkbox.isChecked():
+            self.capture_still()
+        else:
+            self.capture_preview_frame()
+
+    def capture_preview_frame(self):
+        frame = self.latest_frame
+        best = self.capture_worker.preroll.best() if self.sharpest_checkbox.isChecked() else None
+        if best is not None:
+            frame, sequence, sharpness, motion = best
+            age = self.capture_worker.sequence - sequence
+            print(f"Captured the frame from {age} frames ago (sharpness {sharpness:.0f}, motion {motion:.1f}); "
+                  f"scoring takes {self.capture_worker.preroll.score_ms:.2f} ms per frame")
+        frame_path = self.next_frame_path()
         cv2.imwrite(frame_path, frame)
 
-        index = len(self.captured_frames)  # new frame will be appended at this index
-        self.captured_frames.append(frame_path)
+        self.append_frames([frame_path])
+        self.timeline.scrollToBottom()
+
+    def capture_still(self):
+        if self.still_thread is not None:
+            return  # one still at a time
+        self.still_thread = StillCaptureThread(self.cap_lock, self.cap, self.next_frame_path())
+        self.still_thread.still_captured.connect(self.on_still_captured)
+        self.still_thread.still_failed.connect(self.on_still_failed)
+        self.still_thread.finished.connect(self.on_still_finished)
+        self.capture_btn.setEnabled(False)
+        self.still_thread.start()
+
+    def cancel_still(self):
+        # Before the project or camera changes; the thread's finished signal
+        # cleans it up once it lets go of the camera
+        if self.still_thread:
+            self.still_thread.cancel()
+
+    def on_still_finished(self):
+        if self.sender() is not self.still_thread:
+            return
+        self.still_thread.deleteLater()
+        self.still_thread = None
+        self.capture_btn.setEnabled(self.cap is not None)
+
+    def on_still_captured(self, path, summary):
+        print(summary)
+        self.fullres_checkbox.setToolTip(summary)
+        if not self.in_project(path):
+            return  # taken for a project that has since been closed
+        self.append_frames([path])
+        self.timeline.scrollToBottom()
 
-        # Push action as (type, index, path)
-        self.undo_stack.append(("add", index, frame_path))
+    def on_still_failed(self, reason):
+        if self.still_thread.cancelled() or not self.in_project(self.still_thread.path):
+            return  # requested for a project that has since been closed
+        print(f"Full-resolution still failed ({reason}); capturing from the preview instead")
+        self.capture_preview_frame()
+
+    def toggle_timelapse(self, checked):
+        if not checked:
+            self.stop_timelapse()
+            return
+
+        if not self.project_path:
+            QMessageBox.warning(self, "No Project", "Please create a new project before capturing frames.")
+            self.timelapse_btn.setChecked(False)
+            return
+
+        interval = self.timelapse_spin.value()
+        self.timelapse_thread = IntervalCaptureThread(
+            self.capture_worker, interval, self.next_frame_path,
+            os.path.join(self.project_path, "timelapse_log.csv"),
+        )
+        self.timelapse_thread.frame_captured.connect(self.on_timelapse_frame)
+        self.timelapse_thread.shot_missed.connect(self.on_timelapse_missed)
+        self.timelapse_thread.start()
+        self.timelapse_spin.setEnabled(False)
+        print(f"Time-lapse started: one frame every {interval} s")
+
+    def stop_timelapse(self):
+        if self.timelapse_thread is None:
+            return
+        self.timelapse_thread.stop()
+        print(self.timelapse_thread.summary())
+        self.timelapse_thread.deleteLater()
+        self.timelapse_thread = None
+        self.timelapse_spin.setEnabled(True)
+        self.timelapse_btn.blockSignals(True)
+        self.timelapse_btn.setChecked(False)
+        self.timelapse_btn.blockSignals(False)
+
+    def on_timelapse_frame(self, path, offset_ms):
+        # The frame is already on disk; only the timeline changes here. A shot
+        # delivered after a project change stays in its own project folder.
+        if not self.in_project(path):
+            return
+        self.append_frames([path])
+        self.timeline.scrollToBottom()
+        if self.timelapse_thread:
+            self.timelapse_btn.setToolTip(self.timelapse_thread.summary())
+
+    def in_project(self, path):
+        return bool(self.project_path) and os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.project_path)
+
+    def on_timelapse_missed(self, shot, reason):
+        print(f"Time-lapse shot {shot} missed: {reason}")
+
+    def selected_rows(self):
+        # Rows from the selection model; QListWidget.row(item) searches the list
+        return sorted({index.row() for index in self.timeline.selectionModel().selectedIndexes()})
+
+    def select_rows(self, rows):
+        self.timeline.blockSignals(True)
+        self.timeline.clearSelection()
+        for row in rows:
+            item = self.timeline.item(row)
+            if item:
+                item.setSelected(True)
+        self.timeline.blockSignals(False)
+
+    def next_frame_path(self):
+        # Frame numbers only ever go up, so a new frame can never land on the
+        # name of a deleted frame that undo may still need to restore. The
+        # time-lapse and import threads name their frames here too.
+        with self.frame_number_lock:
+            while True:
+                path = os.path.join(self.project_path, f"frame_{self.next_frame_number:04d}.png")
+                self.next_frame_number += 1
+                if not os.path.exists(path):
+                    return path
+
+    def trash_frame(self, path):
+        # Deleted frames are moved into .undo_cache rather than read into
+        # memory, so deleting hundreds of frames is just as many renames
+        trash_dir = os.path.join(self.project_path, ".undo_cache")
+        os.makedirs(trash_dir, exist_ok=True)
+        self.trash_counter += 1
+        trash_path = os.path.join(trash_dir, f"{self.trash_counter:06d}_{os.path.basename(path)}")
+        os.replace(path, trash_path)
+        return trash_path
+
+    def commit_timeline_change(self, frames, removed=(), created=(), holds=None):
+        # Every edit is one undo entry holding the timeline before and after
+        # (FrameTable snapshots of frame ids and holds), plus the files it
+        # removed ([path, trash path]) and created ([path, None]).
+        # holds (frame path -> frame times) replaces all holds; None keeps them.
+        before = self.captured_frames.snapshot()
+        self.captured_frames.set_frames(frames, holds)
+        self.push_timeline_change(before, removed, created)
+
+    def append_frames(self, paths):
+        # New frames at the end only add timeline rows, however long the project
+        before = self.captured_frames.snapshot()
+        self.captured_frames.extend(paths)
+        self.push_timeline_change(before, created=paths)
+
+    def push_timeline_change(self, before, removed=(), created=()):
+        action = (
+            "batch", before, self.captured_frames.snapshot(),
+            [list(entry) for entry in removed], [[path, None] for path in created],
+        )
+        self.undo_stack.append(action)
         self.redo_stack.clear()  # Clear redo stack on new action
 
+        self.unsaved_changes = True
         self.refresh_timeline()
-        self.timeline.scrollToBottom()
 
+    def copy_frames(self, jobs):
+        # Copy (source, destination) pairs in one pass; returns the ones that worked
+        def copy(job):
+            try:
+                shutil.copyfile(*job)
+                return True
+            except Exception as e:
+                print(f"Could not copy frame {job[0]}: {e}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(copy, jobs))
+        return [job for job, ok in zip(jobs, results) if ok]
 
     def delete_frame(self):
-        selected_items = self.timeline.selectedItems()
-        if not selected_items:
+        rows = self.selected_rows()
+        if not rows:
             return
 
         reply = QMessageBox.question(
             self, "Delete Frame(s)",
-            f"Are you sure you want to delete {len(selected_items)} frame(s)?",
+            f"Are you sure you want to delete {len(rows)} frame(s)?",
             QMessageBox.Yes | QMessageBox.No
         )
         if reply == QMessageBox.No:
             return
 
-        for item in selected_items:
-            row = self.timeline.row(item)
-            path = self.captured_frames.pop(row)
-
-            # Cache the file contents before deleting
+        removed = []
+        for row in rows:
+            path = self.captured_frames[row]
             try:
-                with open(path, "rb") as f:
-                    self.undo_cache[path] = f.read()
-            except Exception as e:
-                print(f"Failed to cache file {path} for undo: {e}")
+                removed.append((path, self.trash_frame(path)))
+            except OSError as e:
+                print(f"Failed to move {path} to the undo cache: {e}")
 
-            # Delete the actual file
-            if os.path.exists(path):
-                os.remove(path)
-
-            self.undo_stack.append(("delete", path, row))
-        self.unsaved_changes = True
-        self.refresh_timeline()
+        row_set = set(rows)
+        frames = [path for row, path in enumerate(self.captured_frames) if row not in row_set]
+        self.commit_timeline_change(frames, removed=removed)
         self.resume_live_feed()
 
+    def duplicate_frame(self):
+        rows = self.selected_rows()
+        if not rows:
+            QMessageBox.information(self, "No Frame Selected", "Please select a frame to duplicate.")
+            return
+        self.insert_copies(rows, 1)
+        self.timeline.scrollToBottom()
 
+    def hold_frames(self):
+        rows = self.selected_rows()
+        if not rows:
+            QMessageBox.information(self, "No Frame Selected", "Please select a frame to hold.")
+            return
+        # A hold is a per-frame duration, not extra copies of the file
+        count = self.hold_spin.value()
+        holds = self.captured_frames.holds()
+        for row in rows:
+            holds[self.captured_frames[row]] = count
+        self.commit_timeline_change(self.captured_frames.paths(), holds=holds)
+        self.select_rows(rows)
+
+    def insert_copies(self, rows, copies):
+        # Each selected frame is followed by `copies` copies of itself
+        jobs = []
+        for row in rows:
+            for _ in range(copies):
+                jobs.append((self.captured_frames[row], self.next_frame_path()))
+        copied = {dst for _, dst in self.copy_frames(jobs)}
+
+        jobs_by_source = {}
+        for src, dst in jobs:
+            if dst in copied:
+                jobs_by_source.setdefault(src, []).append(dst)
+
+        row_set = set(rows)
+        frames = []
+        for row, path in enumerate(self.captured_frames):
+            frames.append(path)
+            if row in row_set:
+                frames.extend(jobs_by_source.pop(path, []))
+        self.commit_timeline_change(frames, created=copied)
+
+    def move_frames(self, step):
+        rows = self.selected_rows()
+        if not rows:
+            return
 
-    def refresh_timeline(self):
-        self.timeline.clear()
-        icon_size = 80
-        valid_frames = []
+        row_set = set(rows)
+        selected = [self.captured_frames[row] for row in rows]
+        remaining = [path for row, path in enumerate(self.captured_frames) if row not in row_set]
+        target = max(0, min(rows[0] + step, len(remaining)))
+        frames = remaining[:target] + selected + remaining[target:]
+        if frames == self.captured_frames.paths():
+            return
 
-        for idx, frame_path in enumerate(self.captured_frames):
-            if not os.path.exists(frame_path):
-                print(f"Missing file: {frame_path}")
-                continue
+        self.commit_timeline_change(frames)
+        self.select_rows(range(target, target + len(selected)))
 
-            frame = cv2.imread(frame_path)
-            if frame is None:
-                print(f"Unreadable image file: {frame_path}")
-                continue
+    def reverse_frames(self):
+        rows = self.selected_rows()
+        if len(rows) < 2:
+            return
 
-            try:
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            except cv2.error as e:
-                print(f"OpenCV error on frame {frame_path}: {e}")
-                continue
+        frames = self.captured_frames.paths()
+        for row, path in zip(rows, reversed([frames[row] for row in rows])):
+            frames[row] = path
+        self.commit_timeline_change(frames)
+        self.select_rows(rows)
+
+    def refresh_timeline(self):
+        icon_size = 80
+        valid_frames = []
 
-            h, w, ch = frame.shape
-            bytes_per_line = ch * w
-            q_img = QImage(frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            if q_img.isNull():
-                print(f"Null QImage from frame: {frame_path}")
+        # Thumbnails not already cached show a placeholder and are decoded in
+        # the background (see on_thumbnail_ready), so this never waits on disk
+        if self.placeholder_thumb is None:
+            self.placeholder_thumb = QPixmap(icon_size * 4 // 3, icon_size)
+            self.placeholder_thumb.fill(QColor("#808080"))
+
+        # Frames added at the end only need rows of their own; any other edit
+        # rebuilds the timeline
+        frames = self.captured_frames
+        missing = []
+        self.timeline.blockSignals(True)
+        if (self.timeline_edits == frames.edits and not self.unreadable_frames
+                and self.timeline.count() <= len(frames)):
+            first = self.timeline.count()
+            valid_frames = [frames[row] for row in range(first)]
+        else:
+            first = 0
+            self.timeline_items = {}
+            self.timeline.clear()
+        for row in range(first, len(frames)):
+            frame_path = frames[row]
+            key = self.thumbnail_key(frame_path)
+            if key is None or frame_path in self.unreadable_frames:
+                print(f"Missing or unreadable image file: {frame_path}")
                 continue
 
-            thumb = QPixmap.fromImage(q_img).scaledToHeight(icon_size, Qt.SmoothTransformation)
+            thumb = self.thumbnail_cache.get(key)
+            if thumb is None:
+                missing.append((len(valid_frames), frame_path, key))
+                thumb = self.placeholder_thumb
 
-            item = QListWidgetItem(QIcon(thumb), f"{len(valid_frames)}")
+            hold = frames.hold(frame_path)
+            label = f"{len(valid_frames)}" if hold == 1 else f"{len(valid_frames)} \u00d7{hold}"
+            item = QListWidgetItem(QIcon(thumb), label)
             item.setData(Qt.UserRole, frame_path)
+            item.setData(Qt.UserRole + 1, key)
             item.setSizeHint(QSize(icon_size + 10, icon_size + 20))
             self.timeline.addItem(item)
+            self.timeline_items[frame_path] = item
 
             valid_frames.append(frame_path)
+        self.timeline.blockSignals(False)
+
+        if len(valid_frames) != len(frames):
+            frames.set_frames(valid_frames)
+        self.timeline_edits = frames.edits
+        self.unreadable_frames.clear()
+        self.scrub_slider.blockSignals(True)
+        self.scrub_slider.setRange(0, max(len(valid_frames) - 1, 0))
+        self.scrub_slider.blockSignals(False)
+
+        visible = set(self.visible_timeline_rows())
+        missing.sort(key=lambda job: job[0] not in visible)
+        if first:
+            self.thumbnails_pending |= {key for _, _, key in missing}
+        else:
+            self.thumbnails_pending = {key for _, _, key in missing}
+        self.thumbnail_thread.request([(frame_path, key) for _, frame_path, key in missing], keep_pending=first > 0)
+        self.update_loading_label()
+
+    def visible_timeline_rows(self):
+        viewport = self.timeline.viewport()
+        first = self.timeline.indexAt(QPoint(5, viewport.height() // 2)).row()
+        if first < 0:
+            # Not laid out yet; assume the view sits where it is scrolled to
+            first = max(self.timeline.currentRow(), 0)
+        pitch = 90 + 2 * self.timeline.spacing()
+        return range(first, min(first + viewport.width() // pitch + 2, self.timeline.count()))
+
+    def prioritize_visible_thumbnails(self):
+        if not self.thumbnails_pending:
+            return
+        keys = []
+        for row in self.visible_timeline_rows():
+            item = self.timeline.item(row)
+            if item is not None:
+                keys.append(item.data(Qt.UserRole + 1))
+        self.thumbnail_thread.prioritize(keys)
+
+    def on_thumbnail_ready(self, key, image):
+        if key not in self.thumbnails_pending:
+            return  # requested for an older timeline
+        self.thumbnails_pending.discard(key)
+        frame_path = key[0]
+
+        if image is None:
+            self.unreadable_frames.add(frame_path)
+        else:
+            thumb = QPixmap.fromImage(image)
+            self.thumbnail_cache.put(key, thumb, 4 * image.width() * image.height(), cost=20)
+            item = self.timeline_items.get(frame_path)
+            if item is not None:
+                item.setIcon(QIcon(thumb))
+
+        if not self.thumbnails_pending and self.unreadable_frames:
+            # Everything else is cached now, so this rebuild is immediate
+            self.refresh_timeline()
+        elif len(self.thumbnails_pending) % 20 == 0:
+            self.update_loading_label()
+
+    def update_loading_label(self):
+        if self.project_scan_thread is not None:
+            self.loading_label.setText("Opening project...")
+        elif self.thumbnails_pending:
+            self.loading_label.setText(f"Loading thumbnails: {len(self.thumbnails_pending)} left")
+        else:
+            self.loading_label.hide()
+            return
+        self.loading_label.show()
 
-        self.captured_frames = valid_frames
+    def thumbnail_key(self, frame_path):
+        # The mtime makes a frame file rewritten under the same name a new entry
+        try:
+            return frame_path, os.stat(frame_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def update_memory_label(self):
+        stats = self.cache_manager.stats()
+        self.memory_label.setText(stats.splitlines()[0])
+        self.memory_label.setToolTip(stats)
 
     def undo(self):
         if not self.undo_stack:
@@ -696,102 +4680,103 @@ class StopMotionApp(QWidget):
 
         action = self.undo_stack.pop()
         self.redo_stack.append(action)
+        _, before, _, removed, created = action
 
-        if action[0] == "add":
-            # Undo adding a frame: remove it & delete file
-            path = action[1]
-            self.unsaved_changes = True
-            if path in self.captured_frames:
-                self.captured_frames.remove(path)
-                if os.path.exists(path):
-                    os.remove(path)
-
-        elif action[0] == "delete":
-            # Undo deleting a frame: restore file and reinsert path
-            path = action[1]
-            index = action[2]
-            self.unsaved_changes = True
-
-            # Restore file from undo_cache if present
-            if path in self.undo_cache:
-                try:
-                    with open(path, "wb") as f:
-                        f.write(self.undo_cache[path])
-                except Exception as e:
-                    print(f"Failed to restore file {path} on undo: {e}")
-            else:
-                print(f"No cached data for {path} to restore on undo")
-
-            if 0 <= index <= len(self.captured_frames):
-                self.captured_frames.insert(index, path)
+        # Frames this action created go to the undo cache, frames it removed come back
+        for entry in created:
+            try:
+                entry[1] = self.trash_frame(entry[0])
+            except OSError as e:
+                print(f"Failed to remove {entry[0]} on undo: {e}")
+        for entry in removed:
+            try:
+                os.replace(entry[1], entry[0])
+            except OSError as e:
+                print(f"Failed to restore file {entry[0]} on undo: {e}")
 
+        self.captured_frames.restore(before)
+        self.unsaved_changes = True
         self.refresh_timeline()
 
-
     def redo(self):
         if not self.redo_stack:
             return
 
         action = self.redo_stack.pop()
         self.undo_stack.append(action)
+        _, _, after, removed, created = action
 
-        if action[0] == "add":
-            path = action[1]
-            self.captured_frames.append(path)
-
-        elif action[0] == "delete":
-            path = action[1]
-            if path in self.captured_frames:
-                self.captured_frames.remove(path)
-
-            # # Delete file again and clear cache
-            # if os.path.exists(path):
-            #     os.remove(path)
-
-            # if path in self.undo_cache:
-            #     del self.undo_cache[path]
+        for entry in removed:
+            try:
+                entry[1] = self.trash_frame(entry[0])
+            except OSError as e:
+                print(f"Failed to remove {entry[0]} on redo: {e}")
+        for entry in created:
+            try:
+                os.replace(entry[1], entry[0])
+            except OSError as e:
+                print(f"Failed to restore file {entry[0]} on redo: {e}")
 
+        self.captured_frames.restore(after)
+        self.unsaved_changes = True
         self.refresh_timeline()
 
     def update_onion_skin(self):
-        frame = self.latest_frame
-        if not self.cap or not self.cap.isOpened():
-            return
-
-        ret, live_frame = self.cap.read()
-        if not ret:
+        frame = getattr(self, "latest_frame", None)
+        if frame is None or not self.captured_frames:
             return
 
-        live_frame = cv2.cvtColor(live_frame, cv2.COLOR_BGR2RGBA)
-        height, width = live_frame.shape[:2]
+        width, height = self.preview_size(frame)
+        if (width, height) != (frame.shape[1], frame.shape[0]):
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        frame = apply_effects(frame, self.live_effects())
 
-        # Start with live frame
-        composite = live_frame.astype(float)
-
-        # Use user-defined number of layers
-        max_layers = self.onion_layer_spin.value()
+        # Use user-defined number of layers, fewer if the preview is behind
+        max_layers = self.preview_governor.layer_cap(self.onion_layer_spin.value())
         num_frames = len(self.captured_frames)
         layers_to_show = min(max_layers, num_frames)
+        base_opacity = self.opacity_slider.value() / 100.0
 
+        layers = []
+        weights = []
+        wanted = set()
         for i in range(1, layers_to_show + 1):
-            frame_path = self.captured_frames[-i]
-            previous_frame = cv2.imread(frame_path, cv2.IMREAD_UNCHANGED)
-            if previous_frame is None:
+            key, buffer = self.get_onion_layer(self.captured_frames[-i], width, height)
+            wanted.add(key)
+            if buffer is None:
                 continue
-            previous_frame = cv2.resize(previous_frame, (width, height))
-            previous_frame = cv2.cvtColor(previous_frame, cv2.COLOR_BGR2RGBA)
-
-            base_opacity = self.opacity_slider.value() / 100.0
-            layer_opacity = base_opacity / i  # fade with distance
+            layers.append(buffer)
+            weights.append(base_opacity / i)  # fade with distance
+        self.prune_onion_layers(wanted)
+        self.cache_manager.pin("Onion layers", sum(b.array.nbytes for b, _ in self.onion_layers.values()))
 
-            composite = cv2.addWeighted(previous_frame.astype(float), layer_opacity, composite, 1.0, 0)
-
-        composite = np.clip(composite, 0, 255).astype(np.uint8)
-        qt_image = QImage(composite.data, width, height, QImage.Format_RGBA8888)
-        pix = QPixmap.fromImage(qt_image).scaled(self.video_label.width(), self.video_label.height(), Qt.KeepAspectRatio)
-        self.video_label.setPixmap(pix)
+        self.show_preview_rgb(self.draw_analysis(blend_onion(frame, [b.array for b in layers], weights)))
 
-    
+    def get_onion_layer(self, frame_path, width, height):
+        # Earlier frames are decoded once into shared memory by the pipeline and
+        # reused every tick. A layer still decoding is skipped rather than waited on.
+        try:
+            key = (frame_path, os.stat(frame_path).st_mtime_ns, width, height)
+        except OSError:
+            return (frame_path, None, width, height), None
+
+        entry = self.onion_layers.get(key)
+        if entry is None:
+            buffer = SharedFrameBuffer((height, width, 3))
+            self.onion_layers[key] = (buffer, self.image_pipeline.load_into(frame_path, buffer, (width, height)))
+            return key, None
+
+        buffer, future = entry
+        if not future.done() or future.exception() is not None or future.result() is None:
+            return key, None
+        return key, buffer
+
+    def prune_onion_layers(self, wanted):
+        for key in list(self.onion_layers):
+            buffer, future = self.onion_layers[key]
+            if key not in wanted and future.done():
+                self.image_pipeline.discard(buffer)
+                del self.onion_layers[key]
 
     def new_project(self):
         if self.unsaved_changes:
@@ -817,16 +4802,17 @@ class StopMotionApp(QWidget):
             self.project_loading_dialog = ProjectLoadingDialog(self)
             self.project_loading_dialog.show()
 
+            # Stopped before the project changes, so no shot lands in the new
+            # folder; a still being taken is abandoned
+            self.stop_timelapse()
+            self.cancel_still()
             self.project_path = folder
             self.captured_frames.clear()
+            self.finish_backup()
+            self.reset_frame_effects()
             self.undo_stack.clear()
             self.redo_stack.clear()
-
-            # Clear the in-memory cache
-            if hasattr(self, "undo_cache"):
-                self.undo_cache.clear()
-            else:
-                self.undo_cache = {}
+            self.next_frame_number = 0
 
             self.refresh_timeline()
             self.unsaved_changes = False
@@ -843,44 +4829,220 @@ class StopMotionApp(QWidget):
                 self.project_loading_dialog.close()
                 self.project_loading_dialog = None
 
+    def project_frame_size(self):
+        # Imported frames are resized to match what is already in the project
+        if self.captured_frames:
+            frame = cv2.imread(self.captured_frames[0])
+            if frame is not None:
+                return frame.shape[1], frame.shape[0]
+        frame = getattr(self, "latest_frame", None)
+        if frame is not None:
+            return frame.shape[1], frame.shape[0]
+        return None
+
+    def import_frames(self, folder):
+        if not self.project_path:
+            QMessageBox.warning(self, "No Project", "Please create a new project before importing frames.")
+            return
+        if self.import_thread and self.import_thread.isRunning():
+            return
+
+        if folder:
+            source_path = QFileDialog.getExistingDirectory(self, "Import Image Folder")
+        else:
+            source_path, _ = QFileDialog.getOpenFileName(
+                self, "Import Video File", "", "Video files (*.mp4 *.avi *.mov *.mkv *.m4v);;All files (*)"
+            )
+        if not source_path:
+            return
+
+        self.import_progress = QProgressDialog("Cyber Ninjas are importing frames...", "Cancel", 0, 0, self)
+        self.import_progress.setWindowTitle("Importing")
+        self.import_progress.setWindowModality(Qt.WindowModal)
+        self.import_progress.setMinimumDuration(0)
+
+        self.import_thread = FrameImportThread(
+            self.image_pipeline, source_path, self.next_frame_path,
+            size=self.project_frame_size(), fps=self.fps_spin.value(),
+        )
+        self.import_thread.progress.connect(self.on_import_progress)
+        self.import_thread.import_finished.connect(self.on_import_finished)
+        self.import_progress.canceled.connect(self.import_thread.cancel)
+        self.import_thread.start()
+
+    def on_import_progress(self, done, total):
+        if self.import_progress:
+            self.import_progress.setMaximum(total)
+            self.import_progress.setValue(done)
+
+    def on_import_finished(self, paths, cancelled):
+        if self.import_progress:
+            self.import_progress.close()
+            self.import_progress = None
+
+        self.import_thread.wait()
+        self.import_thread.deleteLater()
+        self.import_thread = None
+
+        if cancelled:
+            # A cancelled import leaves the project as it was
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"Failed to remove partially imported frame {path}: {e}")
+            return
+
+        if not paths:
+            QMessageBox.warning(self, "Import Failed", "No frames could be imported.")
+            return
+
+        self.append_frames(paths)
+        self.timeline.scrollToBottom()
+
     def toggle_loop(self, state):
         self.loop_playback = bool(state)
 
+    def start_playback_clock(self, position=0.0):
+        # position is in frame times from the start of the timeline; a held
+        # frame lasts several frame times, exactly as in the exports
+        self.playback_version = self.captured_frames.version
+        self.playback_starts = [0] + list(accumulate(self.captured_frames.hold_counts()))
+        self.playback_fps = self.fps_spin.value()
+        self.playback_started = time.monotonic() - position / self.playback_fps
+
     def playback_next_frame(self):
         if not self.captured_frames:
             self.play_pause_btn.setChecked(False)
             self.playback_timer.stop()
             return
 
-        if self.playback_index >= len(self.captured_frames):
-            if self.loop_playback:
-                self.playback_index = 0
-            else:
-                self.play_pause_btn.setChecked(False)
-                self.playback_timer.stop()
-                return
+        now = time.monotonic()
+        if self.playback_version != self.captured_frames.version or self.playback_fps != self.fps_spin.value():
+            # The timeline or the speed changed while playing; carry on from the same point
+            position = (now - self.playback_started) * self.playback_fps
+            self.start_playback_clock(position % self.playback_starts[-1])
+            self.playback_index = None
 
-        frame_path = self.captured_frames[self.playback_index]
-        if not os.path.exists(frame_path):
-            print(f"Frame path does not exist: {frame_path}")
-            self.playback_index += 1
+        length = self.playback_starts[-1]
+        elapsed = (now - self.playback_started) * self.playback_fps
+        if elapsed >= length and not self.loop_playback:
+            self.play_pause_btn.setChecked(False)
             return
+        loops, position = divmod(elapsed, length)
+        index = bisect.bisect_right(self.playback_starts, position) - 1
+
+        if index != self.playback_index:
+            if self.playback_index is not None:
+                # Frames that were due while the last one was on screen too long
+                self.playback_dropped += (index - self.playback_index - 1) % len(self.captured_frames)
+            self.playback_index = index
+            self.playback_shown += 1
+            frame_path = self.captured_frames[index]
+            if os.path.exists(frame_path):
+                pixmap = QPixmap(frame_path).scaled(
+                    self.video_label.width(), self.video_label.height(), Qt.KeepAspectRatio
+                )
+                self.video_label.setPixmap(pixmap)
+                if self.stream_server and self.stream_server.watched:
+                    self.stream_server.publish(pixmap.toImage())
+            else:
+                print(f"Frame path does not exist: {frame_path}")
 
-        pixmap = QPixmap(frame_path).scaled(self.video_label.width(), self.video_label.height(), Qt.KeepAspectRatio)
-        self.video_label.setPixmap(pixmap)
-        self.playback_index += 1
+        # Sleep until the next frame is due
+        due = self.playback_started + (loops * length + self.playback_starts[index + 1]) / self.playback_fps
+        self.playback_timer.start(max(1, math.ceil(1000 * (due - time.monotonic()))))
+
+    def playback_stats(self):
+        total = self.playback_shown + self.playback_dropped
+        dropped = self.playback_dropped / total if total else 0.0
+        return (f"Playback: {self.playback_shown} frames shown, {self.playback_dropped} dropped "
+                f"({dropped:.1%}) at {self.fps_spin.value()} fps")
 
 
     def save_project(self):
         if self.project_path:
-            undo_folder = os.path.join(self.project_path, ".undo_cache")
-            if os.path.exists(undo_folder):
-                shutil.rmtree(undo_folder)
+            # Deleted frames stay in .undo_cache until the project is closed,
+            # so undo keeps working after a save
             self.save_metadata()  # Save settings here
             QMessageBox.information(self, "Project Saved", f"Project saved in: {self.project_path}")
             self.unsaved_changes = False
 
 
+    def backup_project(self, zip_file=None):
+        # zip_file None repeats the last backup of this project
+        if not self.project_path:
+            QMessageBox.warning(self, "No Project", "Please open or create a project first.")
+            return
+        if self.backup_thread is not None:
+            QMessageBox.information(self, "Backup", "A backup is already running.")
+            return
+
+        target = self.backup_target
+        if zip_file is not None:
+            name = os.path.basename(os.path.normpath(self.project_path))
+            if zip_file:
+                target, _ = QFileDialog.getSaveFileName(
+                    self, "Back Up to Zip File", f"{name}.zip", "Zip files (*.zip)"
+                )
+                if target and not target.lower().endswith(".zip"):
+                    target += ".zip"
+            else:
+                folder = QFileDialog.getExistingDirectory(self, "Back Up to Folder")
+                target = os.path.join(folder, name) if folder else ""
+        if not target:
+            return
+
+        project = os.path.abspath(self.project_path)
+        if os.path.commonpath([project, os.path.abspath(target)]) == project:
+            QMessageBox.warning(self, "Backup", "The backup cannot go inside the project folder.")
+            return
+
+        self.save_metadata()  # so the backup has the current timeline
+        self.backup_target = target
+        self.backup_again_action.setEnabled(True)
+        self.backup_again_action.setText(f"Back Up Again ({os.path.basename(target)})")
+        self.stop_backup_action.setEnabled(True)
+        self.backup_thread = ProjectBackupThread(self.project_path, target, self.backup_rate_mb_s)
+        self.backup_thread.progress.connect(self.on_backup_progress)
+        self.backup_thread.backup_finished.connect(self.on_backup_finished)
+        self.backup_thread.start(QThread.LowPriority)
+        print(f"Backup to {target} started")
+
+    def stop_backup(self):
+        if self.backup_thread:
+            self.backup_thread.cancel()
+
+    def finish_backup(self):
+        # Before the project changes: stop a running backup (it resumes
+        # incrementally next time) and forget the old project's target
+        if self.backup_thread:
+            self.backup_thread.cancel()
+            self.release_backup_thread("Backup stopped")
+        self.backup_target = None
+        self.backup_again_action.setEnabled(False)
+        self.backup_again_action.setText("Back Up Again")
+
+    def on_backup_progress(self, written, total):
+        if total:
+            self.backup_btn.setText(f"Backup {100 * written // total}%")
+
+    def on_backup_finished(self, summary, succeeded):
+        if self.sender() is not self.backup_thread:
+            return  # a backup stopped by a project change; already cleaned up
+        self.release_backup_thread(summary)
+        if not succeeded and not summary.startswith("Backup stopped"):
+            QMessageBox.warning(self, "Backup Failed", summary)
+
+    def release_backup_thread(self, summary):
+        self.backup_thread.wait()
+        self.backup_thread.deleteLater()
+        self.backup_thread = None
+        self.backup_btn.setText("Backup")
+        self.backup_btn.setToolTip(summary)
+        self.stop_backup_action.setEnabled(False)
+        print(summary)
+
     def open_project(self):
         if self.unsaved_changes:
             reply = QMessageBox.question(
@@ -898,44 +5060,47 @@ class StopMotionApp(QWidget):
         folder = QFileDialog.getExistingDirectory(self, "Open Project Folder", options=options)
 
         if folder:
-            self.project_loading_dialog = ProjectLoadingDialog(self)
-            self.project_loading_dialog.show()
-
+            # A scan still running for the previous project finishes quickly;
+            # its result is ignored once the project has changed
+            if self.project_scan_thread:
+                self.project_scan_thread.wait()
+                self.project_scan_thread.deleteLater()
+                self.project_scan_thread = None
+
+            # Stopped before the project changes, so no shot lands in the new
+            # folder; a still being taken is abandoned
+            self.stop_timelapse()
+            self.cancel_still()
             self.project_path = folder
-            self.captured_frames = []
+            self.captured_frames.clear()
+            self.finish_backup()
+            self.reset_frame_effects()
             self.undo_stack.clear()
             self.redo_stack.clear()
-            self.undo_cache.clear()
             self.unsaved_changes = False
+            self.next_frame_number = 0
 
-            # Create or clear undo cache folder
-            undo_cache_dir = os.path.join(self.project_path, ".undo_cache")
-            if os.path.exists(undo_cache_dir):
-                try:
-                    shutil.rmtree(undo_cache_dir)
-                except Exception as e:
-                    print(f"Failed to clear undo cache: {e}")
-            try:
-                os.makedirs(undo_cache_dir)
-            except Exception as e:
-                print(f"Failed to create undo cache directory: {e}")
-
-            for file in sorted(os.listdir(folder)):
-                if file.endswith(".png") and file.startswith("frame_"):
-                    full_path = os.path.join(folder, file)
-                    if os.path.exists(full_path) and cv2.imread(full_path) is not None:
-                        self.captured_frames.append(full_path)
-                    else:
-                        print(f"Skipping missing or unreadable file: {full_path}")
-
+            # Clearing the timeline also drops the old project's queued thumbnails
             self.refresh_timeline()
-            self.load_metadata()
-            self.open_camera(self.current_camera_index)
 
-            if self.project_loading_dialog:
-                self.project_loading_dialog.close()
-                self.project_loading_dialog.deleteLater()
-                self.project_loading_dialog = None
+            self.project_scan_thread = ProjectScanThread(folder, self.load_frame_order())
+            self.project_scan_thread.project_scanned.connect(self.on_project_scanned)
+            self.project_scan_thread.start()
+            self.update_loading_label()
+
+    def on_project_scanned(self, folder, frames, next_number):
+        if self.sender() is not self.project_scan_thread:
+            return  # scan of a project that has since been replaced
+        self.project_scan_thread.wait()
+        self.project_scan_thread.deleteLater()
+        self.project_scan_thread = None
+
+        # Timeline rows appear at once; thumbnails fill in from the visible end
+        self.captured_frames.set_frames(frames)
+        self.next_frame_number = max(self.next_frame_number, next_number)
+        self.load_metadata()  # before the timeline is built, it holds the frame holds
+        self.refresh_timeline()
+        self.open_camera(self.current_camera_index)
 
 
     def change_camera(self, index):
@@ -946,6 +5111,11 @@ class StopMotionApp(QWidget):
         if selected_index is None:
             return
 
+        if selected_index in (self.REPLAY_FILE_ENTRY, self.REPLAY_FOLDER_ENTRY):
+            selected_index = self.choose_replay_source(selected_index == self.REPLAY_FOLDER_ENTRY)
+            if selected_index is None:
+                return
+
         if selected_index == self.current_camera_index:
             # User selected the currently active camera; do nothing
             return
@@ -955,23 +5125,61 @@ class StopMotionApp(QWidget):
 
 
 
+    def choose_replay_source(self, folder):
+        if folder:
+            path = QFileDialog.getExistingDirectory(self, "Replay Image Folder")
+        else:
+            path, _ = QFileDialog.getOpenFileName(
+                self, "Replay Video File", "", "Video files (*.mp4 *.avi *.mov *.mkv);;All files (*)"
+            )
+
+        self.camera_selector.blockSignals(True)
+        if not path:
+            # Put the selector back on whatever is currently open
+            combo_index = self.camera_selector.findData(self.current_camera_index)
+            self.camera_selector.setCurrentIndex(max(combo_index, 0))
+            self.camera_selector.blockSignals(False)
+            return None
+
+        spec = f"file:{path}"
+        self.extra_sources[spec] = frame_source_label(spec)
+        self.available_cameras[spec] = self.extra_sources[spec]
+        combo_index = self.camera_selector.findData(spec)
+        if combo_index == -1:
+            combo_index = self.camera_selector.findData(self.REPLAY_FILE_ENTRY)
+            self.camera_selector.insertItem(combo_index, self.extra_sources[spec], spec)
+        self.camera_selector.setCurrentIndex(combo_index)
+        self.camera_selector.blockSignals(False)
+        return spec
+
     def play_pause_toggle(self, checked):
         if checked:
             self.play_pause_btn.setText("Pause")
             self.is_playback_mode = True
-            self.playback_index = 0
-            self.playback_timer.start(int(1000 / self.fps_spin.value()))
+            self.playback_index = None
+            self.playback_shown = 0
+            self.playback_dropped = 0
+            self.start_playback_clock()
+            self.playback_next_frame()
         else:
             self.play_pause_btn.setText("Play")
             self.is_playback_mode = False
             self.playback_timer.stop()
+            if self.playback_shown:
+                stats = self.playback_stats()
+                print(stats)
+                self.play_pause_btn.setToolTip(stats)
 
 
     def export_mp4(self):
         if not self.captured_frames:
             QMessageBox.warning(self, "Export Error", "No frames to export!")
             return
-
+        if self.deflicker_stale():
+            self.refresh_deflicker(self.export_mp4)
+            return
+        if self.export_thread and self.export_thread.isRunning():
+            return
 
         save_path, _ = QFileDialog.getSaveFileName(self, "Save MP4 Video", "", "MP4 files (*.mp4)")
         if not save_path:
@@ -991,72 +5199,411 @@ class StopMotionApp(QWidget):
 
         height, width, _ = first_frame.shape
 
-        # Create video writer with correct parameters
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # or try 'avc1' or 'H264' if issues persist
-        video_writer = cv2.VideoWriter(save_path, fourcc, fps, (width, height))
-
-        if not video_writer.isOpened():
-            QMessageBox.critical(self, "Export Error", "Failed to open video writer!")
-            return
-
-        for frame_path in self.captured_frames:
-            frame = cv2.imread(frame_path)
-            if frame is None:
-                continue
-
-            # Ensure consistent frame size
-            if frame.shape[1] != width or frame.shape[0] != height:
-                frame = cv2.resize(frame, (width, height))
-
-            video_writer.write(frame)
-
-        video_writer.release()
-
-        QMessageBox.information(self, "Export Complete", f"MP4 video saved to:\n{save_path}")
+        # Decoding and encoding run on the export thread; only re-encoding
+        # changed segments needs ffmpeg and a project to keep them in
+        ffmpeg = find_ffmpeg()
+        cache = self.get_export_cache() if ffmpeg and self.project_path else None
+        frame_paths = self.captured_frames.paths()
+        self.start_export(ExportThread(
+            "MP4", save_path, len(frame_paths), export_mp4_file,
+            self.image_pipeline, save_path, frame_paths, fps, width, height,
+            self.captured_frames.holds(), self.export_effects(), cache=cache, ffmpeg=ffmpeg,
+        ))
+
+    def get_export_cache(self):
+        if self.export_cache is None or self.export_cache.project_path != self.project_path:
+            self.export_cache = ExportCache(self.project_path)
+        return self.export_cache
 
     def export_gif(self):
         if not self.captured_frames:
             QMessageBox.warning(self, "Export Error", "No frames to export!")
             return
-
-        import imageio.v2 as imageio
-
+        if self.deflicker_stale():
+            self.refresh_deflicker(self.export_gif)
+            return
+        if self.export_thread and self.export_thread.isRunning():
+            return
 
         save_path, _ = QFileDialog.getSaveFileName(self, "Save GIF Animation", "", "GIF files (*.gif)")
         if not save_path:
             return  # User cancelled
 
         fps = self.fps_spin.value()
-        duration = 1 / fps
 
-        images = []
-        bad_frames = []
-        for frame_path in self.captured_frames:
-            try:
-                img = imageio.imread(frame_path)
-                images.append(img)
-            except Exception as e:
-                bad_frames.append(frame_path)
-                print(f"Warning: Could not load frame {frame_path}: {e}")
+        first_frame = cv2.imread(self.captured_frames[0])
+        if first_frame is None:
+            QMessageBox.warning(self, "Export Error", "Failed to read first frame!")
+            return
+        height, width = first_frame.shape[:2]
+
+        frame_paths = self.captured_frames.paths()
+        self.start_export(ExportThread(
+            "GIF", save_path, len(frame_paths), export_gif_file,
+            self.image_pipeline, save_path, frame_paths,
+            frame_durations_ms(frame_paths, self.captured_frames.holds(), fps),
+            width, height, self.gif_loop_value, self.export_effects(),
+        ))
+
+    def export_all(self):
+        if not self.captured_frames:
+            QMessageBox.warning(self, "Export Error", "No frames to export!")
+            return
+        if self.deflicker_stale():
+            self.refresh_deflicker(self.export_all)
+            return
+        if self.export_thread and self.export_thread.isRunning():
+            return
 
-        if not images:
-            QMessageBox.warning(self, "Export Error", "No valid frames to export.")
+        dialog = MultiExportDialog(self)
+        if dialog.exec() != QDialog.Accepted:
             return
 
-        try:
-            imageio.mimsave(save_path, images, duration=duration, loop = self.gif_loop_value)
-        except Exception as e:
-            QMessageBox.critical(self, "Export Failed", f"Could not save GIF:\n{e}")
+        base_path, _ = QFileDialog.getSaveFileName(self, "Export All (base name)", "", "All files (*)")
+        if not base_path:
+            return
+        base_path = os.path.splitext(base_path)[0]
+
+        first_frame = cv2.imread(self.captured_frames[0])
+        if first_frame is None:
+            QMessageBox.warning(self, "Export Error", "Failed to read first frame!")
+            return
+        height, width = first_frame.shape[:2]
+
+        fps = self.fps_spin.value()
+        sinks = []
+        if dialog.mp4_check.isChecked():
+            sinks.append(Mp4Sink(base_path + ".mp4", fps))
+        if dialog.gif_check.isChecked():
+            sinks.append(GifSink(base_path + ".gif", fps, self.gif_loop_value, min(dialog.gif_width_spin.value(), width)))
+        if dialog.sheet_check.isChecked():
+            sinks.append(ContactSheetSink(base_path + "_contact.png", dialog.sheet_width_spin.value()))
+        if dialog.sequence_check.isChecked():
+            sinks.append(ImageSequenceSink(base_path + "_frames"))
+        if not sinks:
             return
 
+        self.start_export(MultiExportThread(
+            self.image_pipeline, self.captured_frames.paths(), width, height, sinks,
+            self.captured_frames.holds(), self.export_effects()
+        ))
+
+    def start_export(self, thread):
+        self.export_progress = QProgressDialog("Cyber Ninjas are exporting...", None, 0, len(self.captured_frames), self)
+        self.export_progress.setWindowTitle("Exporting")
+        self.export_progress.setWindowModality(Qt.WindowModal)
+        self.export_progress.setMinimumDuration(0)
+
+        self.export_thread = thread
+        self.export_thread.progress.connect(self.on_export_progress)
+        self.export_thread.export_finished.connect(self.on_export_finished)
+        self.export_thread.start()
+
+    def on_export_progress(self, done, total):
+        if self.export_progress:
+            self.export_progress.setMaximum(total)
+            self.export_progress.setValue(done)
+
+    def on_export_finished(self, bad_frames, errors):
+        if self.export_progress:
+            self.export_progress.close()
+            self.export_progress = None
+        outputs = self.export_thread.outputs()
+        self.export_thread.wait()
+        self.export_thread.deleteLater()
+        self.export_thread = None
+
+        if errors:
+            QMessageBox.critical(
+                self, "Export Failed", "\n".join(f"{label}: {error}" for label, error in errors)
+            )
         if bad_frames:
             QMessageBox.warning(
                 self,
                 "Partial Export",
                 f"Some frames could not be loaded and were skipped:\n\n" + "\n".join(bad_frames)
             )
+        elif outputs:
+            QMessageBox.information(self, "Export Complete", "Saved:\n" + "\n".join(outputs))
+
+    def reset_frame_effects(self):
+        self.frame_effects = {
+            "deflicker": {}, "chroma_key": None,
+            "stabilize": {"enabled": False, "reference": None, "offsets": {}},
+        }
+        self.frame_brightness = {}
+        self.deflicker_timeline = []
+        self.deflicker_action.setChecked(False)
+        self.stabilize_action.setChecked(False)
+
+    def export_effects(self):
+        # Effect steps for each frame that needs any, in the order they apply
+        effects = {}
+        stabilize = self.frame_effects["stabilize"]
+        if stabilize["enabled"]:
+            for path, (dx, dy) in stabilize["offsets"].items():
+                if abs(dx) >= 0.25 or abs(dy) >= 0.25:
+                    effects.setdefault(path, []).append(("shift", round(-dx, 2), round(-dy, 2)))
+        for path, gain in self.frame_effects["deflicker"].items():
+            if abs(gain - 1.0) > 0.005:
+                effects.setdefault(path, []).append(("gain", round(float(gain), 4)))
+        if self.frame_effects["chroma_key"]:
+            step = chroma_key_step(self.frame_effects["chroma_key"])
+            for path in self.captured_frames:
+                effects.setdefault(path, []).append(step)
+        return effects
+
+    def live_effects(self):
+        # Effects that make sense on the camera image (not per-frame corrections)
+        if self.frame_effects["chroma_key"]:
+            return [chroma_key_step(self.frame_effects["chroma_key"])]
+        return []
+
+    def edit_chroma_key(self):
+        dialog = ChromaKeyDialog(self, self.frame_effects["chroma_key"])
+        if dialog.exec():
+            self.frame_effects["chroma_key"] = dialog.get_settings()
+            self.unsaved_changes = True
+
+    def run_pipeline_batch(self, title, fn, items, callback):
+        if self.batch_thread and self.batch_thread.isRunning():
+            return False
+
+        self.batch_progress = QProgressDialog(title, "Cancel", 0, len(items), self)
+        self.batch_progress.setWindowModality(Qt.WindowModal)
+        self.batch_progress.setMinimumDuration(0)
+
+        self.batch_callback = callback
+        self.batch_thread = PipelineBatchThread(self.image_pipeline, fn, items)
+        self.batch_thread.progress.connect(self.on_batch_progress)
+        self.batch_thread.batch_finished.connect(self.on_batch_finished)
+        self.batch_progress.canceled.connect(self.batch_thread.cancel)
+        self.batch_thread.start()
+        return True
+
+    def on_batch_progress(self, done, total):
+        if self.batch_progress:
+            self.batch_progress.setMaximum(total)
+            self.batch_progress.setValue(done)
+
+    def on_batch_finished(self, results, cancelled):
+        if self.batch_progress:
+            self.batch_progress.close()
+            self.batch_progress = None
+        self.batch_thread.wait()
+        self.batch_thread.deleteLater()
+        self.batch_thread = None
+        callback, self.batch_callback = self.batch_callback, None
+        callback(results, cancelled)
+
+    def analyze_flicker(self, callback):
+        # callback receives {frame path: gain} in timeline order, or None if
+        # cancelled or impossible. Frame brightness is remembered, so after
+        # new captures only the new frames are read.
+        frames = self.captured_frames.paths()
+        if len(frames) < 3:
+            QMessageBox.information(self, "Deflicker", "Deflicker needs at least three frames.")
+            callback(None)
+            return
+        wanted = [path for path in frames if path not in self.frame_brightness]
+
+        def analyzed(results, cancelled):
+            if cancelled:
+                callback(None)
+                return
+            self.frame_brightness.update(
+                (path, mean) for path, mean in zip(wanted, results) if mean is not None
+            )
+            readable = [path for path in frames if path in self.frame_brightness]
+            if len(readable) < 3:
+                QMessageBox.information(self, "Deflicker", "Deflicker needs at least three readable frames.")
+                callback(None)
+                return
+            start = time.perf_counter()
+            gains = deflicker_gains([self.frame_brightness[path] for path in readable])
+            print(f"Deflicker: {len(wanted)} frames read, gains for {len(readable)} computed in "
+                  f"{1000 * (time.perf_counter() - start):.1f} ms, largest correction {np.abs(gains - 1).max():.1%}")
+            self.deflicker_timeline = frames
+            callback({path: float(gain) for path, gain in zip(readable, gains)})
+
+        if not wanted:
+            analyzed([], False)
+        elif not self.run_pipeline_batch(
+            "Cyber Ninjas are measuring flicker...", pipeline_job_luma, [(path,) for path in wanted], analyzed
+        ):
+            callback(None)
+
+    def deflicker_stale(self):
+        # The gains depend on the whole timeline: frames captured, imported,
+        # removed or moved since they were computed call for new ones
+        return self.deflicker_action.isChecked() and self.deflicker_timeline != self.captured_frames.paths()
+
+    def refresh_deflicker(self, then):
+        # Brings stale gains up to date, then calls then(); nothing is called
+        # if the analysis is cancelled
+        def analyzed(gains):
+            if gains is not None:
+                self.frame_effects["deflicker"] = gains
+                self.unsaved_changes = True
+                then()
+
+        self.analyze_flicker(analyzed)
+
+    def toggle_deflicker(self, checked):
+        if not checked:
+            self.frame_effects["deflicker"] = {}
+            self.unsaved_changes = True
+            return
+
+        def analyzed(gains):
+            self.deflicker_action.setChecked(gains is not None)
+            if gains is not None:
+                self.frame_effects["deflicker"] = gains
+                self.unsaved_changes = True
+
+        self.analyze_flicker(analyzed)
+
+    def measure_offsets(self, callback):
+        # callback receives {frame path: [dx, dy]}, or None if cancelled or
+        # impossible. Offsets already measured against the same reference are
+        # reused, so after new captures only the new frames are measured.
+        frames = self.captured_frames.paths()
+        if len(frames) < 2:
+            QMessageBox.information(self, "Stabilize", "Stabilize needs at least two frames.")
+            callback(None)
+            return
+
+        rows = self.selected_rows()
+        reference = frames[rows[0]] if rows else frames[0]
+        stabilize = self.frame_effects["stabilize"]
+        if stabilize["reference"] != reference:
+            stabilize["reference"] = reference
+            stabilize["offsets"] = {}
+        cached = {path: stabilize["offsets"][path] for path in frames if path in stabilize["offsets"]}
+        wanted = [path for path in frames if path not in cached]
+        try:
+            reference_mtime = os.stat(reference).st_mtime_ns
+        except OSError as e:
+            QMessageBox.warning(self, "Stabilize", f"Cannot read the reference frame:\n{e}")
+            callback(None)
+            return
+
+        def measured(results, cancelled):
+            if cancelled:
+                callback(None)
+                return
+            offsets = dict(cached)
+            unmeasured = 0
+            for path, offset in zip(wanted, results):
+                if offset is None:
+                    unmeasured += 1
+                offsets[path] = list(offset or (0.0, 0.0))
+            stabilize["offsets"] = offsets
+            largest = max(math.hypot(*offset) for offset in offsets.values())
+            print(f"Stabilize: measured {len(wanted)} frames in {time.perf_counter() - start:.2f} s "
+                  f"({len(cached)} cached, {unmeasured} left in place), largest offset {largest:.1f} px")
+            callback(offsets)
+
+        start = time.perf_counter()
+        if not wanted:
+            measured([], False)
+        elif not self.run_pipeline_batch(
+            "Cyber Ninjas are lining up frames...", pipeline_job_register,
+            [(path, reference, reference_mtime) for path in wanted], measured,
+        ):
+            callback(None)
+
+    def toggle_stabilize(self, checked):
+        stabilize = self.frame_effects["stabilize"]
+        self.unsaved_changes = True
+        if not checked:
+            stabilize["enabled"] = False
+            return
+
+        def measured(offsets):
+            stabilize["enabled"] = offsets is not None
+            self.stabilize_action.setChecked(offsets is not None)
+
+        self.measure_offsets(measured)
+
+    def stabilize_frames(self):
+        def measured(offsets):
+            if offsets is None:
+                return
+            jobs = [
+                (path, self.next_frame_path(), [("shift", round(-dx, 2), round(-dy, 2))])
+                for path, (dx, dy) in offsets.items() if abs(dx) >= 0.25 or abs(dy) >= 0.25
+            ]
+            if not jobs:
+                QMessageBox.information(self, "Stabilize", "The frames already line up, nothing to change.")
+                return
+            self.run_pipeline_batch(
+                "Cyber Ninjas are writing corrected frames...", pipeline_job_bake, jobs,
+                lambda results, cancelled: self.replace_frame_versions(jobs, results, cancelled, "stabilize"),
+            )
+
+        self.measure_offsets(measured)
+
+    def deflicker_frames(self):
+        def analyzed(gains):
+            if gains is None:
+                return
+            jobs = []
+            for path, gain in gains.items():
+                if abs(gain - 1.0) > 0.005:
+                    jobs.append((path, self.next_frame_path(), [("gain", round(gain, 4))]))
+            if not jobs:
+                QMessageBox.information(self, "Deflicker", "No flicker found, nothing to change.")
+                return
+            self.run_pipeline_batch(
+                "Cyber Ninjas are writing corrected frames...", pipeline_job_bake, jobs,
+                lambda results, cancelled: self.replace_frame_versions(jobs, results, cancelled, "deflicker"),
+            )
+
+        self.analyze_flicker(analyzed)
+
+    def replace_frame_versions(self, jobs, results, cancelled, baked):
+        # Corrected frames replace the originals as one undoable edit; the
+        # originals go to the undo cache like deleted frames. The other
+        # per-frame effects follow the frames to their new versions.
+        written = [(src, dst) for (src, dst, _), ok in zip(jobs, results) if ok]
+        if cancelled:
+            for _, dst in written:
+                try:
+                    os.remove(dst)
+                except OSError as e:
+                    print(f"Failed to remove {dst}: {e}")
+            return
+
+        replacement = dict(written)
+        removed = []
+        for src in replacement:
+            try:
+                removed.append((src, self.trash_frame(src)))
+            except OSError as e:
+                print(f"Failed to move {src} to the undo cache: {e}")
+        frames = [replacement.get(path, path) for path in self.captured_frames]
+        holds = {replacement.get(path, path): count for path, count in self.captured_frames.holds().items()}
+
+        # Baked frames must not be corrected a second time at export
+        stabilize = self.frame_effects["stabilize"]
+        if baked == "deflicker":
+            self.frame_effects["deflicker"] = {}
+            self.deflicker_action.setChecked(False)
         else:
-            QMessageBox.information(self, "Export Complete", f"GIF animation saved to:\n{save_path}")
+            self.frame_effects["deflicker"] = {
+                replacement.get(path, path): gain for path, gain in self.frame_effects["deflicker"].items()
+            }
+        if baked == "stabilize":
+            stabilize["offsets"] = {replacement.get(path, path): [0.0, 0.0] for path in stabilize["offsets"]}
+            stabilize["enabled"] = False
+            self.stabilize_action.setChecked(False)
+        else:
+            stabilize["offsets"] = {
+                replacement.get(path, path): offset for path, offset in stabilize["offsets"].items()
+            }
+        stabilize["reference"] = replacement.get(stabilize["reference"], stabilize["reference"])
+        self.commit_timeline_change(frames, removed=removed, created=list(replacement.values()), holds=holds)
 
     def save_metadata(self):
         if not self.project_path:
@@ -1068,6 +5615,21 @@ class StopMotionApp(QWidget):
             "loop_playback": self.loop_checkbox.isChecked(),
             "theme": self.theme_selector.currentText(),
             "custom_theme": getattr(self, "custom_theme", None),
+            "frames": [os.path.basename(path) for path in self.captured_frames],
+            "backup_target": self.backup_target,
+            "holds": {os.path.basename(path): count for path, count in self.captured_frames.holds().items()},
+            "effects": {
+                "deflicker": {os.path.basename(path): gain for path, gain in self.frame_effects["deflicker"].items()},
+                "chroma_key": self.frame_effects["chroma_key"],
+                "stabilize": {
+                    "enabled": self.frame_effects["stabilize"]["enabled"],
+                    "reference": os.path.basename(self.frame_effects["stabilize"]["reference"] or ""),
+                    "offsets": {
+                        os.path.basename(path): offset
+                        for path, offset in self.frame_effects["stabilize"]["offsets"].items()
+                    },
+                },
+            },
         }
         meta_path = os.path.join(self.project_path, "project_meta.json")
         try:
@@ -1076,6 +5638,14 @@ class StopMotionApp(QWidget):
         except Exception as e:
             print(f"Failed to save metadata: {e}")
             
+    def load_frame_order(self):
+        meta_path = os.path.join(self.project_path, "project_meta.json")
+        try:
+            with open(meta_path, "r") as f:
+                return json.load(f).get("frames") or []
+        except Exception:
+            return []
+
     def load_metadata(self):
         if not self.project_path:
             return
@@ -1090,6 +5660,34 @@ class StopMotionApp(QWidget):
             self.opacity_slider.setValue(metadata.get("onion_opacity", 50))
             self.onion_layer_spin.setValue(metadata.get("onion_layers", 3))
             self.loop_checkbox.setChecked(metadata.get("loop_playback", True))
+            self.captured_frames.set_holds({
+                os.path.join(self.project_path, name): int(count)
+                for name, count in (metadata.get("holds") or {}).items() if int(count) > 1
+            })
+            self.backup_target = metadata.get("backup_target") or None
+            if self.backup_target:
+                self.backup_again_action.setEnabled(True)
+                self.backup_again_action.setText(f"Back Up Again ({os.path.basename(self.backup_target)})")
+            effects = metadata.get("effects") or {}
+            self.frame_effects = {
+                "deflicker": {
+                    os.path.join(self.project_path, name): float(gain)
+                    for name, gain in (effects.get("deflicker") or {}).items()
+                },
+                "chroma_key": effects.get("chroma_key") or None,
+            }
+            self.deflicker_timeline = self.captured_frames.paths()  # saved along with this timeline
+            stabilize = effects.get("stabilize") or {}
+            self.frame_effects["stabilize"] = {
+                "enabled": bool(stabilize.get("enabled")),
+                "reference": os.path.join(self.project_path, stabilize["reference"]) if stabilize.get("reference") else None,
+                "offsets": {
+                    os.path.join(self.project_path, name): [float(dx), float(dy)]
+                    for name, (dx, dy) in (stabilize.get("offsets") or {}).items()
+                },
+            }
+            self.deflicker_action.setChecked(bool(self.frame_effects["deflicker"]))
+            self.stabilize_action.setChecked(self.frame_effects["stabilize"]["enabled"])
             theme = metadata.get("theme", "System Default")
 
            
@@ -1108,55 +5706,20 @@ class StopMotionApp(QWidget):
         except Exception as e:
             print(f"Failed to load metadata: {e}")
         
-    def duplicate_frame(self):
-        selected_items = self.timeline.selectedItems()
-        if not selected_items:
-            QMessageBox.information(self, "No Frame Selected", "Please select a frame to duplicate.")
-            return
-
-        for item in selected_items:
-            index = self.timeline.row(item)
-            original_path = self.captured_frames[index]
-
-            if not os.path.exists(original_path):
-                QMessageBox.warning(self, "Error", f"Original frame is missing:\n{original_path}")
-                continue
-
-            # Generate new frame filename
-            new_index = len(self.captured_frames)
-            new_name = f"frame_{new_index:04d}.png"
-            new_path = os.path.join(self.project_path, new_name)
-
-            # Copy the frame file
-            try:
-                shutil.copy(original_path, new_path)
-            except Exception as e:
-                QMessageBox.critical(self, "Duplicate Failed", f"Could not copy frame:\n{e}")
-                continue
-
-            # Insert the copy after the selected frame
-            insert_at = index + 1
-            self.captured_frames.insert(insert_at, new_path)
-            self.undo_stack.append(("add", new_path))
-            self.unsaved_changes = True
-
-        self.refresh_timeline()
-        self.timeline.scrollToBottom()
-        
     def try_other_camera_if_still_dead(self):
         if not self.available_cameras:
             print("No cameras found after rescan.")
             QMessageBox.warning(self, "No Cameras", "No cameras were found after rescan.")
             return
 
-        with self.cap_lock:
-            if self.cap and self.cap.isOpened():
-                print("Fallback not needed; camera resumed.")
-                return
+        if self.cap and self.cap.isOpened():
+            print("Fallback not needed; camera resumed.")
+            return
 
         print("Trying other available cameras as fallback...")
         for idx in self.available_cameras:
-            if idx != self.current_camera_index:
+            # Only fall back to real cameras, never to a replay or test pattern
+            if isinstance(idx, int) and idx != self.current_camera_index:
                 print(f"Fallback to camera index {idx}")
                 self.current_camera_index = idx
                 self.open_camera(idx)
@@ -1284,6 +5847,29 @@ class StopMotionApp(QWidget):
             self.camera_open_thread.deleteLater()
             self.camera_open_thread = None
 
+        if self.stall_watchdog:
+            print(self.stall_watchdog.stop())
+        if self.stream_server:
+            print(self.stream_server.summary())
+            self.stream_server.stop()
+        self.stop_timelapse()
+        if self.still_thread:
+            # Gives up at its next camera read instead of finishing the still
+            self.still_thread.cancel()
+            self.still_thread.wait()
+        if self.backup_thread:
+            self.backup_thread.cancel()
+            self.backup_thread.wait()
+        self.capture_worker.stop()
+        self.device_watcher.stop()
+        self.thumbnail_thread.stop()
+        if self.project_scan_thread:
+            self.project_scan_thread.wait()
+        if self.reconnect_thread:
+            self.reconnect_thread.cancel()
+            self.reconnect_thread.wait()
+        print(self.preview_governor.stats())
+
         with self.cap_lock:
             if self.cap:
                 print("Releasing camera...")
@@ -1292,17 +5878,443 @@ class StopMotionApp(QWidget):
 
         self.timer.stop()
         self.playback_timer.stop()
+        self.decode_thread.stop()
+        if self.export_thread:
+            self.export_thread.wait()
+        if self.import_thread:
+            self.import_thread.cancel()
+            self.import_thread.wait()
+        if self.batch_thread:
+            self.batch_thread.cancel()
+            self.batch_thread.wait()
+
+        for buffer, _ in self.onion_layers.values():
+            self.image_pipeline.discard(buffer)
+        self.onion_layers.clear()
+        self.image_pipeline.close()
+        print(self.cache_manager.stats())
+
+        # Deleting frames becomes permanent once the app closes
+        if self.project_path:
+            shutil.rmtree(os.path.join(self.project_path, ".undo_cache"), ignore_errors=True)
 
         print("Closed cleanly.")
         event.accept()
 
 
+def benchmark_source(args):
+    # Read throughput and latency of a frame source, without the GUI
+    source = open_frame_source(args.source or "synthetic:1920x1080@30")
+    if not source.isOpened():
+        print(f"Could not open frame source {args.source}")
+        return
+
+    latencies = []
+    frames = 0
+    first_number = None
+    start = time.monotonic()
+    while time.monotonic() - start < args.seconds:
+        ret, frame = source.read()
+        if not ret:
+            continue
+        now = time.monotonic()
+        if first_number is None:
+            first_number = source.frame_number
+        if source.timestamp is not None:
+            latencies.append(now - source.timestamp)
+        frames += 1
+    elapsed = time.monotonic() - start
+    source.release()
+
+    expected = source.frame_number - first_number + 1 if first_number is not None else 0
+    latencies.sort()
+    print(f"source:   {args.source or 'synthetic:1920x1080@30'}")
+    print(f"frames:   {frames} in {elapsed:.2f}s ({frames / elapsed:.1f} fps)")
+    print(f"dropped:  {max(expected - frames, 0)}")
+    if latencies:
+        print(f"latency:  mean {1000 * sum(latencies) / len(latencies):.2f} ms, "
+              f"p95 {1000 * latencies[int(0.95 * (len(latencies) - 1))]:.2f} ms")
+
+
+def benchmark_pipeline(args):
+    # Per-stage throughput of the image pipeline as worker processes are added
+    import tempfile
+
+    count = 48
+    width, height = 1920, 1080
+    folder = tempfile.mkdtemp(prefix="cn_pipeline_bench_")
+    source = SyntheticFrameSource(width, height, fps=1000)
+    paths = []
+    for i in range(count):
+        _, frame = source.read()
+        path = os.path.join(folder, f"frame_{i:04d}.png")
+        cv2.imwrite(path, frame)
+        paths.append(path)
+    live = frame
+
+    cpus = os.cpu_count() or 1
+    worker_counts = [0, 1]
+    while worker_counts[-1] * 2 <= cpus:
+        worker_counts.append(worker_counts[-1] * 2)
+    if worker_counts[-1] != cpus:
+        worker_counts.append(cpus)
+
+    print(f"{count} frames at {width}x{height}, {cpus} CPUs")
+    print(f"{'workers':>8} {'export fps':>13} {'thumb fps':>13} {'onion fps':>10}")
+    baseline = None
+    try:
+        for workers in worker_counts:
+            pipeline = ImagePipeline(workers)
+            pipeline.start()
+            list(pipeline.map_frames(paths[:workers or 1], size=(64, 36)))  # wait for workers to spawn
+
+            start = time.perf_counter()
+            for _ in pipeline.map_frames(paths, size=(1280, 720)):
+                pass
+            export_fps = count / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for _ in pipeline.map_frames(paths, height=80, code=cv2.COLOR_BGR2RGB):
+                pass
+            thumb_fps = count / (time.perf_counter() - start)
+
+            layers = []
+            for path in paths[:3]:
+                buffer = SharedFrameBuffer((height, width, 3))
+                pipeline.load_into(path, buffer, (width, height)).result()
+                layers.append(buffer)
+            start = time.perf_counter()
+            for _ in range(count):
+                blend_onion(live, [b.array for b in layers], [0.5, 0.25, 0.17])
+            onion_fps = count / (time.perf_counter() - start)
+            for buffer in layers:
+                pipeline.discard(buffer)
+            pipeline.close()
+
+            if baseline is None:
+                baseline = export_fps, thumb_fps
+            label = "inline" if workers == 0 else str(workers)
+            print(f"{label:>8} {export_fps:>7.1f} x{export_fps / baseline[0]:<4.1f}"
+                  f"{thumb_fps:>8.1f} x{thumb_fps / baseline[1]:<4.1f}{onion_fps:>10.1f}")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def benchmark_gif(args):
+    # Size and encode time of the optimized GIF writer against imageio's
+    # mimsave, on a stop-motion-like clip: a still scene, one moving object
+    # and some held frames
+    import tempfile
+    import imageio.v2 as imageio
+
+    width, height, count = 640, 360, 48
+    _, scene = SyntheticFrameSource(width, height, fps=1000).read()
+    scene = cv2.cvtColor(cv2.GaussianBlur(scene, (0, 0), 3), cv2.COLOR_BGR2RGB)
+    frames = []
+    for i in range(count):
+        frame = scene.copy()
+        x = 40 + (i // 2) * 10  # every pose is held for two frames
+        cv2.circle(frame, (x, height // 2), 30, (230, 60, 40), -1)
+        frames.append(frame)
+    durations = [1000 / 12] * count
+
+    folder = tempfile.mkdtemp(prefix="cn_gif_bench_")
+    writers = [
+        ("imageio mimsave", lambda path: imageio.mimsave(path, frames, duration=durations, loop=0)),
+        ("global palette", lambda path: write_optimized_gif(path, frames, durations)),
+        ("palette every 8", lambda path: write_optimized_gif(path, frames, durations, palette_window=8)),
+    ]
+    print(f"{count} frames at {width}x{height}")
+    print(f"{'writer':>16} {'size KB':>9} {'seconds':>8}")
+    try:
+        for name, write in writers:
+            path = os.path.join(folder, name.replace(" ", "_") + ".gif")
+            start = time.perf_counter()
+            write(path)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>16} {os.path.getsize(path) / 1024:>9.0f} {elapsed:>8.2f}")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def benchmark_chroma(args):
+    # Frames per second of the chroma key on a green-screen-like frame: the
+    # mask lookup on its own, then the whole key onto black and onto an image
+    import tempfile
+
+    width, height, count = 1920, 1080, 60
+    _, subject = SyntheticFrameSource(width, height, fps=1000).read()
+    frame = np.empty_like(subject)
+    frame[:] = (40, 200, 60)
+    frame[height // 4:3 * height // 4, width // 4:3 * width // 4] = subject[height // 4:3 * height // 4, width // 4:3 * width // 4]
+    folder = tempfile.mkdtemp(prefix="cn_chroma_bench_")
+    background = os.path.join(folder, "background.png")
+    cv2.imwrite(background, cv2.GaussianBlur(subject, (0, 0), 8))
+
+    settings = dict(CHROMA_KEY_DEFAULTS)
+    lut = chroma_key_lut(tuple(settings["key"]), settings["tolerance"], settings["softness"])
+    onto_black = [chroma_key_step(settings)]
+    onto_image = [chroma_key_step(dict(settings, background=background))]
+
+    print(f"{count} frames at {width}x{height}")
+    try:
+        for name, run in (
+            ("mask only", lambda: chroma_key_mask(frame, lut)),
+            ("key onto black", lambda: apply_effects(frame, onto_black)),
+            ("key onto image", lambda: apply_effects(frame, onto_image)),
+        ):
+            run()  # build the tables and load the background once
+            start = time.perf_counter()
+            for _ in range(count):
+                run()
+            elapsed = time.perf_counter() - start
+            print(f"{name:>15}: {count / elapsed:6.1f} fps ({1000 * elapsed / count:.1f} ms per frame)")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def benchmark_stream(args):
+    # Per-client frame rate of the preview stream with a fast and a slow
+    # client, and whether publishing ever waits on them
+    import urllib.request
+
+    server = PreviewStreamServer(port=0, host="127.0.0.1")
+    server.start()
+    url = f"http://127.0.0.1:{server.port}"
+    stopping = Event()
+
+    def watch(name, delay):
+        # Reads the multipart stream part by part, sleeping after each frame
+        with urllib.request.urlopen(f"{url}/stream?name={name}", timeout=5) as response:
+            while not stopping.is_set():
+                while response.readline().strip() != f"--{PreviewStreamHandler.BOUNDARY}".encode():
+                    pass
+                length = 0
+                for line in iter(response.readline, b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":")[1])
+                response.read(length)
+                time.sleep(delay)
+
+    readers = {"fast-1": 0.0, "fast-2": 0.0, "slow": 0.25}
+    clients = [Thread(target=watch, args=reader, daemon=True) for reader in readers.items()]
+    for client in clients:
+        client.start()
+
+    source = SyntheticFrameSource(960, 540, fps=30)
+    publish_ms = []
+    frames = 0
+    start = time.monotonic()
+    while time.monotonic() - start < args.seconds:
+        _, frame = source.read()
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        begin = time.perf_counter()
+        server.publish(rgb)
+        publish_ms.append(1000 * (time.perf_counter() - begin))
+        frames += 1
+
+    with urllib.request.urlopen(f"{url}/stats", timeout=5) as response:
+        stats = json.loads(response.read())
+    stopping.set()
+    server.stop()
+
+    print(f"published {frames} frames at 960x540 in {args.seconds:.0f}s, "
+          f"slowest publish {max(publish_ms):.2f} ms")
+    print(f"encoded {stats['encoded']} ({stats['encode_ms']:.1f} ms each, {stats['jpeg_bytes'] // 1024} KB)")
+    for client in sorted(stats["clients"], key=lambda client: client["client"]):
+        print(f"  {client['client']}: {client['fps']:.1f} fps, "
+              f"{client['frames']} sent, {client['skipped']} skipped")
+
+
+def benchmark_timelapse(args):
+    # Timing of the time-lapse scheduler against a camera-like source, with
+    # full-size frames written to disk like in the app
+    import tempfile
+
+    source = open_frame_source(args.source or "synthetic:1920x1080@30")
+    if not source.isOpened():
+        print(f"Could not open frame source {args.source}")
+        return
+    folder = tempfile.mkdtemp(prefix="cn_timelapse_bench_")
+    numbers = iter(range(1_000_000))
+    worker = CaptureWorker(Lock(), lambda: source)
+    worker.start()
+    worker.frame_nearest(time.monotonic(), timeout=5.0)  # the camera is running, as in the app
+    interval = 0.25
+    thread = IntervalCaptureThread(
+        worker, interval, lambda: os.path.join(folder, f"frame_{next(numbers):04d}.png"),
+        os.path.join(folder, "timelapse_log.csv"),
+    )
+    try:
+        thread.start()
+        time.sleep(args.seconds)
+        thread.stop()
+        print(f"source: {args.source or 'synthetic:1920x1080@30'}, one frame every {interval} s")
+        print(thread.summary())
+        with open(os.path.join(folder, "timelapse_log.csv")) as f:
+            rows = list(csv.DictReader(f))
+        if rows:
+            print(f"last log row: {rows[-1]}")
+    finally:
+        worker.stop()
+        source.release()
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def benchmark_backup(args):
+    # A full and then an incremental backup of a project of full-size frames,
+    # with a camera-like source read alongside to show the backup leaves the
+    # frame timing alone
+    import tempfile
+
+    source = open_frame_source(args.source or "synthetic:1920x1080@30")
+    if not source.isOpened():
+        print(f"Could not open frame source {args.source}")
+        return
+    project = tempfile.mkdtemp(prefix="cn_backup_bench_")
+    target = tempfile.mkdtemp(prefix="cn_backup_bench_target_")
+
+    def frame_gaps(seconds=None, thread=None):
+        gaps, last = [], time.perf_counter()
+        end = last + (seconds or 0)
+        while (thread.isRunning() if thread else time.perf_counter() < end):
+            source.read()
+            now = time.perf_counter()
+            gaps.append(1000 * (now - last))
+            last = now
+        return f"mean {np.mean(gaps):.1f} ms, worst {max(gaps):.1f} ms"
+
+    def backup(label):
+        thread = ProjectBackupThread(project, os.path.join(target, "project"), args.backup_rate)
+        results = []
+        thread.backup_finished.connect(lambda summary, ok: results.append(summary), Qt.DirectConnection)
+        thread.start(QThread.LowPriority)
+        gaps = frame_gaps(thread=thread)
+        thread.wait()
+        print(f"{label}: {results[0] if results else 'no result'}")
+        print(f"  frame gaps while backing up: {gaps}")
+
+    try:
+        for number in range(40):
+            _, frame = source.read()
+            cv2.imwrite(os.path.join(project, f"frame_{number:04d}.png"), frame)
+        with open(os.path.join(project, "project_meta.json"), "w") as f:
+            json.dump({"frames": 40}, f)
+        print(f"frame gaps without a backup: {frame_gaps(seconds=2.0)}")
+        backup("first backup")
+        for number in range(40, 42):
+            _, frame = source.read()
+            cv2.imwrite(os.path.join(project, f"frame_{number:04d}.png"), frame)
+        with open(os.path.join(project, "project_meta.json"), "w") as f:
+            json.dump({"frames": 42}, f)
+        backup("after two more frames")
+    finally:
+        source.release()
+        shutil.rmtree(project, ignore_errors=True)
+        shutil.rmtree(target, ignore_errors=True)
+
+
+def benchmark_still(args):
+    # Full-resolution stills from a source previewing at a lower resolution:
+    # how long each mode switch takes and how long the preview pauses
+    import tempfile
+
+    spec = args.source or "synthetic:1280x720@30,still=3840x2160,switch=120"
+    source = open_frame_source(spec)
+    if not source.isOpened():
+        print(f"Could not open frame source {spec}")
+        return
+    folder = tempfile.mkdtemp(prefix="cn_still_bench_")
+    cap_lock = Lock()
+    worker = CaptureWorker(cap_lock, lambda: source)
+    worker.start()
+    summaries = []
+    frame_times = []
+    watching = Event()
+
+    def watch():
+        # Every frame the capture worker delivers, to see how long the preview pauses
+        last = None
+        while not watching.is_set():
+            with worker.lock:
+                if worker.lock.wait_for(lambda: worker.frame_time != last, 0.1):
+                    last = worker.frame_time
+                    frame_times.append(last)
+
+    watcher = Thread(target=watch, daemon=True)
+    try:
+        worker.frame_nearest(time.monotonic(), timeout=5.0)
+        watcher.start()
+        for number in range(5):
+            thread = StillCaptureThread(cap_lock, source, os.path.join(folder, f"frame_{number:04d}.png"))
+            thread.still_captured.connect(lambda path, summary: summaries.append(summary), Qt.DirectConnection)
+            thread.still_failed.connect(lambda reason: summaries.append(f"failed: {reason}"), Qt.DirectConnection)
+            started = len(frame_times)
+            thread.start()
+            thread.wait()
+            time.sleep(0.5)
+            times = frame_times[max(started - 1, 0):]
+            pause = max(b - a for a, b in zip(times, times[1:])) if len(times) > 1 else float("nan")
+            print(f"{summaries[-1]}; longest preview gap {1000 * pause:.0f} ms")
+    finally:
+        watching.set()
+        worker.stop()
+        source.release()
+        shutil.rmtree(folder, ignore_errors=True)
+    print(f"source: {spec}, modes: {', '.join(f'{w}x{h}' for w, h in source.modes())}")
+
+
+BENCHMARKS = {
+    "backup": benchmark_backup,
+    "chroma": benchmark_chroma,
+    "gif": benchmark_gif,
+    "source": benchmark_source,
+    "still": benchmark_still,
+    "pipeline": benchmark_pipeline,
+    "stream": benchmark_stream,
+    "timelapse": benchmark_timelapse,
+}
+
+
 if __name__ == "__main__":
-    import traceback
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser(description="CN Stop Motion App")
+    parser.add_argument(
+        "--source",
+        help="frame source to open: camera:N, file:PATH[@FPS] (video or image folder) "
+             "or synthetic[:WxH@FPS,jitter=MS,drop=RATE,seed=N,still=WxH,switch=MS]",
+    )
+    parser.add_argument(
+        "--memory-budget", type=int, default=512, metavar="MB",
+        help="total memory for frame and thumbnail caches",
+    )
+    parser.add_argument(
+        "--stall-threshold", type=int, default=100, metavar="MS",
+        help="log GUI freezes longer than this to stalllog.txt (0 turns it off)",
+    )
+    parser.add_argument(
+        "--stream-port", type=int, default=8765, metavar="PORT",
+        help="port for Share Preview (MJPEG over HTTP)",
+    )
+    parser.add_argument(
+        "--backup-rate", type=float, default=10, metavar="MB/S",
+        help="speed limit for project backups, so they never slow down capturing",
+    )
+    parser.add_argument("--benchmark", choices=sorted(BENCHMARKS), help="run a benchmark and exit")
+    parser.add_argument("--seconds", type=float, default=5.0, help="benchmark duration")
+    args, qt_args = parser.parse_known_args()
+
+    if args.benchmark:
+        BENCHMARKS[args.benchmark](args)
+        sys.exit(0)
 
     try:
-        app = QApplication(sys.argv)
-        window = StopMotionApp()
+        app = QApplication([sys.argv[0]] + qt_args)
+        window = StopMotionApp(
+            source=args.source, memory_budget_mb=args.memory_budget, stall_threshold_ms=args.stall_threshold,
+            stream_port=args.stream_port, backup_rate_mb_s=args.backup_rate,
+        )
         window.show()
         sys.exit(app.exec())
     except Exception as e: